@@ -3,8 +3,17 @@ import json
 import csv
 import os
 import re
+import sys
+import argparse
+import heapq
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
 import logging
+from requests.adapters import HTTPAdapter
+from mademarket_store import MadeMarketStore, updated_hint
 
 # --- CONFIG ---
 BASE_URL = 'https://mademarket.co/api'
@@ -13,6 +22,15 @@ HEADERS = {
     'Content-Type': 'application/json',
 }
 DISTRIBUTION_NAME = '2025 ISTE'
+# Concurrent contact/firm detail requests, all sharing one pooled session
+MAX_WORKERS = int(os.getenv('MADEMARKET_CONCURRENCY', 8))
+REQUEST_TIMEOUT = 30
+# Contacts/firms persist here between runs; only new, changed or stale ones are re-fetched ("" disables)
+STORE_PATH = os.getenv('MADEMARKET_STORE', os.path.join('Made_Market_Data', 'mademarket_store.sqlite'))
+STORE_REFRESH_DAYS = float(os.getenv('MADEMARKET_REFRESH_DAYS', 7))
+# --stream: recipients requested per page, and rows held in memory per segment before spilling to disk
+PAGE_SIZE = 500
+SORT_BUFFER_ROWS = 50000
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -51,29 +69,81 @@ def safe_get_nested(data: Dict, *keys, default=""):
             return default
     return safe_str(current) if current is not None else default
 
-def get_distribution_id(distribution_name):
-    url = f"{BASE_URL}/v2/distributions/report_recipients.json"
-    logger.info(f"[MadeMarket] GET {url}")
-    response = requests.get(url, headers=HEADERS)
-    logger.info(f"[MadeMarket] Response status: {response.status_code}")
-    response.raise_for_status()
-    data = response.json()
-    for rec in data.get('distributions_recipients', []):
-        dist = rec.get('distribution', {})
-        if dist.get('name', '').lower() == distribution_name.lower():
-            return dist.get('id')
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Shared keep-alive session, with a pool big enough that MAX_WORKERS threads never wait on it."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, MAX_WORKERS))
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+def get_distribution_id(distribution_name, store=None, refresh=False, page_size=PAGE_SIZE):
+    """
+    Look the distribution up in the store's index; on a miss (or with
+    refresh=True) page through the all-distributions report, indexing every
+    distribution seen, and stop at the first page that contains the name.
+    """
+    if store is not None and not refresh:
+        known = store.find_distribution(distribution_name)
+        if known:
+            logger.info(f"[MadeMarket] Distribution '{distribution_name}' found in index: id {known['id']}")
+            return known['id']
+    for page in iter_report_pages({}, page_size):
+        distributions = {}
+        for rec in page:
+            dist = rec.get('distribution', {})
+            distributions.setdefault(dist.get('id'), dist)
+        if store is not None:
+            store.put_distributions(distributions.values())
+        for dist in distributions.values():
+            if dist.get('name', '').lower() == distribution_name.lower():
+                return dist.get('id')
     return None
 
 def get_distribution_recipients(distribution_id):
     url = f"{BASE_URL}/v2/distributions/report_recipients.json"
     params = {"distribution_ids[]": distribution_id}
     logger.info(f"[MadeMarket] GET {url} | params: {params}")
-    response = requests.get(url, headers=HEADERS, params=params)
+    response = get_session().get(url, params=params, timeout=REQUEST_TIMEOUT)
     logger.info(f"[MadeMarket] Response status: {response.status_code}")
     response.raise_for_status()
     data = response.json()
     return data.get('distributions_recipients', [])
 
+def iter_report_pages(params, page_size=PAGE_SIZE):
+    """
+    Yield report_recipients.json one page at a time, until a page comes back
+    empty. Short pages do not end the scan (the server may cap per_page below
+    page_size). If the endpoint ignores paging, page 2 repeats page 1, so the
+    single full response is yielded and we stop.
+    """
+    url = f"{BASE_URL}/v2/distributions/report_recipients.json"
+    page = 1
+    previous_first = None
+    while True:
+        params = {**params, "page": page, "per_page": page_size}
+        logger.info(f"[MadeMarket] GET {url} | params: {params}")
+        response = get_session().get(url, params=params, timeout=REQUEST_TIMEOUT)
+        logger.info(f"[MadeMarket] Response status: {response.status_code}")
+        response.raise_for_status()
+        recipients = response.json().get('distributions_recipients', [])
+        if not recipients or (page > 1 and recipients[0] == previous_first):
+            return
+        yield recipients
+        previous_first = recipients[0]
+        page += 1
+
+def iter_distribution_recipients(distribution_id, page_size=PAGE_SIZE):
+    """Yield the distribution's recipients one page at a time."""
+    return iter_report_pages({"distribution_ids[]": distribution_id}, page_size)
+
 def get_contact_details(contact_id, contact_cache):
     if not contact_id:
         return None
@@ -81,9 +151,11 @@ def get_contact_details(contact_id, contact_cache):
         return contact_cache[contact_id]
     url = f"{BASE_URL}/v2/contacts/{contact_id}.json"
     logger.info(f"[MadeMarket] GET {url}")
-    response = requests.get(url, headers=HEADERS)
+    response = get_session().get(url, timeout=REQUEST_TIMEOUT)
     logger.info(f"[MadeMarket] Response status: {response.status_code}")
     if response.status_code != 200:
+        # Remember the refusal too, so the id is not requested again this run
+        contact_cache[contact_id] = None
         return None
     data = response.json()
     contact_cache[contact_id] = data.get('contact', data)
@@ -96,14 +168,53 @@ def get_firm_details(firm_detail_id, firm_cache):
         return firm_cache[firm_detail_id]
     url = f"{BASE_URL}/v2/firm_details/{firm_detail_id}.json"
     logger.info(f"[MadeMarket] GET {url}")
-    response = requests.get(url, headers=HEADERS)
+    response = get_session().get(url, timeout=REQUEST_TIMEOUT)
     logger.info(f"[MadeMarket] Response status: {response.status_code}")
     if response.status_code != 200:
+        firm_cache[firm_detail_id] = None
         return None
     data = response.json()
     firm_cache[firm_detail_id] = data.get('firm_detail', data)
     return firm_cache[firm_detail_id]
 
+def prefetch_details(recipients, contact_cache, firm_cache, max_workers=MAX_WORKERS, store=None):
+    """
+    Fetch every distinct contact and firm referenced by `recipients` into the
+    caches, `max_workers` requests at a time. Each id is requested once, so the
+    per-recipient lookups afterwards are all cache hits; ids the API refused
+    are cached as None and are not requested again.
+
+    With a MadeMarketStore, records that are stored, unchanged and fresh are
+    loaded from it instead of requested, and fetched records are written back.
+    """
+    jobs = []
+    reused = 0
+    for kind, id_field, fetch, cache in (('contact', 'contact_id', get_contact_details, contact_cache),
+                                         ('firm', 'firm_detail_id', get_firm_details, firm_cache)):
+        hints = {}
+        for r in recipients:
+            if r.get(id_field) and r[id_field] not in hints:
+                hints[r[id_field]] = updated_hint(r, kind)
+        for record_id, hint in hints.items():
+            if record_id in cache:
+                continue
+            if store is not None and not store.needs_fetch(kind, record_id, hint):
+                cache[record_id] = store.get(kind, record_id)
+                reused += 1
+                continue
+            jobs.append((kind, fetch, record_id, cache))
+    logger.info(f"[MadeMarket] Fetching {len(jobs)} contact/firm details with {max_workers} workers"
+                f" ({reused} unchanged, loaded from store)")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for future in [pool.submit(fetch, record_id, cache) for _, fetch, record_id, cache in jobs]:
+            future.result()
+    if store is not None:
+        for kind, _, record_id, cache in jobs:
+            if cache.get(record_id) is not None:
+                store.put(kind, record_id, cache[record_id])
+            else:
+                store.delete(kind, record_id)
+
 def flatten_mademarket_row(recipient, contact, firm):
     row = {
         'recipient_email': safe_str(recipient.get('email')),
@@ -122,20 +233,172 @@ def flatten_mademarket_row(recipient, contact, firm):
             row[f'firm_{k}'] = safe_str(v)
     return row
 
-if __name__ == "__main__":
+def _email_key(row):
+    return row.get('recipient_email', '').lower()
+
+class SortedSegment:
+    """
+    Rows destined for one segment CSV, sorted by email like sorted() would
+    (ties keep arrival order). Rows are buffered in memory up to `buffer_rows`;
+    past that, sorted runs are spilled to temporary JSON-lines files and
+    merged when the CSV is written.
+    """
+
+    def __init__(self, buffer_rows=SORT_BUFFER_ROWS, tmp_dir=None):
+        self.buffer_rows = max(1, buffer_rows)
+        self.tmp_dir = tmp_dir
+        self.count = 0
+        self._buffer = []
+        self._runs = []
+
+    def add(self, row):
+        self._buffer.append((_email_key(row), self.count, row))
+        self.count += 1
+        if len(self._buffer) >= self.buffer_rows:
+            self._spill()
+
+    def _spill(self):
+        self._buffer.sort(key=lambda item: item[:2])
+        run = tempfile.TemporaryFile('w+', encoding='utf-8', dir=self.tmp_dir)
+        for item in self._buffer:
+            run.write(json.dumps(item, ensure_ascii=False) + '\n')
+        run.seek(0)
+        self._runs.append(run)
+        self._buffer = []
+
+    def _read_run(self, run):
+        for line in run:
+            key, seq, row = json.loads(line)
+            yield key, seq, row
+
+    def sorted_rows(self):
+        self._buffer.sort(key=lambda item: item[:2])
+        if not self._runs:
+            return (row for _, _, row in self._buffer)
+        streams = [self._read_run(run) for run in self._runs] + [iter(self._buffer)]
+        return (row for _, _, row in heapq.merge(*streams, key=lambda item: item[:2]))
+
+    def write_csv(self, path):
+        """Write the sorted rows (header from the first one, as before); nothing is written when empty."""
+        try:
+            rows = self.sorted_rows()
+            first = next(rows, None)
+            if first is None:
+                return
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=first.keys())
+                writer.writeheader()
+                writer.writerow(first)
+                writer.writerows(rows)
+        finally:
+            for run in self._runs:
+                run.close()
+            self._runs = []
+            self._buffer = []
+
+def pull_streaming(dist_id, output_file, opened_file, unopened_file, store=None,
+                   page_size=PAGE_SIZE, buffer_rows=SORT_BUFFER_ROWS):
+    """
+    Page through the distribution, writing the main CSV as rows are built and
+    routing each row to its opened/unopened segment. Memory is bounded by the
+    page size and segment buffer, not by the size of the distribution.
+    Produces the same three files as the in-memory pull.
+    """
+    opened = SortedSegment(buffer_rows)
+    unopened = SortedSegment(buffer_rows)
+    delta = Counter()
+    # Without a store, details are remembered for the whole run so no id is requested twice;
+    # with one, only refused ids (cached as None) carry over from page to page
+    contact_cache = {}
+    firm_cache = {}
+    total = 0
+    f = None
+    writer = None
+    try:
+        for page in iter_distribution_recipients(dist_id, page_size):
+            if store is not None:
+                delta.update(store.update_recipients(dist_id, page))
+                contact_cache = {k: None for k, v in contact_cache.items() if v is None}
+                firm_cache = {k: None for k, v in firm_cache.items() if v is None}
+            prefetch_details(page, contact_cache, firm_cache, store=store)
+            for rec in page:
+                contact = get_contact_details(rec.get('contact_id'), contact_cache)
+                firm = get_firm_details(rec.get('firm_detail_id'), firm_cache)
+                row = flatten_mademarket_row(rec, contact, firm)
+                if writer is None:
+                    f = open(output_file, "w", newline='', encoding="utf-8")
+                    writer = csv.DictWriter(f, fieldnames=row.keys())
+                    writer.writeheader()
+                writer.writerow(row)
+                if str(row.get('email_opened', '0')).strip() == '1':
+                    opened.add(row)
+                else:
+                    unopened.add(row)
+                total += 1
+            logger.info(f"[MadeMarket] {total} recipients written")
+    finally:
+        if f is not None:
+            f.close()
+    print(f"Found {total} recipients.")
+    if store is not None:
+        print(f"Engagement since last pull: {delta['new']} new recipients, {delta['changed']} changed "
+              f"({delta['new_views']} new views, {delta['new_bounces']} new bounces).")
+    if not total:
+        return None
+    print(f"Output written to {output_file}")
+    opened.write_csv(opened_file)
+    unopened.write_csv(unopened_file)
+    return opened.count, unopened.count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pull a MadeMarket distribution and segment it by opens.")
+    parser.add_argument('--stream', action='store_true',
+                        help='Page through recipients and write CSVs incrementally (bounded memory)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help='Recipients per page in --stream mode')
+    parser.add_argument('--refresh-index', action='store_true',
+                        help='Re-scan the distribution report instead of trusting the stored distribution index')
+    parser.add_argument('--sort-buffer', type=int, default=SORT_BUFFER_ROWS,
+                        help='Rows per segment kept in memory before spilling sorted runs to disk (--stream)')
+    args = parser.parse_args(argv)
+
     # --- Step 1: Pull and write main CSV ---
     output_dir = "Made_Market_Data"
     os.makedirs(output_dir, exist_ok=True)
     output_file = os.path.join(output_dir, f"mademarket_{DISTRIBUTION_NAME.replace(' ', '_')}.csv")
 
-    dist_id = get_distribution_id(DISTRIBUTION_NAME)
+    store = MadeMarketStore(STORE_PATH, refresh_days=STORE_REFRESH_DAYS) if STORE_PATH else None
+    dist_id = get_distribution_id(DISTRIBUTION_NAME, store=store, refresh=args.refresh_index)
     if not dist_id:
         print(f"Distribution '{DISTRIBUTION_NAME}' not found.")
-        exit(1)
+        return 1
+    opened_dir = os.path.join(output_dir, "opened")
+    unopened_dir = os.path.join(output_dir, "unopened")
+    opened_file = os.path.join(opened_dir, f"mademarket_{DISTRIBUTION_NAME.replace(' ', '_')}_opened.csv")
+    unopened_file = os.path.join(unopened_dir, f"mademarket_{DISTRIBUTION_NAME.replace(' ', '_')}_unopened.csv")
+
+    if args.stream:
+        os.makedirs(opened_dir, exist_ok=True)
+        os.makedirs(unopened_dir, exist_ok=True)
+        counts = pull_streaming(dist_id, output_file, opened_file, unopened_file, store=store,
+                                page_size=args.page_size, buffer_rows=args.sort_buffer)
+        if counts is None:
+            print("No data to write.")
+            return 0
+        if store is not None:
+            store.set_distribution_count(dist_id, sum(counts))
+        print(f"Segmented {counts[0]} opened and {counts[1]} unopened.\nOpened: {opened_file}\nUnopened: {unopened_file}")
+        return 0
+
     recipients = get_distribution_recipients(dist_id)
     print(f"Found {len(recipients)} recipients.")
+    if store is not None:
+        store.set_distribution_count(dist_id, len(recipients))
+        delta = store.update_recipients(dist_id, recipients)
+        print(f"Engagement since last pull: {delta['new']} new recipients, {delta['changed']} changed "
+              f"({delta['new_views']} new views, {delta['new_bounces']} new bounces).")
     contact_cache = {}
     firm_cache = {}
+    prefetch_details(recipients, contact_cache, firm_cache, store=store)
     rows = []
     for rec in recipients:
         contact = get_contact_details(rec.get('contact_id'), contact_cache)
@@ -150,20 +413,16 @@ if __name__ == "__main__":
         print(f"Output written to {output_file}")
     else:
         print("No data to write.")
-        exit(0)
+        return 0
 
     # --- Step 2: Segment opened/unopened ---
-    opened_dir = os.path.join(output_dir, "opened")
-    unopened_dir = os.path.join(output_dir, "unopened")
     os.makedirs(opened_dir, exist_ok=True)
     os.makedirs(unopened_dir, exist_ok=True)
-    opened_file = os.path.join(opened_dir, f"mademarket_{DISTRIBUTION_NAME.replace(' ', '_')}_opened.csv")
-    unopened_file = os.path.join(unopened_dir, f"mademarket_{DISTRIBUTION_NAME.replace(' ', '_')}_unopened.csv")
 
     opened = [row for row in rows if str(row.get('email_opened', '0')).strip() == '1']
     unopened = [row for row in rows if str(row.get('email_opened', '0')).strip() != '1']
-    opened_sorted = sorted(opened, key=lambda r: r.get('recipient_email', '').lower())
-    unopened_sorted = sorted(unopened, key=lambda r: r.get('recipient_email', '').lower())
+    opened_sorted = sorted(opened, key=_email_key)
+    unopened_sorted = sorted(unopened, key=_email_key)
 
     if opened_sorted:
         with open(opened_file, 'w', newline='', encoding='utf-8') as f:
@@ -176,4 +435,8 @@ if __name__ == "__main__":
             writer.writeheader()
             writer.writerows(unopened_sorted)
 
-    print(f"Segmented {len(opened_sorted)} opened and {len(unopened_sorted)} unopened.\nOpened: {opened_file}\nUnopened: {unopened_file}") 
\ No newline at end of file
+    print(f"Segmented {len(opened_sorted)} opened and {len(unopened_sorted)} unopened.\nOpened: {opened_file}\nUnopened: {unopened_file}") 
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Persistent local store of MadeMarket contacts, firm details and recipient
+engagement, shared across pulls and distributions.
+
+Contacts and firms are kept with their `updated_at` and the time they were
+fetched. A pull only re-requests a record when it is new, when the recipient
+row says it changed since the stored copy, or when the stored copy is older
+than the refresh window. Recipient engagement (`view_count`, `is_bounced`) is
+stored per distribution so each pull can report what changed since the last.
+It also keeps an index of distributions (name -> id, sent_at, recipient
+count), so a pull can find its distribution without downloading the report
+for every distribution on the account.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_DAYS = 7
+# Recipients looked up per SELECT (kept under SQLite's bound-parameter limit)
+SQL_BATCH = 500
+
+
+def updated_hint(recipient: Dict[str, Any], kind: str) -> Optional[str]:
+    """The `updated_at` of the recipient's contact/firm, if the recipient row carries one."""
+    nested = recipient.get(kind if kind == 'contact' else 'firm_detail')
+    if isinstance(nested, dict) and nested.get('updated_at'):
+        return str(nested['updated_at'])
+    flat = recipient.get(f'{kind}_updated_at')
+    return str(flat) if flat else None
+
+
+class MadeMarketStore:
+    """
+    SQLite store of contacts/firms keyed by MadeMarket id, plus recipient
+    engagement keyed by (distribution, recipient email). Thread-safe.
+    """
+
+    def __init__(self, path: str, refresh_days: float = DEFAULT_REFRESH_DAYS, clock=time.time):
+        self.path = path
+        self.refresh_seconds = refresh_days * 24 * 3600
+        self._clock = clock
+        self._lock = threading.Lock()
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " kind TEXT NOT NULL, id TEXT NOT NULL, updated_at TEXT, data TEXT NOT NULL, fetched REAL NOT NULL,"
+            " PRIMARY KEY (kind, id))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS recipients ("
+            " distribution_id TEXT NOT NULL, recipient TEXT NOT NULL, view_count INTEGER, is_bounced INTEGER,"
+            " seen REAL NOT NULL, PRIMARY KEY (distribution_id, recipient))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS distributions ("
+            " id TEXT PRIMARY KEY, name TEXT, name_lower TEXT, sent_at TEXT, recipient_count INTEGER, seen REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS distributions_name ON distributions (name_lower)")
+
+    def get(self, kind: str, record_id) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM records WHERE kind = ? AND id = ?", (kind, str(record_id))
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def needs_fetch(self, kind: str, record_id, updated_at: Optional[str] = None) -> bool:
+        """True if the record is missing, changed since it was stored, or past the refresh window."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at, fetched FROM records WHERE kind = ? AND id = ?", (kind, str(record_id))
+            ).fetchone()
+        if row is None:
+            return True
+        stored_updated, fetched = row
+        if updated_at and updated_at != stored_updated:
+            return True
+        return self._clock() - fetched > self.refresh_seconds
+
+    def put(self, kind: str, record_id, data: Dict[str, Any]):
+        updated_at = data.get('updated_at') if isinstance(data, dict) else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO records (kind, id, updated_at, data, fetched) VALUES (?, ?, ?, ?, ?)",
+                (kind, str(record_id), str(updated_at) if updated_at else None,
+                 json.dumps(data, ensure_ascii=False), self._clock()),
+            )
+
+    def delete(self, kind: str, record_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM records WHERE kind = ? AND id = ?", (kind, str(record_id)))
+
+    def update_recipients(self, distribution_id, recipients: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Store each recipient's engagement and count what changed since the
+        previous pull of this distribution: new recipients, new views, new bounces.
+        Can be called page by page; sum the returned counts.
+        """
+        dist = str(distribution_id)
+        counts = {'recipients': 0, 'new': 0, 'changed': 0, 'new_views': 0, 'new_bounces': 0}
+        now = self._clock()
+        rows = []
+        for rec in recipients:
+            key = str(rec.get('email') or '').strip().lower() or str(rec.get('contact_id') or '')
+            rows.append((dist, key, int(rec.get('view_count') or 0), 1 if rec.get('is_bounced') else 0, now))
+        keys = list({row[1] for row in rows})
+        with self._lock:
+            stored = {}
+            for start in range(0, len(keys), SQL_BATCH):
+                chunk = keys[start:start + SQL_BATCH]
+                stored.update((r[0], (r[1], r[2])) for r in self._conn.execute(
+                    "SELECT recipient, view_count, is_bounced FROM recipients WHERE distribution_id = ?"
+                    f" AND recipient IN ({', '.join('?' * len(chunk))})", [dist, *chunk]))
+            for _, key, views, bounced, _ in rows:
+                counts['recipients'] += 1
+                previous = stored.get(key)
+                if previous is None:
+                    counts['new'] += 1
+                elif tuple(previous) != (views, bounced):
+                    old_views, old_bounced = previous
+                    counts['changed'] += 1
+                    counts['new_views'] += max(0, views - (old_views or 0))
+                    counts['new_bounces'] += 1 if bounced and not old_bounced else 0
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO recipients (distribution_id, recipient, view_count, is_bounced, seen)"
+                " VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+        return counts
+
+    def find_distribution(self, name: str) -> Optional[Dict[str, Any]]:
+        """Indexed distribution with this name (case-insensitive), earliest indexed first."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, name, sent_at, recipient_count FROM distributions WHERE name_lower = ? ORDER BY rowid LIMIT 1",
+                ((name or '').lower(),)).fetchone()
+        if row is None:
+            return None
+        return {'id': json.loads(row[0]), 'name': row[1], 'sent_at': row[2], 'recipient_count': row[3]}
+
+    def put_distributions(self, distributions: Iterable[Dict[str, Any]]):
+        """Add or update index entries from `distribution` objects; known recipient counts are kept."""
+        now = self._clock()
+        with self._lock:
+            for dist in distributions:
+                if dist.get('id') is None:
+                    continue
+                name = dist.get('name') or ''
+                self._conn.execute(
+                    "INSERT INTO distributions (id, name, name_lower, sent_at, seen) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(id) DO UPDATE SET name = excluded.name, name_lower = excluded.name_lower,"
+                    " sent_at = excluded.sent_at, seen = excluded.seen",
+                    (json.dumps(dist['id']), name, name.lower(), dist.get('sent_at'), now))
+
+    def set_distribution_count(self, distribution_id, count: int):
+        with self._lock:
+            self._conn.execute("UPDATE distributions SET recipient_count = ? WHERE id = ?",
+                               (count, json.dumps(distribution_id)))
+
+    def distributions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, name, sent_at, recipient_count FROM distributions ORDER BY rowid").fetchall()
+        return [{'id': json.loads(r[0]), 'name': r[1], 'sent_at': r[2], 'recipient_count': r[3]} for r in rows]
+
+    def sizes(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT kind, COUNT(*) FROM records GROUP BY kind").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,211 @@
+"""
+Throughput benchmark for the enrichment entry points, against the local stand-in.
+
+    python -m benchmarks.run                          # every entry point, 100/1k/10k leads
+    python -m benchmarks.run --entry main --sizes 100 --latency 0.1 --baseline benchmarks/results/old.json
+
+Each run gets a fresh working directory (so no cache, checkpoint or payload
+store carries over) with a synthetic leads file, and the entry point runs as
+its own process pointed at benchmarks.standin through CORESIGNAL_API_ROOT.
+Reported per run:
+
+    leads_per_second    input leads / wall-clock seconds
+    p95_lead_seconds    95th percentile of the entry point's per-lead span
+                        (core_sig.tracing, via CORESIGNAL_TRACE)
+    peak_rss_mb         max resident set size of the process
+    api_calls_per_lead  requests the stand-in served / input leads
+
+Results go to benchmarks/results/<timestamp>.json together with the git
+commit and the parameters, so two versions can be compared with --baseline.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.standin import StandIn
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_SIZES = (100, 1000, 10000)
+
+# name -> (argv builder taking (leads_file, workers), the entry point's per-lead span)
+ENTRY_POINTS = {
+    "main": (lambda leads, workers: [str(ROOT / "main.py"), "--workers", str(workers)], "enrich_lead"),
+    "core_sig.enrichment": (lambda leads, workers: ["-m", "stuff.main", leads, "-o", "enriched.csv"], "enrich_lead"),
+    "company_enrich": (lambda leads, workers: [str(ROOT / "coresignal_enrichment" / "company_enrich.py"), "--input", leads,
+                                               "--output", os.path.join("out", "enriched.csv"), "--limit", "1000000000"],
+                       "enrich_domain"),
+    "try": (lambda leads, workers: [str(ROOT / "try" / "main.py"), leads, "-o", "enriched.csv",
+                                    "--max-concurrent", str(workers)], "enrich_lead"),
+}
+
+
+def write_leads(path: Path, n: int, leads_per_company: int = 5):
+    """Synthetic leads carrying the input columns every entry point reads."""
+    columns = ["contact_email", "contact_full_name", "contact_first_name", "contact_last_name", "contact_firm_name",
+               "cs_company_website", "recipient_email", "email", "first_name", "last_name", "company_name",
+               "email_opened"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(columns) + "\n")
+        for i in range(n):
+            company = i // max(1, leads_per_company)
+            first, last = f"Lead{i}", f"Person{i}"
+            domain = f"company{company}.example.com"
+            email = f"{first.lower()}.{last.lower()}@{domain}"
+            firm = f"Company {company} Inc"
+            f.write(",".join([email, f"{first} {last}", first, last, firm, f"https://www.{domain}", email, email,
+                              first, last, firm, str(i % 2)]) + "\n")
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def lead_latencies(trace_path: Path, span: str) -> List[float]:
+    """Durations (seconds) of the per-lead span in a core_sig.tracing trace file."""
+    try:
+        with open(trace_path, encoding="utf-8") as f:
+            events = json.load(f)["traceEvents"]
+    except (OSError, ValueError, KeyError):
+        return []
+    return [e["dur"] / 1e6 for e in events if e.get("name") == span]
+
+
+def _peak_rss_mb(ru_maxrss: int) -> float:
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return round(ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_one(entry: str, n: int, standin: StandIn, workers: int, rate: float, timeout: float,
+            keep: bool = False) -> Dict[str, Any]:
+    build_argv, span = ENTRY_POINTS[entry]
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench-{entry}-{n}-"))
+    write_leads(workdir / "leads.csv", n)
+    (workdir / "out").mkdir()
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])),
+               CORESIGNAL_API_ROOT=standin.url,
+               CORESIGNAL_API_KEY=os.environ.get("CORESIGNAL_API_KEY") or "benchmark",
+               CORESIGNAL_CREDITS_PER_SECOND=str(rate),
+               CORESIGNAL_RATE_LIMIT_BURST=str(max(1, workers)),
+               CORESIGNAL_TRACE=str(workdir / "trace.json"),
+               CORESIGNAL_METRICS_JSON=str(workdir / "metrics.json"),
+               CORESIGNAL_METRICS_PROM="")
+    standin.reset()
+    with open(workdir / "run.log", "wb") as log:
+        started = time.perf_counter()
+        proc = subprocess.Popen([sys.executable] + build_argv("leads.csv", workers), cwd=workdir, env=env,
+                                stdout=log, stderr=subprocess.STDOUT)
+        timer = threading.Timer(timeout, proc.kill)
+        timer.start()
+        try:
+            # wait4 (rather than proc.wait) gives this child's own resource usage
+            _, status, usage = os.wait4(proc.pid, 0)
+        finally:
+            timer.cancel()
+        seconds = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    calls = standin.requests
+    total_calls = sum(calls.values())
+    latencies = lead_latencies(workdir / "trace.json", span)
+    result = {
+        "entry": entry,
+        "leads": n,
+        "returncode": proc.returncode,
+        "seconds": round(seconds, 3),
+        "leads_per_second": round(n / seconds, 2) if seconds else None,
+        "p95_lead_seconds": _percentile(latencies, 0.95),
+        "p50_lead_seconds": _percentile(latencies, 0.5),
+        "traced_leads": len(latencies),
+        "peak_rss_mb": _peak_rss_mb(usage.ru_maxrss),
+        "api_calls": total_calls,
+        "api_calls_per_lead": round(total_calls / n, 3) if n else None,
+        "api_calls_by_route": calls,
+    }
+    if proc.returncode != 0:
+        result["log_tail"] = (workdir / "run.log").read_text(encoding="utf-8", errors="replace")[-2000:]
+    if keep:
+        result["workdir"] = str(workdir)
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_results(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None) -> str:
+    previous = {(r["entry"], r["leads"]): r for r in (baseline or {}).get("results", [])}
+    lines = [f"{'entry':<20} {'leads':>6} {'leads/s':>9} {'p95 s':>8} {'RSS MB':>8} {'calls/lead':>10}  vs baseline"]
+    for r in results:
+        p95 = f"{r['p95_lead_seconds']:.3f}" if r["p95_lead_seconds"] is not None else "-"
+        old = previous.get((r["entry"], r["leads"]))
+        delta = ""
+        if old and old.get("leads_per_second") and r["leads_per_second"]:
+            delta = f"{100 * (r['leads_per_second'] / old['leads_per_second'] - 1):+.1f}% leads/s"
+        if r["returncode"]:
+            delta = f"FAILED (exit {r['returncode']})"
+        lines.append(f"{r['entry']:<20} {r['leads']:>6} {r['leads_per_second'] or 0:>9.2f} {p95:>8} "
+                     f"{r['peak_rss_mb']:>8.1f} {r['api_calls_per_lead'] or 0:>10.2f}  {delta}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the enrichment entry points against a local CoreSignal stand-in")
+    parser.add_argument("--entry", nargs="+", choices=sorted(ENTRY_POINTS), default=sorted(ENTRY_POINTS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="Input sizes in leads")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stand-in seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- seconds added to the latency")
+    parser.add_argument("--workers", type=int, default=10, help="Concurrency passed to entry points that take one")
+    parser.add_argument("--rate", type=float, default=1000.0, help="CORESIGNAL_CREDITS_PER_SECOND for the runs")
+    parser.add_argument("--timeout", type=float, default=3600.0, help="Seconds before a run is killed")
+    parser.add_argument("--output", help="Results JSON (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare leads/s against")
+    parser.add_argument("--keep", action="store_true", help="Keep each run's working directory (logs, trace, output)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    results = []
+    with StandIn(latency=args.latency, jitter=args.jitter) as standin:
+        for entry in args.entry:
+            for n in args.sizes:
+                print(f"Running {entry} with {n} leads...", flush=True)
+                results.append(run_one(entry, n, standin, args.workers, args.rate, args.timeout, keep=args.keep))
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "params": {k: getattr(args, k) for k in ("latency", "jitter", "workers", "rate")},
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(format_results(results, baseline))
+    print(f"Results written to {output}")
+    return 1 if any(r["returncode"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Local HTTP stand-in for the CoreSignal API.
+
+Serves the captured payloads (companycurl.txt and curlc2.txt for companies,
+"put for now/CURLCOMMAND.TXT" for members) in the response shapes each client
+in this repo parses, after a configurable delay, and counts every request.
+Point a client at it with CORESIGNAL_API_ROOT=<StandIn.url>; no credits are
+spent.
+
+    POST /cdapi/v2/<entity>/search/...    [id]                              (v2 clients, company_enrich)
+    POST /v2/<entity>/search/es_dsl       {"hits": {"hits": [{"_source"}]}} (core_sig.enrichment)
+    POST /v2/<entity>/search, GET .../search?...
+                                          {"results": [payload]}            (try/, stuff/core_sig)
+    GET  .../collect/<id>, /v1/<entity>/<id>[/...]
+                                          payload with "id" set to <id>
+    GET  .../collect?ids=a,b,c            [payload, ...]
+
+Search ids are a hash of the request, so repeated lookups of one company get
+the same id (and caches and de-duplication behave as they would for real).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+COMPANY_CAPTURES = (ROOT / "companycurl.txt", ROOT / "curlc2.txt")
+MEMBER_CAPTURES = (ROOT / "put for now" / "CURLCOMMAND.TXT",)
+MEMBER_PATH_PARTS = ("member", "employee", "people", "person")
+
+
+# The tail of a curl progress-meter line: three "--:--:--" (or h:mm:ss) times and the current speed;
+# the sizes and percentages before it are the run of METER_CHARS leading up to the match
+CURL_PROGRESS = re.compile(r"(?:\s+(?:--:--:--|\d+:\d\d:\d\d)){3}\s+[\d.]+[kMG]?")
+METER_CHARS = frozenset("0123456789.kMG \t")
+
+
+def load_capture(path: Path) -> dict:
+    """
+    The JSON body of a saved curl transcript.
+
+    The terminal captures have curl's progress meter written over part of the
+    body; the member around each meter line is dropped (from the last ',' or
+    '{' before it to the next ',"' after it) so the rest parses.
+    """
+    text = path.read_text(encoding="utf-8", errors="replace")
+    start = text.find("{")
+    if start == -1:
+        raise ValueError(f"No JSON object found in {path}")
+    body = text[start:]
+    match = CURL_PROGRESS.search(body)
+    while match:
+        meter = match.start()
+        while meter and body[meter - 1] in METER_CHARS:
+            meter -= 1
+        cut = max(body.rfind(",", 0, meter), body.rfind("{", 0, meter))
+        resume = body.find(',"', match.end())
+        if cut == -1 or resume == -1:
+            break
+        body = body[:cut + 1] + body[resume + 1:]
+        match = CURL_PROGRESS.search(body, cut + 1)
+    payload, _ = json.JSONDecoder().raw_decode(body)
+    return payload
+
+
+class _Template:
+    """A payload serialized once; render(id) splices the id in without re-encoding it."""
+
+    def __init__(self, payload: dict):
+        body = {k: v for k, v in payload.items() if k != "id"}
+        rest = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self._rest = rest[1:] if len(rest) > 2 else b"}"
+        self._sep = b", " if len(rest) > 2 else b""
+
+    def render(self, entity_id: int, **extra) -> bytes:
+        head = {"id": entity_id, **extra}
+        return json.dumps(head).encode("utf-8")[:-1] + self._sep + self._rest
+
+
+class StandIn:
+    """Threaded stand-in server; start() returns the root URL to use as CORESIGNAL_API_ROOT."""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                 company_captures=COMPANY_CAPTURES, member_captures=MEMBER_CAPTURES):
+        self.latency = latency
+        self.jitter = jitter
+        self.companies = [_Template(load_capture(p)) for p in company_captures]
+        self.members = [_Template(load_capture(p)) for p in member_captures]
+        self._lock = threading.Lock()
+        self._requests: Counter = Counter()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._server.serve_forever, name="coresignal-standin", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def requests(self) -> Dict[str, int]:
+        """Requests served so far, by route."""
+        with self._lock:
+            return dict(self._requests)
+
+    @property
+    def total_requests(self) -> int:
+        with self._lock:
+            return sum(self._requests.values())
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+
+    # --- Responses -------------------------------------------------------------------
+
+    def _count(self, route: str):
+        with self._lock:
+            self._requests[route] += 1
+
+    def _payload(self, member: bool, entity_id: int, **extra) -> bytes:
+        templates = self.members if member else self.companies
+        return templates[entity_id % len(templates)].render(entity_id, **extra)
+
+    def respond(self, method: str, target: str, body: bytes) -> Tuple[int, bytes]:
+        """Status and JSON body for one request; also counts it."""
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/")
+        member = any(part in path for part in MEMBER_PATH_PARTS)
+        kind = "member" if member else "company"
+        segments = path.split("/")
+        if "search" in segments:
+            self._count(f"{kind}_search")
+            entity_id = zlib.crc32(path.encode() + parts.query.encode() + body) % 10 ** 8 + 1
+            if path.startswith("/cdapi/"):
+                return 200, json.dumps([entity_id]).encode()
+            if path.endswith("/es_dsl"):
+                hit = self._payload(member, entity_id)
+                return 200, b'{"hits": {"hits": [{"_id": %d, "_source": %s}]}}' % (entity_id, hit)
+            # v1-style search hits also carry the ids the callers chain on
+            result = self._payload(member, entity_id, profile_id=entity_id, org_id=entity_id)
+            return 200, b'{"results": [' + result + b"]}"
+        if method == "GET":
+            ids = parse_qs(parts.query).get("ids")
+            if ids and segments[-1] == "collect":
+                self._count(f"{kind}_collect_batch")
+                found = [int(i) for i in ids[0].split(",") if i.isdigit()]
+                return 200, b"[" + b", ".join(self._payload(member, i) for i in found) + b"]"
+            entity_id = next((int(s) for s in reversed(segments) if s.isdigit()), None)
+            if entity_id is not None:
+                self._count(f"{kind}_collect")
+                return 200, self._payload(member, entity_id)
+        self._count("not_found")
+        return 404, b'{"detail": "Not found"}'
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                delay = standin.latency + (random.uniform(-standin.jitter, standin.jitter) if standin.jitter else 0.0)
+                if delay > 0:
+                    time.sleep(delay)
+                status, payload = standin.respond(self.command, self.path, body)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = _serve
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve captured CoreSignal payloads locally")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- seconds added to the latency")
+    args = parser.parse_args(argv)
+    server = StandIn(latency=args.latency, jitter=args.jitter, port=args.port)
+    print(f"CoreSignal stand-in on {server.start()} (export CORESIGNAL_API_ROOT={server.url})")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"Requests: {server.requests}")
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
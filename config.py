@@ -4,8 +4,9 @@ Configuration settings for CoreSignal enrichment pipeline
 import os
 from typing import Dict, Any
 
-# CoreSignal API Configuration
-CORESIGNAL_BASE_URL = "https://api.coresignal.com/cdapi/v2"
+# CoreSignal API Configuration; CORESIGNAL_API_ROOT points every client at another host (e.g. benchmarks/standin.py)
+CORESIGNAL_API_ROOT = os.getenv("CORESIGNAL_API_ROOT", "https://api.coresignal.com").rstrip("/")
+CORESIGNAL_BASE_URL = f"{CORESIGNAL_API_ROOT}/cdapi/v2"
 CORESIGNAL_API_KEY = os.getenv("CORESIGNAL_API_KEY", "")
 
 # API Endpoints
@@ -21,6 +22,43 @@ RATE_LIMIT_DELAY = 1.0  # seconds between requests
 MAX_RETRIES = 3
 REQUEST_TIMEOUT = 30
 
+# Shared token bucket (core_sig/rate_limit.py): sustained rate and burst size
+CREDITS_PER_SECOND = float(os.getenv("CORESIGNAL_CREDITS_PER_SECOND", 1 / RATE_LIMIT_DELAY))
+RATE_LIMIT_BURST = int(os.getenv("CORESIGNAL_RATE_LIMIT_BURST", 5))
+
+# Persistent response cache (core_sig/cache.py); set CORESIGNAL_CACHE_DB="" to disable
+CACHE_DB_PATH = os.getenv("CORESIGNAL_CACHE_DB", ".coresignal_cache.sqlite")
+CACHE_MAX_ENTRIES = int(os.getenv("CORESIGNAL_CACHE_MAX_ENTRIES", 50000))
+CACHE_TTLS = {  # seconds
+    "company_search": 7 * 24 * 3600,
+    "company_collect": 30 * 24 * 3600,
+    "member_search": 7 * 24 * 3600,
+    "member_collect": 30 * 24 * 3600,
+    "domain_search": 7 * 24 * 3600,  # coresignal_enrichment/company_enrich.py
+    "multi_source_collect": 30 * 24 * 3600,
+}
+
+# Raw company/member payloads, compressed and deduplicated (core_sig/payloads.py); "" disables
+PAYLOAD_STORE_PATH = os.getenv("CORESIGNAL_PAYLOAD_STORE", ".coresignal_payloads.sqlite")
+
+# Max ids per batched collect request (coresignal_client.get_*_details_batch)
+COLLECT_BATCH_SIZE = int(os.getenv("CORESIGNAL_COLLECT_BATCH_SIZE", 20))
+
+# main.py logging (core_sig/logs.py): size-rotated, gzipped log file; repetitive records sampled
+LOG_LEVEL = os.getenv("CORESIGNAL_LOG_LEVEL", "INFO")
+LOG_MAX_BYTES = int(os.getenv("CORESIGNAL_LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.getenv("CORESIGNAL_LOG_BACKUPS", 5))
+LOG_SAMPLE_BURST = int(os.getenv("CORESIGNAL_LOG_SAMPLE_BURST", 50))
+LOG_SAMPLE_EVERY = int(os.getenv("CORESIGNAL_LOG_SAMPLE_EVERY", 100))  # 0 keeps every record
+
+# API metrics (core_sig/metrics.py), rewritten every METRICS_DUMP_INTERVAL seconds and at exit; "" disables a file
+METRICS_JSON_PATH = os.getenv("CORESIGNAL_METRICS_JSON", "coresignal_metrics.json")
+METRICS_PROM_PATH = os.getenv("CORESIGNAL_METRICS_PROM", "coresignal_metrics.prom")
+METRICS_DUMP_INTERVAL = float(os.getenv("CORESIGNAL_METRICS_INTERVAL", 30))
+
+# Per-stage span trace (core_sig/tracing.py) as Chrome trace-event JSON; "" disables tracing
+TRACE_PATH = os.getenv("CORESIGNAL_TRACE", "")
+
 # File paths
 DEFAULT_INPUT_FILE = "leads.csv"
 DEFAULT_OUTPUT_FILE = "leads_enriched.csv"
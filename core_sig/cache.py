@@ -0,0 +1,169 @@
+"""
+Persistent response cache for CoreSignal API calls.
+
+Responses live in a single SQLite file keyed by (namespace, key), where the
+namespace is the endpoint name (company_collect, member_search, ...). Each
+namespace has its own TTL, the whole store is capped at `max_entries` with
+least-recently-used eviction, and hit/miss counters are kept per namespace so
+callers can report them through their own get_stats().
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("core_sig.cache")
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50000
+
+_MISSING = object()
+
+
+class ResponseCache:
+    """
+    Thread-safe SQLite key/value store with per-namespace TTL and LRU eviction.
+
+    Values must be JSON-serializable. A cached None/[]/{} is a valid hit, so
+    get() takes an explicit `default` to tell misses apart.
+    """
+
+    def __init__(self, path: str, ttls: Optional[Dict[str, float]] = None, default_ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_entries = max(1, int(max_entries))
+        self._clock = clock
+        self._lock = threading.Lock()
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self.evictions = 0
+
+    def ttl_for(self, namespace: str) -> float:
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Return the cached value, or `default` if it is missing or older than the namespace TTL."""
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM responses WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_for(namespace):
+                self.misses[namespace] += 1
+                return default
+            self._conn.execute(
+                "UPDATE responses SET accessed = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+            )
+            self.hits[namespace] += 1
+        try:
+            return json.loads(row[0])
+        except ValueError as e:
+            logger.warning(f"Corrupt cache entry {namespace}/{key}: {e}")
+            return default
+
+    def contains(self, namespace: str, key: str) -> bool:
+        return self.get(namespace, key, _MISSING) is not _MISSING
+
+    def set(self, namespace: str, key: str, value: Any):
+        """Store `value`, evicting the least recently used entries once the store is over capacity."""
+        payload = json.dumps(value, ensure_ascii=False)
+        now = self._clock()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO responses (namespace, key, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, payload, now, now),
+            )
+            if cursor.rowcount:
+                self._count += 1
+            else:
+                self._conn.execute(
+                    "UPDATE responses SET value = ?, created = ?, accessed = ? WHERE namespace = ? AND key = ?",
+                    (payload, now, now, namespace, key),
+                )
+            if self._count > self.max_entries:
+                self._evict(self._count - self.max_entries)
+
+    def _evict(self, n: int):
+        self._conn.execute(
+            "DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses ORDER BY accessed LIMIT ?)", (n,)
+        )
+        self._count -= n
+        self.evictions += n
+        logger.debug(f"Evicted {n} least recently used cache entries")
+
+    def purge_expired(self) -> int:
+        """Delete every entry past its namespace TTL. Returns the number removed."""
+        now = self._clock()
+        removed = 0
+        with self._lock:
+            namespaces = [r[0] for r in self._conn.execute("SELECT DISTINCT namespace FROM responses")]
+            for namespace in namespaces:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE namespace = ? AND created < ?",
+                    (namespace, now - self.ttl_for(namespace)),
+                )
+                removed += cursor.rowcount
+            self._count -= removed
+        return removed
+
+    def __len__(self) -> int:
+        return self._count
+
+    def sizes(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT namespace, COUNT(*) FROM responses GROUP BY namespace").fetchall())
+
+    def get_stats(self) -> Dict[str, Any]:
+        namespaces = sorted(set(self.hits) | set(self.misses))
+        return {
+            "path": self.path,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "by_namespace": {ns: {"hits": self.hits[ns], "misses": self.misses[ns]} for ns in namespaces},
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path: str, **kwargs) -> ResponseCache:
+    """
+    Return the process-wide cache for `path`, opening it on first use.
+
+    Like get_limiter(), the first caller's settings win so every client in the
+    process shares one connection and one set of counters.
+    """
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = ResponseCache(path, **kwargs)
+            _caches[path] = cache
+            logger.info(f"Opened response cache {path} ({len(cache)} entries)")
+        return cache
@@ -0,0 +1,116 @@
+"""
+Append-only checkpoint journal shared by the enrichment entry points.
+
+Each finished lead (or domain, or company) is appended to a JSON-lines file as
+{"key": ..., "ts": ..., "data": ...}. Recording is one small append, never a
+rewrite of the whole set, and reopening the journal after a crash or Ctrl-C
+tells the caller which keys are already done and what their results were, so
+a resumed run only spends credits on the remainder.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger("core_sig.checkpoint")
+
+EMAIL_FIELDS = ('contact_email', 'email', 'recipient_email')
+FALLBACK_FIELDS = ('contact_full_name', 'contact_firm_name', 'cs_company_website')
+
+
+def _normalize(value) -> str:
+    if not isinstance(value, str):
+        return ''
+    value = value.strip().lower()
+    return '' if value == 'nan' else value
+
+
+def lead_key(lead: Dict[str, Any], email_fields: Iterable[str] = EMAIL_FIELDS,
+             fallback_fields: Iterable[str] = FALLBACK_FIELDS) -> Optional[str]:
+    """
+    Stable identity for a lead: the normalized email, or the normalized
+    name/firm/website when there is no email. None if the lead has neither.
+    """
+    for field in email_fields:
+        email = _normalize(lead.get(field))
+        if '@' in email:
+            return email
+    parts = [_normalize(lead.get(field)) for field in fallback_fields]
+    if any(parts):
+        return '|'.join(parts)
+    return None
+
+
+class CheckpointJournal:
+    """
+    JSON-lines journal of completed keys and their results.
+
+    The whole journal is loaded into a dict on open (last record for a key
+    wins). A truncated final line, left by a crash mid-write, is ignored.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._done: Dict[str, Any] = {}
+        self._load()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write('\n')
+        if self._done:
+            logger.info(f"Resuming from checkpoint {path}: {len(self._done)} entries already done")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    self._done[record['key']] = record.get('data')
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"Skipping unreadable checkpoint line {line_no} in {self.path}: {e}")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def __contains__(self, key) -> bool:
+        return key in self._done
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def get(self, key, default=None) -> Any:
+        return self._done.get(key, default)
+
+    def record(self, key: str, data: Any = None):
+        """Mark `key` done, storing `data` (JSON-serializable) as its result."""
+        line = json.dumps({'key': key, 'ts': time.time(), 'data': data}, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._done[key] = data
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,13 +1,21 @@
 import os
 import json
+import asyncio
+import weakref
 import httpx
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from stuff.config import API_KEY, CACHE_TTL_DAYS, CACHE_DIR
+from stuff.config import (
+    API_KEY, API_ROOT, CACHE_TTL_DAYS, CACHE_DIR,
+    HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY, HTTP2,
+)
+from core_sig.metrics import MetricsRegistry, get_metrics
+from core_sig.rate_limit import TokenBucket, get_limiter
 import re
+import time
 
 logger = logging.getLogger("core_sig.client")
 
@@ -27,16 +35,87 @@ def _sanitize(s: str) -> str:
     """Replace all non-alphanumeric characters with underscores for safe filenames."""
     return re.sub(r'[^A-Za-z0-9_.-]', '_', s)
 
+def _endpoint_label(endpoint: str) -> str:
+    """Metrics label for an endpoint path: no query string, numeric ids collapsed."""
+    return re.sub(r"/\d+(?=/|$)", "/{id}", endpoint.split("?", 1)[0])
+
+def _record_backoff(retry_state):
+    """tenacity before_sleep hook: count the retry and the backoff sleep."""
+    client, endpoint = retry_state.args[:2]
+    name = retry_state.kwargs.get("name") or _endpoint_label(endpoint)
+    client.metrics.record_retry(name)
+    client.metrics.record_wait(name, retry_state.next_action.sleep, reason="backoff")
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
 class CoreSignalClient:
     """
     Async client for CoreSignal API with caching and robust error handling.
+
+    Requests share one pooled httpx.AsyncClient per event loop, so collects
+    reuse keep-alive connections instead of paying a TCP/TLS handshake each.
+    Use it as `async with CoreSignalClient() as client:` or call aclose() when
+    done; the sync wrappers (collect_company, collect_person) run on a private
+    loop that close() shuts down.
     """
-    def __init__(self, api_key: Optional[str] = None, cache_dir: str = CACHE_DIR, cache_ttl_days: int = CACHE_TTL_DAYS):
+    def __init__(self, api_key: Optional[str] = None, cache_dir: str = CACHE_DIR, cache_ttl_days: int = CACHE_TTL_DAYS,
+                 rate_limiter: Optional[TokenBucket] = None, max_connections: int = HTTP_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = HTTP_MAX_KEEPALIVE, keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+                 http2: bool = HTTP2, metrics: Optional[MetricsRegistry] = None):
         self.api_key = api_key or API_KEY
+        self.metrics = metrics or get_metrics()
+        self.rate_limiter = rate_limiter or get_limiter("coresignal")
         self.cache_dir = Path(cache_dir)
         self.cache_ttl = timedelta(days=cache_ttl_days)
         self.headers = {"Authorization": f"Token {self.api_key}"}
         self.cache_dir.mkdir(exist_ok=True)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry)
+        if http2 and not _http2_available():
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        # httpx connections are bound to the loop that opened them
+        self._clients = weakref.WeakKeyDictionary()
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=30, limits=self.limits, http2=self.http2)
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """Close the pooled connections opened on the running loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _run_sync(self, coro):
+        if self._sync_loop is None or self._sync_loop.is_closed():
+            self._sync_loop = asyncio.new_event_loop()
+        return self._sync_loop.run_until_complete(coro)
+
+    def close(self):
+        """Close the private loop (and its pool) used by the sync wrappers."""
+        if self._sync_loop is not None and not self._sync_loop.is_closed():
+            self._sync_loop.run_until_complete(self.aclose())
+            self._sync_loop.close()
 
     def _cache_path(self, endpoint: str, cache_key: str) -> Path:
         safe_ep = _sanitize(endpoint.strip("/").replace("/", "_"))
@@ -51,108 +130,128 @@ class CoreSignalClient:
         mtime = datetime.fromtimestamp(path.stat().st_mtime)
         return (datetime.now() - mtime) < self.cache_ttl
 
-    @retry(stop=stop_after_attempt(4), wait=wait_exponential(multiplier=1, min=1, max=10), retry=retry_if_exception_type(httpx.RequestError))
-    async def get(self, endpoint: str, cache_key: str) -> Any:
+    async def _send(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """One rate-limited request, recorded in the metrics registry."""
+        self.metrics.record_wait(name, await self.rate_limiter.acquire_async())
+        started = time.perf_counter()
+        try:
+            resp = await self._client().request(method, url, **kwargs)
+        except httpx.RequestError:
+            self.metrics.record_error(name, time.perf_counter() - started)
+            raise
+        self.metrics.record_response(name, resp, time.perf_counter() - started)
+        return resp
+
+    @retry(stop=stop_after_attempt(4), wait=wait_exponential(multiplier=1, min=1, max=10), retry=retry_if_exception_type(httpx.RequestError),
+           before_sleep=_record_backoff)
+    async def get(self, endpoint: str, cache_key: str, name: Optional[str] = None) -> Any:
+        name = name or _endpoint_label(endpoint)
         cache_path = self._cache_path(endpoint, cache_key)
-        if self._is_fresh(cache_path):
+        fresh = self._is_fresh(cache_path)
+        self.metrics.record_cache(name, fresh)
+        if fresh:
             try:
                 with open(cache_path, "r", encoding="utf-8") as f:
                     logger.debug(f"Cache hit: {cache_path}")
                     return json.load(f)
             except Exception as e:
                 logger.warning(f"Failed to read cache {cache_path}: {e}")
-        url = f"https://api.coresignal.com{endpoint}"
-        async with httpx.AsyncClient(timeout=30) as client:
-            logger.info(f"Requesting {url}")
-            resp = await client.get(url, headers=self.headers)
-            resp.raise_for_status()
-            data = resp.json()
-            try:
-                with open(cache_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f)
-            except Exception as e:
-                logger.warning(f"Failed to write cache {cache_path}: {e}")
-            return data
+        url = f"{API_ROOT}{endpoint}"
+        logger.info(f"Requesting {url}")
+        resp = await self._send(name, "GET", url, headers=self.headers)
+        resp.raise_for_status()
+        data = resp.json()
+        try:
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+        except Exception as e:
+            logger.warning(f"Failed to write cache {cache_path}: {e}")
+        return data
 
-    @retry(stop=stop_after_attempt(4), wait=wait_exponential(multiplier=1, min=1, max=10), retry=retry_if_exception_type(httpx.RequestError))
-    async def post(self, endpoint: str, json_body: dict, cache_key: str) -> Any:
+    @retry(stop=stop_after_attempt(4), wait=wait_exponential(multiplier=1, min=1, max=10), retry=retry_if_exception_type(httpx.RequestError),
+           before_sleep=_record_backoff)
+    async def post(self, endpoint: str, json_body: dict, cache_key: str, name: Optional[str] = None) -> Any:
+        name = name or _endpoint_label(endpoint)
         cache_path = self._cache_path(endpoint, cache_key)
-        if self._is_fresh(cache_path):
+        fresh = self._is_fresh(cache_path)
+        self.metrics.record_cache(name, fresh)
+        if fresh:
             try:
                 with open(cache_path, "r", encoding="utf-8") as f:
                     logger.debug(f"Cache hit: {cache_path}")
                     return json.load(f)
             except Exception as e:
                 logger.warning(f"Failed to read cache {cache_path}: {e}")
-        url = f"https://api.coresignal.com{endpoint}"
-        async with httpx.AsyncClient(timeout=30) as client:
-            logger.info(f"POSTing {url} with body {json_body}")
-            resp = await client.post(url, headers=self.headers, json=json_body)
-            logger.info(f"HTTP Response: {resp.status_code} {resp.text}")
-            resp.raise_for_status()
-            data = resp.json()
-            try:
-                with open(cache_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f)
-            except Exception as e:
-                logger.warning(f"Failed to write cache {cache_path}: {e}")
-            return data
+        url = f"{API_ROOT}{endpoint}"
+        logger.info(f"POSTing {url} with body {json_body}")
+        resp = await self._send(name, "POST", url, headers=self.headers, json=json_body)
+        logger.info(f"HTTP Response: {resp.status_code} {resp.text}")
+        resp.raise_for_status()
+        data = resp.json()
+        try:
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+        except Exception as e:
+            logger.warning(f"Failed to write cache {cache_path}: {e}")
+        return data
 
     # Endpoint wrappers
     async def person_by_email(self, email: str) -> Any:
-        return await self.get(ENDPOINTS["person_search"].format(email=email), email)
+        return await self.get(ENDPOINTS["person_search"].format(email=email), email, name="person_search")
 
     async def person_profile(self, profile_id: str) -> Any:
-        return await self.get(ENDPOINTS["person_profile"].format(profile_id=profile_id), profile_id)
+        return await self.get(ENDPOINTS["person_profile"].format(profile_id=profile_id), profile_id, name="person_profile")
 
     async def person_skills(self, profile_id: str) -> Any:
-        return await self.get(ENDPOINTS["person_skills"].format(profile_id=profile_id), f"skills_{profile_id}")
+        return await self.get(ENDPOINTS["person_skills"].format(profile_id=profile_id), f"skills_{profile_id}", name="person_skills")
 
     async def org_core(self, org_id: str) -> Any:
-        return await self.get(ENDPOINTS["org_core"].format(org_id=org_id), f"org_{org_id}")
+        return await self.get(ENDPOINTS["org_core"].format(org_id=org_id), f"org_{org_id}", name="org_core")
 
     async def org_headcount(self, org_id: str) -> Any:
-        return await self.get(ENDPOINTS["org_headcount"].format(org_id=org_id), f"head_{org_id}")
+        return await self.get(ENDPOINTS["org_headcount"].format(org_id=org_id), f"head_{org_id}", name="org_headcount")
 
     async def org_funding(self, org_id: str) -> Any:
-        return await self.get(ENDPOINTS["org_funding"].format(org_id=org_id), f"fund_{org_id}")
+        return await self.get(ENDPOINTS["org_funding"].format(org_id=org_id), f"fund_{org_id}", name="org_funding")
 
     async def org_tech(self, org_id: str) -> Any:
-        return await self.get(ENDPOINTS["org_tech"].format(org_id=org_id), f"tech_{org_id}")
+        return await self.get(ENDPOINTS["org_tech"].format(org_id=org_id), f"tech_{org_id}", name="org_tech")
 
     async def org_traffic(self, org_id: str) -> Any:
-        return await self.get(ENDPOINTS["org_traffic"].format(org_id=org_id), f"traffic_{org_id}")
+        return await self.get(ENDPOINTS["org_traffic"].format(org_id=org_id), f"traffic_{org_id}", name="org_traffic")
 
     async def org_jobs(self, org_id: str, date_from: str) -> Any:
-        return await self.get(ENDPOINTS["org_jobs"].format(org_id=org_id, date_from=date_from), f"jobs_{org_id}_{date_from}")
+        return await self.get(ENDPOINTS["org_jobs"].format(org_id=org_id, date_from=date_from), f"jobs_{org_id}_{date_from}", name="org_jobs")
 
     async def person_search_v2(self, email: str) -> Any:
         # POST to /cdapi/v2/member/search/filter with {"email": email}
         endpoint = "/cdapi/v2/member/search/filter"
         body = {"email": email}
-        return await self.post(endpoint, body, f"v2_{email}")
+        return await self.post(endpoint, body, f"v2_{email}", name="member_search")
 
-    def get_member_by_id(self, member_id: int) -> dict:
+    async def member_by_id(self, member_id: int) -> dict:
         """Fetch full member profile by ID from CoreSignal API."""
-        url = f"https://api.coresignal.com/cdapi/v2/member/collect/{member_id}"
+        url = f"{API_ROOT}/cdapi/v2/member/collect/{member_id}"
         headers = {
             "apikey": self.api_key,
             "Content-Type": "application/json"
         }
         try:
-            response = self.session.get(url, headers=headers, timeout=30)
+            response = await self._send("member_collect", "GET", url, headers=headers)
             response.raise_for_status()
             return response.json()
         except Exception as e:
-            logger = logging.getLogger(__name__)
             logger.error(f"Error fetching member by id {member_id}: {e}")
             return {}
 
+    def get_member_by_id(self, member_id: int) -> dict:
+        """Synchronous wrapper for member_by_id."""
+        return self._run_sync(self.member_by_id(member_id))
+
     def collect_company(self, company_id: str) -> dict:
         """Synchronous wrapper for org_core for compatibility with enrichment logic."""
-        import asyncio
         try:
-            return asyncio.run(self.org_core(company_id))
+            return self._run_sync(self.org_core(company_id))
         except Exception as e:
             logger.error(f"Error in collect_company: {e}")
             return {}
@@ -0,0 +1,275 @@
+"""
+Columnar (Parquet) output for enrichment results.
+
+Enriched tables are wide and sparse: hundreds of flattened CoreSignal fields,
+most of them empty for any given lead, and readers usually want a handful of
+them. Parquet stores each column typed and compressed on its own, so the files
+are a fraction of the CSV size and a reader can load just the columns it needs.
+
+`ParquetRowWriter` takes rows as dicts and writes them a row group at a time,
+so a streaming run never holds more than one row group in memory. Column types
+are inferred from the first row group (bool, int64, float64, else string); a
+later value that does not fit widens the column (int64 -> float64, anything
+else -> string). Rows already on disk are not rewritten then: the writer
+continues in a new part file with the wider schema, and close() merges the
+parts once, so every row is copied at most once however often the schema
+widens. Columns that are empty throughout the first row group are strings.
+
+A Parquet file is only readable once its footer is written by close(). Close
+the writer on error paths too (it is idempotent, and the context manager does
+it) to keep the rows written so far; a process that is killed outright leaves
+an unreadable file, where CSV output would keep every flushed row.
+
+pyarrow is optional: it is only imported when Parquet output is asked for.
+"""
+import json
+import logging
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("core_sig.columnar")
+
+OUTPUT_FORMATS = ("csv", "parquet")
+DEFAULT_ROW_GROUP_SIZE = 10000
+DEFAULT_COMPRESSION = "zstd"
+
+BOOL, INT, FLOAT, STRING = "bool", "int64", "float64", "string"
+
+
+def require_pyarrow():
+    """Import pyarrow (and pyarrow.parquet), or fail with a message saying how to get it."""
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def output_path(path: str, output_format: str) -> str:
+    """`path` with the extension for `output_format` (enriched.csv -> enriched.parquet)."""
+    if output_format == "csv":
+        return path
+    return os.path.splitext(path)[0] + "." + output_format
+
+
+def is_null(value) -> bool:
+    """None, NaN and empty strings are nulls, as they read back from the CSV output."""
+    if value is None or (isinstance(value, str) and value == ""):
+        return True
+    return isinstance(value, float) and math.isnan(value)
+
+
+def value_type(value) -> Optional[str]:
+    if is_null(value):
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return BOOL
+    if isinstance(value, (int, np.integer)):
+        return INT if -2 ** 63 <= int(value) < 2 ** 63 else STRING
+    if isinstance(value, (float, np.floating)):
+        return FLOAT
+    return STRING
+
+
+def widen(current: Optional[str], other: Optional[str]) -> Optional[str]:
+    """Narrowest type holding values of both types (None is 'no values seen')."""
+    if current is None or current == other:
+        return other
+    if other is None:
+        return current
+    if {current, other} == {INT, FLOAT}:
+        return FLOAT
+    return STRING
+
+
+def to_string(value) -> Optional[str]:
+    if is_null(value):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def convert(values: Iterable[Any], kind: str) -> list:
+    """Values as Python objects of `kind` (nulls as None), ready for pyarrow."""
+    if kind == STRING:
+        return [to_string(v) for v in values]
+    cast = {BOOL: bool, INT: int, FLOAT: float}[kind]
+    return [None if is_null(v) else cast(v) for v in values]
+
+
+class ParquetRowWriter:
+    """
+    Write dict rows to a Parquet file one row group at a time.
+
+    `columns` fixes the column order; without it, columns are taken from the
+    first row group in first-seen order and any later new key is added (null in
+    earlier rows). Use as a context manager, or call close() to write the footer.
+    """
+
+    def __init__(self, path: str, columns: Optional[List[str]] = None,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE, compression: str = DEFAULT_COMPRESSION):
+        self._pa = require_pyarrow()
+        self.path = path
+        self.columns = list(dict.fromkeys(columns)) if columns is not None else []
+        self._fixed_columns = columns is not None
+        self.row_group_size = max(1, row_group_size)
+        self.compression = compression
+        self.types: Dict[str, str] = {}
+        self.rows_written = 0
+        self.closed = False
+        self._buffer: List[Dict[str, Any]] = []
+        self._writer = None
+        # The first part is `path` itself; each widening starts another, merged into `path` by close()
+        self._parts: List[str] = []
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write_row(self, row: Dict[str, Any]):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def write_rows(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self):
+        """Write the buffered rows as one row group."""
+        if not self._buffer and self._writer is not None:
+            return
+        rows, self._buffer = self._buffer, []
+        columns = list(self.columns)
+        if not self._fixed_columns:
+            known = set(columns)
+            for row in rows:
+                for key in row:
+                    if key not in known:
+                        known.add(key)
+                        columns.append(key)
+        chunk_types = {c: None for c in columns}
+        for row in rows:
+            for c in columns:
+                chunk_types[c] = widen(chunk_types[c], value_type(row.get(c)))
+        if self._writer is None:
+            self.columns = columns
+            self.types = {c: chunk_types[c] or STRING for c in columns}
+            self._start_part()
+        else:
+            wider = {c: widen(self.types.get(c), chunk_types[c]) or STRING for c in columns}
+            if wider != self.types:
+                self._widen(columns, wider)
+        self._write(rows)
+
+    def close(self):
+        """Write the remaining rows and the footer, merging parts if the schema widened. Safe to call twice."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.flush()
+            self._writer.close()
+            self._writer = None
+            if len(self._parts) > 1:
+                self._merge()
+        finally:
+            self._discard_parts()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # On an error too: the rows written so far stay readable
+        self.close()
+
+    def _schema(self):
+        pa = self._pa
+        arrow = {BOOL: pa.bool_(), INT: pa.int64(), FLOAT: pa.float64(), STRING: pa.string()}
+        return pa.schema([(c, arrow[self.types[c]]) for c in self.columns])
+
+    def _open(self, path: str):
+        self._writer = self._pa.parquet.ParquetWriter(path, self._schema(), compression=self.compression)
+
+    def _start_part(self):
+        part = self.path if not self._parts else f"{self.path}.{len(self._parts)}.tmp"
+        self._parts.append(part)
+        self._open(part)
+
+    def _write_group(self, columns: Dict[str, list]):
+        schema = self._schema()
+        arrays = [self._pa.array(convert(columns[c], self.types[c]), type=schema.field(c).type)
+                  for c in self.columns]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=schema))
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        self._write_group({c: [row.get(c) for row in rows] for c in self.columns})
+        self.rows_written += len(rows)
+
+    def _widen(self, columns: List[str], types: Dict[str, str]):
+        """Finish the current part and continue in a new one with the wider schema."""
+        changed = sorted(c for c in columns if self.types.get(c) != types[c])
+        logger.info(f"Widening Parquet columns {changed} in {self.path} after {self.rows_written} rows")
+        self._writer.close()
+        self._writer = None
+        self.columns, self.types = columns, types
+        self._start_part()
+
+    def _merge(self):
+        """Copy every part, converted to the final schema, into one file at `path`."""
+        merged = f"{self.path}.merged.tmp"
+        self._open(merged)
+        for part in self._parts:
+            with self._pa.parquet.ParquetFile(part) as source:
+                for batch in source.iter_batches(batch_size=self.row_group_size):
+                    old = batch.to_pydict()
+                    self._write_group({c: old.get(c, [None] * batch.num_rows) for c in self.columns})
+        self._writer.close()
+        self._writer = None
+        os.replace(merged, self.path)
+
+    def _discard_parts(self):
+        """Close a writer left open by an error and remove every temporary part."""
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+            self._writer = None
+        for path in self._parts[1:] + [f"{self.path}.merged.tmp"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def write_table(rows: Iterable[Dict[str, Any]], path: str, output_format: str = "csv",
+                columns: Optional[List[str]] = None, **parquet_kwargs) -> str:
+    """Write dict rows as CSV (via pandas, as before) or Parquet; returns the path written."""
+    path = output_path(path, output_format)
+    if output_format == "parquet":
+        with ParquetRowWriter(path, columns=columns, **parquet_kwargs) as writer:
+            writer.write_rows(rows)
+    else:
+        df = pd.DataFrame(list(rows))
+        if columns is not None:
+            df = df.reindex(columns=columns)
+        df.to_csv(path, index=False)
+    return path
+
+
+def table_columns(path: str) -> List[str]:
+    """Column names of a CSV or Parquet file without reading its rows."""
+    if path.endswith(".parquet"):
+        return list(require_pyarrow().parquet.read_schema(path).names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_table(path: str, columns: Optional[List[str]] = None, **csv_kwargs) -> pd.DataFrame:
+    """Load a CSV or Parquet file; with `columns`, only those columns are read."""
+    if path.endswith(".parquet"):
+        require_pyarrow()
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns, **csv_kwargs)
@@ -7,13 +7,18 @@ import httpx
 from typing import Any, Dict, List, Optional
 from datetime import datetime
 from tqdm.asyncio import tqdm
-from stuff.config import API_KEY, CONCURRENCY
+from stuff.config import API_KEY, API_ROOT, CONCURRENCY, TRACE_PATH
+from core_sig.checkpoint import CheckpointJournal, lead_key
+from core_sig.flatten import INDEX, flatten_nested
+from core_sig.rate_limit import get_limiter
+from core_sig.tracing import get_tracer
 import logging
 
 logger = logging.getLogger("enrichment")
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
-API_ROOT = "https://api.coresignal.com"
+tracer = get_tracer()
+
 HEADERS = {"Authorization": f"Token {API_KEY}"}
 
 COLUMN_ALIASES = {
@@ -43,15 +48,8 @@ def clean_email(email):
     return email
 
 def flatten(d, parent_key='', sep='__'):
-    if isinstance(d, list):
-        return {f'{parent_key}{sep}{i}': v for i, v in enumerate(d)}
-    if isinstance(d, dict):
-        items = {}
-        for k, v in d.items():
-            new_key = f'{parent_key}{sep}{k}' if parent_key else k
-            items.update(flatten(v, new_key, sep=sep))
-        return items
-    return {parent_key: d}
+    # Lists are indexed from 0 without flattening their items
+    return flatten_nested(d, parent_key, sep, lists=INDEX, index_start=0)
 
 def parse_shorthand(url):
     if not isinstance(url, str) or not url: return None
@@ -96,6 +94,8 @@ def remap_columns(df):
 async def get_json(client, method, endpoint, **kwargs):
     url = f"{API_ROOT}{endpoint}"
     try:
+        # Shared with every other CoreSignal caller in the process (see core_sig.rate_limit)
+        await get_limiter("coresignal").acquire_async()
         resp = await getattr(client, method)(url, headers=HEADERS, **kwargs)
         resp.raise_for_status()
         return resp.json()
@@ -149,14 +149,22 @@ async def enrich_entity(client, kind, **kwargs):
                 return results[:3]
     return results
 
-async def enrich_leads_async(leads: pd.DataFrame) -> pd.DataFrame:
+async def enrich_leads_async(leads: pd.DataFrame, journal: Optional[CheckpointJournal] = None) -> pd.DataFrame:
     async with httpx.AsyncClient(timeout=30) as client:
         tasks = []
-        for _, row in leads.iterrows():
-            tasks.append((row, enrich_entity(client, 'company', company_id=row.get('coresignal_company_id'), company_name=row.get('company_name'), company_url=row.get('company_url')), enrich_entity(client, 'employee', email=row.get('email'), first_name=row.get('first_name'), last_name=row.get('last_name'), company_name=row.get('company_name'), employee_url=row.get('employee_url'))))
         results = []
-        for row, company_coro, employee_coro in tqdm(tasks, desc="Enriching", total=len(tasks)):
-            company_data, employee_data = await asyncio.gather(company_coro, employee_coro)
+        for _, row in leads.iterrows():
+            key = lead_key(row.to_dict(), email_fields=('email',), fallback_fields=('first_name', 'last_name', 'company_name'))
+            if journal is not None and key in journal:
+                results.append(journal.get(key))
+                continue
+            results.append(None)
+            tasks.append((len(results) - 1, key, row, enrich_entity(client, 'company', company_id=row.get('coresignal_company_id'), company_name=row.get('company_name'), company_url=row.get('company_url')), enrich_entity(client, 'employee', email=row.get('email'), first_name=row.get('first_name'), last_name=row.get('last_name'), company_name=row.get('company_name'), employee_url=row.get('employee_url'))))
+        if journal is not None and len(tasks) < len(results):
+            logger.info(f"Skipping {len(results) - len(tasks)} leads already enriched in checkpoint {journal.path}")
+        for pos, key, row, company_coro, employee_coro in tqdm(tasks, desc="Enriching", total=len(tasks)):
+            with tracer.span("enrich_lead"):
+                company_data, employee_data = await asyncio.gather(company_coro, employee_coro)
             base = row.to_dict()
             for i, c in enumerate(company_data):
                 for k, v in c.items():
@@ -164,12 +172,21 @@ async def enrich_leads_async(leads: pd.DataFrame) -> pd.DataFrame:
             for i, e in enumerate(employee_data):
                 for k, v in e.items():
                     base[f'employee_{i+1}__{k}'] = v
-            results.append(base)
+            if journal is not None and key is not None:
+                journal.record(key, base)
+            results[pos] = base
         return pd.DataFrame(results)
 
-def enrich_leads(leads: pd.DataFrame) -> pd.DataFrame:
+def enrich_leads(leads: pd.DataFrame, checkpoint_path: Optional[str] = None) -> pd.DataFrame:
+    """Enrich leads; with checkpoint_path, finished leads are journaled and skipped on re-run."""
     leads = remap_columns(leads)
-    return asyncio.run(enrich_leads_async(leads))
+    if not tracer.enabled:
+        # Written (with the stage table) at exit, so repeated calls share one trace
+        tracer.start(TRACE_PATH)
+    if not checkpoint_path:
+        return asyncio.run(enrich_leads_async(leads))
+    with CheckpointJournal(checkpoint_path) as journal:
+        return asyncio.run(enrich_leads_async(leads, journal))
 
 def diagnose(email=None, company_name=None, first_name=None, last_name=None, company_url=None, employee_url=None):
     async def diag():
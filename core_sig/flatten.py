@@ -0,0 +1,124 @@
+"""
+Single-pass flattener for nested CoreSignal JSON.
+
+The enrichment scripts all turn payloads into flat {key: value} rows, but
+each used to do it with its own recursive function that built a dict per
+level and merged it upward with dict.update, copying keys again at every
+level of nesting. `flatten_nested` walks the payload with an explicit stack
+and writes every leaf straight into one output mapping, in the same order
+the recursive versions did. The separators, the index base, the list limit
+and what happens to lists are parameters, so each caller keeps its key format.
+
+List policies (for a list found under `key`):
+
+    INDEX           items stored as they are under key<index_sep><i>
+    EXPAND          items flattened under key<index_sep><i>
+    JSON            the whole list stored as one JSON string under key
+    JOIN            lists of dicts expanded; other lists stored under key as
+                    one string of their non-None items joined with join_sep
+    JOIN_AND_INDEX  as JOIN, and the items of a joined list also stored as
+                    they are under key<index_sep><i>
+
+`max_items` caps how many items of a list are indexed or expanded (joined
+strings always cover the whole list).
+
+To project a payload instead of flattening all of it, pass `keep(key)`, which
+says whether a leaf key is wanted, and `enter(key)`, which says whether
+anything wanted can lie below a container key. Skipped subtrees are never
+walked, joined or copied.
+"""
+import json
+from itertools import repeat
+from typing import Any, Callable, Dict, Optional
+
+INDEX = "index"
+EXPAND = "expand"
+JSON = "json"
+JOIN = "join"
+JOIN_AND_INDEX = "join+index"
+LIST_POLICIES = (INDEX, EXPAND, JSON, JOIN, JOIN_AND_INDEX)
+
+
+def flatten_nested(obj: Any, parent_key: str = "", sep: str = "_", lists: str = EXPAND,
+                   index_sep: Optional[str] = None, index_start: int = 1, max_items: Optional[int] = None,
+                   join_sep: str = "|", root_sep: Optional[str] = None,
+                   out: Optional[Dict[str, Any]] = None, keep: Optional[Callable[[str], bool]] = None,
+                   enter: Optional[Callable[[str], bool]] = None) -> Dict[str, Any]:
+    """
+    Flatten `obj` into `out` (a new dict by default) and return it.
+
+    Dict keys are joined to their parent with `sep` (a top-level key is used
+    as is when `parent_key` is empty); list items with `index_sep` (default
+    `sep`) and their index counted from `index_start`. `root_sep`, if given,
+    replaces both separators between `parent_key` and the first level.
+    `keep` and `enter` restrict the output to a projection (see above).
+    """
+    if lists not in LIST_POLICIES:
+        raise ValueError(f"Unknown list policy {lists!r}; expected one of {LIST_POLICIES}")
+    if out is None:
+        out = {}
+    if keep is None:
+        keep = enter = _always
+    elif enter is None:
+        enter = _always
+    if index_sep is None:
+        index_sep = sep
+    if not isinstance(obj, (dict, list)):
+        if keep(parent_key):
+            out[parent_key] = obj
+        return out
+
+    def indexed(values):
+        return enumerate(values if max_items is None else values[:max_items], index_start)
+
+    def list_value(key, value, s):
+        """Store a list per the policy; returns a stack frame for its items if they are to be flattened."""
+        if lists == EXPAND or (lists in (JOIN, JOIN_AND_INDEX) and all(map(isinstance, value, repeat(dict)))):
+            return (indexed(value), key, s, True) if value and enter(key) else None
+        if lists == INDEX:
+            if enter(key):
+                for i, v in indexed(value):
+                    k = f"{key}{s}{i}"
+                    if keep(k):
+                        out[k] = v
+        elif lists == JSON:
+            if keep(key):
+                out[key] = json.dumps(value, ensure_ascii=False)
+        else:
+            if keep(key):
+                out[key] = join_sep.join([str(v) for v in value if v is not None])
+            if lists == JOIN_AND_INDEX and enter(key):
+                for i, v in indexed(value):
+                    k = f"{key}{s}{i}"
+                    if keep(k):
+                        out[k] = v
+        return None
+
+    # Frames are (iterator, key prefix, separator, items are list items)
+    if isinstance(obj, dict):
+        stack = [(iter(obj.items()), parent_key, sep if root_sep is None else root_sep, False)]
+    else:
+        top = list_value(parent_key, obj, index_sep if root_sep is None else root_sep)
+        stack = [top] if top is not None else []
+    while stack:
+        it, prefix, s, is_list = stack[-1]
+        for k, value in it:
+            key = f"{prefix}{s}{k}" if prefix or is_list else k
+            if isinstance(value, dict):
+                if value and enter(key):
+                    stack.append((iter(value.items()), key, sep, False))
+                    break
+            elif isinstance(value, list):
+                frame = list_value(key, value, index_sep)
+                if frame is not None:
+                    stack.append(frame)
+                    break
+            elif keep(key):
+                out[key] = value
+        else:
+            stack.pop()
+    return out
+
+
+def _always(key) -> bool:
+    return True
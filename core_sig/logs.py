@@ -0,0 +1,150 @@
+"""
+Logging setup that keeps log I/O off the enrichment hot path.
+
+setup_logging() puts a QueueHandler on the root logger: worker threads only
+append records to a queue, and a QueueListener thread formats them and writes
+the log file and the console. The file rotates by size and old files are
+gzipped (coresignal_enrichment.log.1.gz, ...). Repetitive records are sampled
+before they are queued: after the first `burst` records of a kind (same
+logger, level and leading [TAG] word, or same message shape) only one in
+`every` is kept, and it notes how many were dropped since the last one kept.
+Errors are never sampled.
+"""
+import atexit
+import gzip
+import logging
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+DEFAULT_SAMPLE_BURST = 50
+DEFAULT_SAMPLE_EVERY = 100
+
+_TAGGED = re.compile(r'((?:\[[^\]]*\])+\s*[^\s\d]*)')
+_DIGITS = re.compile(r'\d+')
+
+
+def message_kind(record: logging.LogRecord) -> Tuple[str, int, str]:
+    """What makes two records "the same message" for sampling."""
+    msg = record.msg if isinstance(record.msg, str) else str(record.msg)
+    if not record.args:
+        # Pre-formatted (f-string) message: its [TAG]s and first word, or its shape without numbers
+        tagged = _TAGGED.match(msg)
+        msg = tagged.group(1) if tagged else _DIGITS.sub('#', msg[:40])
+    return record.name, record.levelno, msg
+
+
+class SamplingFilter(logging.Filter):
+    """Passes the first `burst` records of each kind, then one in `every` (every=0 passes all)."""
+
+    def __init__(self, burst: int = DEFAULT_SAMPLE_BURST, every: int = DEFAULT_SAMPLE_EVERY):
+        super().__init__()
+        self.burst = burst
+        self.every = every
+        self._seen: Dict[tuple, int] = {}
+        self._dropped: Dict[tuple, int] = {}
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every <= 0 or record.levelno >= logging.ERROR:
+            return True
+        kind = message_kind(record)
+        with self._lock:
+            seen = self._seen[kind] = self._seen.get(kind, 0) + 1
+            if seen <= self.burst or (seen - self.burst) % self.every == 0:
+                dropped = self._dropped.pop(kind, 0)
+            else:
+                self._dropped[kind] = self._dropped.get(kind, 0) + 1
+                self.suppressed += 1
+                return False
+        if dropped:
+            record.msg = f"{record.getMessage()} [{dropped} similar suppressed]"
+            record.args = None
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"kinds": len(self._seen), "records": sum(self._seen.values()), "suppressed": self.suppressed}
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class GzipRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler whose rotated files are gzipped (log.1.gz, log.2.gz, ...)."""
+
+    def __init__(self, filename: str, max_bytes: int = DEFAULT_MAX_BYTES, backups: int = DEFAULT_BACKUPS,
+                 encoding: Optional[str] = 'utf-8'):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backups, encoding=encoding)
+        self.namer = lambda name: name + '.gz'
+        self.rotator = _gzip_rotator
+
+
+_listener: Optional[QueueListener] = None
+_sampler: Optional[SamplingFilter] = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(log_file: Optional[str], level=logging.INFO, fmt: str = DEFAULT_FORMAT, console=sys.stdout,
+                  max_bytes: int = DEFAULT_MAX_BYTES, backups: int = DEFAULT_BACKUPS,
+                  sample_burst: int = DEFAULT_SAMPLE_BURST, sample_every: int = DEFAULT_SAMPLE_EVERY) -> QueueListener:
+    """
+    Route the root logger through a queue to a rotating gzip log file and the
+    console (either may be None). Calling it again replaces the previous setup.
+    The listener is stopped, and the queue drained, at interpreter exit.
+    """
+    global _listener, _sampler
+    with _setup_lock:
+        root = logging.getLogger()
+        _stop()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        formatter = logging.Formatter(fmt)
+        handlers = []
+        if log_file:
+            handlers.append(GzipRotatingFileHandler(log_file, max_bytes=max_bytes, backups=backups))
+        if console is not None:
+            handlers.append(logging.StreamHandler(console))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        records = queue.SimpleQueue()
+        queue_handler = QueueHandler(records)
+        _sampler = SamplingFilter(sample_burst, sample_every)
+        queue_handler.addFilter(_sampler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+        _listener = QueueListener(records, *handlers, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def get_sampling_stats() -> Dict[str, int]:
+    return _sampler.get_stats() if _sampler is not None else {}
+
+
+def _stop():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+@atexit.register
+def shutdown_logging():
+    """Write out every queued record and close the log file."""
+    with _setup_lock:
+        _stop()
@@ -0,0 +1,269 @@
+"""
+Process-wide metrics for the CoreSignal API clients.
+
+Every client (coresignal_client.CoreSignalClient, core_sig.client's async
+client, company_enrich's direct requests) records into the one registry
+returned by get_metrics():
+
+    coresignal_request_seconds{endpoint}             latency histogram
+    coresignal_responses_total{endpoint,status}      200/404/422/429/... and "error" (no response)
+    coresignal_retries_total{endpoint}               attempts after the first
+    coresignal_wait_seconds_total{endpoint,reason}   time asleep: "rate_limit" (token bucket, incl.
+                                                     429 pauses) or "backoff" (retry delays)
+    coresignal_bytes_sent_total{endpoint}            request bodies
+    coresignal_bytes_received_total{endpoint}        response bodies
+    coresignal_credits_total{endpoint}               credits spent: one per successful request, or
+                                                     one per id of a successful batched collect
+    coresignal_cache_lookups_total{namespace,result} response cache hits and misses
+
+The registry dumps itself as JSON (with p50/p95/p99 per histogram) and in the
+Prometheus text exposition format, e.g. for node_exporter's textfile
+collector. start_dumping() rewrites both files every `interval` seconds
+during a run and once more at exit.
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("core_sig.metrics")
+
+# Upper bounds (seconds) of the latency histogram buckets; a final +Inf bucket is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRICS = {
+    "coresignal_request_seconds": ("histogram", "CoreSignal request latency, one observation per attempt"),
+    "coresignal_responses_total": ("counter", "CoreSignal responses by HTTP status ('error' when no response)"),
+    "coresignal_retries_total": ("counter", "CoreSignal request attempts after the first"),
+    "coresignal_wait_seconds_total": ("counter", "Seconds spent sleeping on the rate limiter or retry backoff"),
+    "coresignal_bytes_sent_total": ("counter", "Request body bytes sent to CoreSignal"),
+    "coresignal_bytes_received_total": ("counter", "Response body bytes received from CoreSignal"),
+    "coresignal_credits_total": ("counter", "CoreSignal credits consumed"),
+    "coresignal_cache_lookups_total": ("counter", "Response cache lookups by result (hit/miss)"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are interpolated within a bucket."""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                if i == len(self.bounds):
+                    return lower  # +Inf bucket: the largest finite bound is all we know
+                return lower + (self.bounds[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, {}
+        for bound, n in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += n
+            buckets["+Inf" if bound == float("inf") else repr(bound)] = cumulative
+        out = {"count": self.count, "sum": round(self.sum, 6)}
+        out.update({f"p{round(q * 100)}": self.quantile(q) for q in QUANTILES})
+        out["buckets"] = buckets
+        return out
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _prom_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _body_size(body) -> int:
+    if body is None:
+        return 0
+    return len(body.encode("utf-8") if isinstance(body, str) else body)
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and label set."""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._started = clock()
+        self._dumper: Optional[threading.Thread] = None
+        self._dump_lock = threading.Lock()
+        self._dump_users = 0
+        self._stop = threading.Event()
+        self._paths: Tuple[Optional[str], Optional[str]] = (None, None)
+        self._atexit = False
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+
+    # --- CoreSignal-specific helpers -------------------------------------------------
+
+    def record_response(self, endpoint: str, response, seconds: float, credits: float = 1.0):
+        """One HTTP attempt that got a response (requests or httpx); credits are only counted for 200s."""
+        request = getattr(response, "request", None)
+        # requests' PreparedRequest has .body, httpx.Request has .content
+        body = getattr(request, "body", None)
+        if body is None:
+            body = getattr(request, "content", None)
+        self.observe("coresignal_request_seconds", seconds, endpoint=endpoint)
+        self.inc("coresignal_responses_total", endpoint=endpoint, status=response.status_code)
+        self.inc("coresignal_bytes_sent_total", _body_size(body), endpoint=endpoint)
+        self.inc("coresignal_bytes_received_total", len(response.content or b""), endpoint=endpoint)
+        if response.status_code == 200 and credits:
+            self.inc("coresignal_credits_total", credits, endpoint=endpoint)
+
+    def record_error(self, endpoint: str, seconds: float):
+        """One HTTP attempt that failed without a response (timeout, connection error)."""
+        self.observe("coresignal_request_seconds", seconds, endpoint=endpoint)
+        self.inc("coresignal_responses_total", endpoint=endpoint, status="error")
+
+    def record_wait(self, endpoint: str, seconds: float, reason: str = "rate_limit"):
+        if seconds > 0:
+            self.inc("coresignal_wait_seconds_total", seconds, endpoint=endpoint, reason=reason)
+
+    def record_retry(self, endpoint: str):
+        self.inc("coresignal_retries_total", endpoint=endpoint)
+
+    def record_cache(self, namespace: str, hit: bool):
+        self.inc("coresignal_cache_lookups_total", namespace=namespace, result="hit" if hit else "miss")
+
+    # --- Export ----------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything recorded so far, as JSON-ready data."""
+        with self._lock:
+            counters = {name: [dict(labels, value=value) for labels, value in series.items()]
+                        for name, series in self._counters.items()}
+            histograms = {name: [dict(labels, **hist.to_dict()) for labels, hist in series.items()]
+                          for name, series in self._histograms.items()}
+        now = self._clock()
+        return {"generated_at": now, "uptime_seconds": round(now - self._started, 3),
+                "counters": counters, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            names = sorted(set(self._counters) | set(self._histograms))
+            for name in names:
+                kind, help_text = METRICS.get(name, ("counter" if name in self._counters else "histogram", ""))
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._counters.get(name, {}).items()):
+                    lines.append(f"{name}{_prom_labels(labels)} {value:g}")
+                for labels, hist in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, n in zip(hist.bounds + (float("inf"),), hist.counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_prom_labels(labels, ('le', le))} {cumulative}")
+                    lines.append(f"{name}_sum{_prom_labels(labels)} {hist.sum:g}")
+                    lines.append(f"{name}_count{_prom_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, json_path: Optional[str] = None, prom_path: Optional[str] = None):
+        """Write the JSON and/or Prometheus files, each atomically (tmp file + rename)."""
+        for path, render in ((json_path, lambda: json.dumps(self.snapshot(), indent=2)),
+                             (prom_path, self.to_prometheus)):
+            if not path:
+                continue
+            tmp = f"{path}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(render())
+                os.replace(tmp, path)
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {path}: {e}")
+
+    def start_dumping(self, json_path: Optional[str], prom_path: Optional[str], interval: float = 30.0):
+        """
+        Dump every `interval` seconds from a background thread, and once more at exit.
+
+        Callers sharing the registry (pipeline steps in one process) each pair
+        this with stop_dumping(); the dumps stop after the last of them.
+        """
+        if not json_path and not prom_path:
+            return
+        with self._dump_lock:
+            self._paths = (json_path, prom_path)
+            self._dump_users += 1
+            if self._dumper is None:
+                self._stop.clear()
+                self._dumper = threading.Thread(target=self._dump_loop, args=(interval,), name="metrics-dump",
+                                                daemon=True)
+                self._dumper.start()
+            if not self._atexit:
+                atexit.register(self._finish_dumping)
+                self._atexit = True
+
+    def _dump_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            self.dump(*self._paths)
+
+    def stop_dumping(self):
+        """Stop the periodic dumps and write the final numbers, once every start_dumping() caller has stopped."""
+        with self._dump_lock:
+            self._dump_users = max(0, self._dump_users - 1)
+            if self._dump_users:
+                return
+        self._finish_dumping()
+
+    def _finish_dumping(self):
+        with self._dump_lock:
+            dumper, self._dumper = self._dumper, None
+            self._dump_users = 0
+            self._stop.set()
+        if dumper is not None:
+            dumper.join(timeout=5)
+            self.dump(*self._paths)
+            logger.info(f"Metrics written to {', '.join(p for p in self._paths if p)}")
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """The process-wide registry every client records into."""
+    return _registry
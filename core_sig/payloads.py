@@ -0,0 +1,142 @@
+"""
+Content-addressed store for raw CoreSignal payloads.
+
+Every company/member payload the enrichment fetches is kept once, compressed,
+in a single SQLite file. Payloads are keyed by the sha256 of their canonical
+JSON, so re-fetching an unchanged record stores nothing new; each (kind,
+entity id) keeps the list of versions it has been seen with. Output rows carry
+a short reference instead of the payload itself:
+
+    company/12345@3f9a0c1d2b4e5f60          # the whole payload
+    company/12345@3f9a0c1d2b4e5f60#experience   # one top-level field of it
+
+`PayloadStore.get(ref)` turns a reference back into the payload.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("core_sig.payloads")
+
+REF_HASH_CHARS = 16
+DEFAULT_COMPRESSION_LEVEL = 6
+
+
+def canonical_json(payload: Any) -> bytes:
+    """The bytes a payload is hashed and stored as: sorted keys, no whitespace."""
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def make_ref(kind: str, entity_id, digest: str, field: Optional[str] = None) -> str:
+    ref = f"{kind}/{entity_id}@{digest[:REF_HASH_CHARS]}"
+    return f"{ref}#{field}" if field else ref
+
+
+def parse_ref(ref: str) -> Tuple[str, str, str, Optional[str]]:
+    """(kind, entity_id, hash prefix, field or None); ValueError if `ref` is not a payload reference."""
+    try:
+        ref, _, field = ref.partition("#")
+        kind, rest = ref.split("/", 1)
+        entity_id, digest = rest.rsplit("@", 1)
+    except ValueError:
+        raise ValueError(f"Not a payload reference: {ref!r}") from None
+    if not kind or not digest:
+        raise ValueError(f"Not a payload reference: {ref!r}")
+    return kind, entity_id, digest, field or None
+
+
+class PayloadStore:
+    """
+    Thread-safe SQLite store of zlib-compressed JSON payloads, deduplicated by
+    content hash, with the versions seen per (kind, entity id).
+    """
+
+    def __init__(self, path: str, level: int = DEFAULT_COMPRESSION_LEVEL, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.level = level
+        self._clock = clock
+        self._lock = threading.Lock()
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " hash TEXT PRIMARY KEY, data BLOB NOT NULL, raw_size INTEGER NOT NULL, stored_size INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions ("
+            " kind TEXT NOT NULL, entity_id TEXT NOT NULL, hash TEXT NOT NULL,"
+            " first_seen REAL NOT NULL, last_seen REAL NOT NULL, PRIMARY KEY (kind, entity_id, hash))"
+        )
+
+    def put(self, kind: str, entity_id, payload: Any) -> str:
+        """Store `payload` (if this exact content is new) and return its reference."""
+        raw = canonical_json(payload)
+        digest = hashlib.sha256(raw).hexdigest()
+        entity_id = "" if entity_id is None else str(entity_id)
+        now = self._clock()
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None:
+                data = zlib.compress(raw, self.level)
+                self._conn.execute("INSERT INTO blobs (hash, data, raw_size, stored_size) VALUES (?, ?, ?, ?)",
+                                   (digest, data, len(raw), len(data)))
+            self._conn.execute(
+                "INSERT INTO versions (kind, entity_id, hash, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(kind, entity_id, hash) DO UPDATE SET last_seen = excluded.last_seen",
+                (kind, entity_id, digest, now, now))
+        return make_ref(kind, entity_id, digest)
+
+    def get(self, ref: str) -> Any:
+        """The payload (or the field of it) a reference points to; KeyError if it is not stored."""
+        kind, entity_id, prefix, field = parse_ref(ref)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT b.data FROM versions v JOIN blobs b ON b.hash = v.hash"
+                " WHERE v.kind = ? AND v.entity_id = ? AND v.hash >= ? AND v.hash < ?",
+                (kind, entity_id, prefix, prefix + "g")).fetchall()
+        if len(rows) != 1:
+            raise KeyError(ref if not rows else f"Ambiguous payload reference: {ref}")
+        payload = json.loads(zlib.decompress(rows[0][0]))
+        return payload.get(field) if field else payload
+
+    def versions(self, kind: str, entity_id) -> List[Dict[str, Any]]:
+        """References to every stored version of an entity, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, first_seen, last_seen FROM versions WHERE kind = ? AND entity_id = ? ORDER BY first_seen",
+                (kind, str(entity_id))).fetchall()
+        return [{"ref": make_ref(kind, entity_id, h), "first_seen": first, "last_seen": last}
+                for h, first, last in rows]
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            blobs, raw, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()
+            versions = self._conn.execute("SELECT COUNT(*) FROM versions").fetchone()[0]
+        return {"payloads": blobs, "versions": versions, "raw_bytes": raw, "stored_bytes": stored}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_stores: Dict[str, PayloadStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_payload_store(path: str, **kwargs) -> PayloadStore:
+    """Return the process-wide payload store for `path`, opening it on first use."""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = PayloadStore(path, **kwargs)
+            _stores[path] = store
+            logger.info(f"Opened payload store {path}")
+        return store
@@ -0,0 +1,242 @@
+"""
+In-process DAG executor for multi-step pipelines.
+
+Steps are plain callables with declared dependencies. A step starts as soon
+as everything it depends on has finished, so independent branches run
+concurrently on a thread pool and share the process-wide rate limiter and
+response cache instead of each paying for a fresh interpreter. A failed step
+stops only the steps downstream of it; every step's timing is reported at the
+end.
+
+A step that returns success without writing every declared output counts as
+failed. Steps that declare their input and output files also get a manifest
+next to their first output, recording the hashes of their inputs, outputs, parameters
+and code. On the next run a step whose manifest still matches is skipped, so
+only the steps downstream of an actual change do any work.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("core_sig.pipeline")
+
+OK = "ok"
+SKIPPED = "skipped"
+FAILED = "failed"
+BLOCKED = "blocked"
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def file_hash(path: str) -> Optional[str]:
+    """sha256 of the file's contents, or None if it does not exist."""
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Step:
+    """
+    One pipeline step: `fn()` returning None/0 on success, or a non-zero exit code.
+
+    `inputs`/`outputs` are file paths and `code` the source files whose
+    contents define the step's behaviour; with outputs declared the step is
+    skipped while its manifest matches. Steps reading an external source
+    (and so with no input files) can set `max_age` seconds after which they
+    run again regardless.
+    """
+
+    def __init__(self, name: str, fn: Callable[[], Optional[int]], deps: Iterable[str] = (),
+                 description: Optional[str] = None, inputs: Iterable[str] = (), outputs: Iterable[str] = (),
+                 params: Optional[dict] = None, code: Iterable[str] = (), max_age: Optional[float] = None):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.description = description or name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.code = list(code)
+        self.max_age = max_age
+
+    @property
+    def manifest_path(self) -> Optional[str]:
+        return self.outputs[0] + MANIFEST_SUFFIX if self.outputs else None
+
+    def fingerprint(self) -> dict:
+        """What the step's result depends on: input hashes, parameters and code hashes."""
+        return {
+            "inputs": {path: file_hash(path) for path in self.inputs},
+            "params": json.loads(json.dumps(self.params, sort_keys=True, default=str)),
+            "code": {os.path.basename(path): file_hash(path) for path in self.code},
+        }
+
+    def read_manifest(self) -> Optional[dict]:
+        path = self.manifest_path
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+            return None
+
+    def write_manifest(self, fingerprint: dict, now: float):
+        manifest = dict(fingerprint, step=self.name, completed=now,
+                        outputs={path: file_hash(path) for path in self.outputs})
+        path = self.manifest_path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+
+    def stale_reason(self, fingerprint: dict, now: float) -> Optional[str]:
+        """Why the step has to run, or None if its manifest says the outputs are current."""
+        manifest = self.read_manifest()
+        if manifest is None:
+            return "no manifest"
+        for key in ("inputs", "params", "code"):
+            if manifest.get(key) != fingerprint[key]:
+                return f"{key} changed"
+        if manifest.get("outputs") != {path: file_hash(path) for path in self.outputs}:
+            return "outputs changed or missing"
+        if self.max_age is not None and now - manifest.get("completed", 0) > self.max_age:
+            return "older than max age"
+        return None
+
+
+class StepResult:
+    def __init__(self, name: str, status: str, start: float = 0.0, end: float = 0.0, error: Optional[str] = None):
+        self.name = name
+        self.status = status
+        self.start = start
+        self.end = end
+        self.error = error
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"StepResult({self.name!r}, {self.status!r}, {self.seconds:.2f}s)"
+
+
+class Pipeline:
+    """Runs `steps` in dependency order, up to `max_workers` at a time."""
+
+    def __init__(self, steps: Iterable[Step], max_workers: int = 4, clock: Callable[[], float] = time.monotonic,
+                 force: Iterable[str] = ()):
+        self.steps: Dict[str, Step] = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError(f"Duplicate step name: {step.name}")
+            self.steps[step.name] = step
+        for step in self.steps.values():
+            missing = [d for d in step.deps if d not in self.steps]
+            if missing:
+                raise ValueError(f"Step '{step.name}' depends on unknown step(s): {missing}")
+        self.order = self._topological_order()
+        self.max_workers = max(1, max_workers)
+        self._clock = clock
+        self.force = set(force)
+        unknown = self.force - set(self.steps) - {"all"}
+        if unknown:
+            raise ValueError(f"Cannot force unknown step(s): {sorted(unknown)}")
+
+    def _topological_order(self) -> List[str]:
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in self.steps[name].deps:
+                visit(dep, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.steps:
+            visit(name, [])
+        return order
+
+    def _run_step(self, step: Step) -> StepResult:
+        start = self._clock()
+        fingerprint = None
+        if step.outputs:
+            fingerprint = step.fingerprint()
+            if step.name in self.force or "all" in self.force:
+                logger.info(f"Forcing: {step.description}")
+            else:
+                reason = step.stale_reason(fingerprint, time.time())
+                if reason is None:
+                    logger.info(f"Skipping {step.description}: inputs, parameters and code unchanged")
+                    return StepResult(step.name, SKIPPED, start, self._clock())
+                logger.info(f"Running {step.description}: {reason}")
+        logger.info(f"Starting: {step.description}")
+        try:
+            code = step.fn()
+        except SystemExit as e:
+            # Script entry points may still call exit(); only a non-zero code is a failure
+            code = e.code
+        except Exception as e:
+            logger.exception(f"Step failed: {step.description}")
+            return StepResult(step.name, FAILED, start, self._clock(), error=repr(e))
+        end = self._clock()
+        if code not in (None, 0):
+            logger.error(f"Step failed: {step.description} (exit code {code})")
+            return StepResult(step.name, FAILED, start, end, error=f"exit code {code}")
+        missing = [path for path in step.outputs if not os.path.isfile(path)]
+        if missing:
+            # No manifest either, so the next run tries the step again
+            logger.error(f"Step failed: {step.description} (did not write {missing})")
+            return StepResult(step.name, FAILED, start, end, error=f"missing outputs: {missing}")
+        if fingerprint is not None:
+            step.write_manifest(fingerprint, time.time())
+        logger.info(f"Completed: {step.description} in {end - start:.1f}s")
+        return StepResult(step.name, OK, start, end)
+
+    def run(self) -> Dict[str, StepResult]:
+        """Run every step; returns results keyed by step name, in topological order."""
+        results: Dict[str, StepResult] = {}
+        pending = list(self.order)
+        running = {}
+        started = self._clock()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="step") as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = [results.get(d) for d in self.steps[name].deps]
+                    if any(r is not None and r.status not in (OK, SKIPPED) for r in deps):
+                        now = self._clock()
+                        results[name] = StepResult(name, BLOCKED, now, now, error="upstream step failed")
+                        logger.warning(f"Skipping {self.steps[name].description}: upstream step failed")
+                        pending.remove(name)
+                    elif all(r is not None for r in deps):
+                        running[pool.submit(self._run_step, self.steps[name])] = name
+                        pending.remove(name)
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        self.wall_seconds = self._clock() - started
+        self.log_report(results)
+        return {name: results[name] for name in self.order}
+
+    def log_report(self, results: Dict[str, StepResult]):
+        width = max(len(n) for n in self.order) if self.order else 0
+        lines = [f"  {name:<{width}}  {results[name].status:<7}  {results[name].seconds:8.1f}s" for name in self.order]
+        total = sum(r.seconds for r in results.values())
+        logger.info("Step timings:\n" + "\n".join(lines) +
+                    f"\n  wall time {self.wall_seconds:.1f}s (sum of steps {total:.1f}s)")
@@ -0,0 +1,130 @@
+"""
+Token-bucket rate limiter shared by all CoreSignal clients.
+
+One bucket per API account: every client (sync or async) draws from the same
+bucket via get_limiter(), so the combined request rate matches the contracted
+credits per second instead of each client pacing itself independently.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger("core_sig.rate_limit")
+
+DEFAULT_RATE = float(os.getenv("CORESIGNAL_CREDITS_PER_SECOND", "1.0"))
+DEFAULT_BURST = int(os.getenv("CORESIGNAL_RATE_LIMIT_BURST", "5"))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    The bucket holds up to `burst` tokens and refills continuously at `rate`
+    tokens per second. Callers reserve tokens under a short lock and sleep
+    outside it, so waiters are served in arrival order and many threads or
+    coroutines can share one bucket. When the server answers 429, penalize()
+    stops refilling until the Retry-After deadline and halves the rate; the
+    contracted rate is restored after `recovery_seconds` without another 429.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: Optional[float] = None,
+                 recovery_seconds: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.min_rate = min_rate or self.rate / 8
+        self.recovery_seconds = recovery_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._current_rate = self.rate
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._last_penalty = None
+
+    @property
+    def current_rate(self) -> float:
+        return self._current_rate
+
+    def _refill(self, now: float):
+        start = max(self._updated, self._blocked_until)
+        if now > start:
+            self._tokens = min(self.burst, self._tokens + (now - start) * self._current_rate)
+        self._updated = max(self._updated, now)
+        if self._last_penalty is not None and now - self._last_penalty >= self.recovery_seconds:
+            self._current_rate = self.rate
+            self._last_penalty = None
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take `tokens` from the bucket and return how long the caller must wait before using them."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens -= tokens
+            ready_at = max(now, self._blocked_until)
+            if self._tokens < 0:
+                ready_at += -self._tokens / self._current_rate
+            return ready_at - now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available. Returns the time spent waiting."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """Async variant of acquire() for httpx/asyncio clients."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, retry_after: float):
+        """Back off after a 429: pause refills for `retry_after` seconds and halve the rate."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._blocked_until = max(self._blocked_until, now + max(0.0, retry_after))
+            self._tokens = min(self._tokens, 0.0)
+            self._current_rate = max(self.min_rate, self._current_rate / 2)
+            self._last_penalty = now
+        logger.warning(f"Rate limited by server: pausing {retry_after:.1f}s, rate now {self._current_rate:.2f}/s")
+
+
+def parse_retry_after(value: Optional[str], default: float = 60.0) -> float:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str = "coresignal", rate: Optional[float] = None, burst: Optional[int] = None) -> TokenBucket:
+    """
+    Return the process-wide bucket called `name`, creating it on first use.
+
+    The first caller's rate/burst win; later callers share the existing bucket.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = TokenBucket(rate or DEFAULT_RATE, burst or DEFAULT_BURST)
+            _limiters[name] = limiter
+            logger.info(f"Created shared rate limiter '{name}': {limiter.rate:.2f} req/s, burst {limiter.burst}")
+        return limiter
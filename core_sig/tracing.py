@@ -0,0 +1,222 @@
+"""
+Per-lead stage timing for the enrichment paths.
+
+Stages are wrapped in spans:
+
+    tracer = get_tracer()
+    with tracer.span("find_best_company_match"):
+        ...
+
+While tracing is off (the default) span() hands back one shared no-op context
+manager, so an instrumented stage costs an attribute check and nothing else.
+After start(path) every span becomes a Chrome trace-event ("X", complete)
+event, appended to `path`.tmp every FLUSH_EVENTS spans; finish() completes
+the JSON, which chrome://tracing or Perfetto can open, moves it to `path`
+and logs a per-stage count/p50/p95/total table. Memory stays bounded on long
+runs: at most FLUSH_EVENTS events are held, and each stage keeps an exact
+count and total but only a uniform sample of MAX_SAMPLES durations for its
+percentiles. Spans opened from asyncio tasks get the task as their track, so
+concurrent leads on one event loop do not overlap on a single row of the
+trace.
+"""
+import asyncio
+import atexit
+import contextlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("core_sig.tracing")
+
+_NULL_SPAN = contextlib.nullcontext()
+
+# Events held before they are appended to the trace file
+FLUSH_EVENTS = 10000
+# Durations kept per stage for its percentiles (count and total are always exact)
+MAX_SAMPLES = 10000
+
+
+def _track_id() -> int:
+    """The current asyncio task when there is one, else the thread."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._record(self.name, self.start, end, self.args)
+        return False
+
+
+class _StageStats:
+    """Exact count and total of a stage's durations, plus a reservoir sample of them."""
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples: List[float] = []
+
+    def add(self, seconds: float, rng: random.Random):
+        self.count += 1
+        self.total += seconds
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            slot = rng.randrange(self.count)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = seconds
+
+
+class Tracer:
+    """Collects spans while enabled; thread- and asyncio-safe."""
+
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._stages: Dict[str, _StageStats] = {}
+        self._file = None
+        self._written = 0
+        self._rng = random.Random(0)
+        self._origin = time.perf_counter()
+        self._atexit = False
+
+    def span(self, name: str, **args):
+        """Context manager timing one stage; extra keyword args land in the event's "args"."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def _record(self, name: str, start: float, end: float, args: Dict[str, Any]):
+        event = {"name": name, "ph": "X", "pid": os.getpid(), "tid": _track_id(),
+                 "ts": round((start - self._origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = _StageStats()
+            stats.add(end - start, self._rng)
+            if len(self._events) >= FLUSH_EVENTS:
+                self._flush()
+
+    def _flush(self):
+        """Append the held events to the trace file (caller holds the lock)."""
+        events, self._events = self._events, []
+        if self._file is None or not events:
+            return
+        try:
+            for event in events:
+                self._file.write((",\n" if self._written else "") + json.dumps(event))
+                self._written += 1
+        except OSError as e:
+            logger.warning(f"Could not write trace to {self.path}: {e}")
+            self._close_file()
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def start(self, path: Optional[str]):
+        """Start collecting spans; finish() (also run at exit) completes the trace file at `path`."""
+        if not path:
+            return
+        with self._lock:
+            self._events.clear()
+            self._stages.clear()
+            self._written = 0
+            try:
+                self._file = open(f"{path}.tmp", "w", encoding="utf-8")
+                self._file.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+            except OSError as e:
+                logger.warning(f"Could not write trace to {path}: {e}")
+                self._file = None
+                return
+        self.path = path
+        self._origin = time.perf_counter()
+        self.enabled = True
+        if not self._atexit:
+            atexit.register(self.finish)
+            self._atexit = True
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage count, p50, p95 and total, in seconds."""
+        with self._lock:
+            stages = {name: (s.count, s.total, sorted(s.samples)) for name, s in self._stages.items()}
+        return {name: {"count": count, "p50": _percentile(samples, 0.5), "p95": _percentile(samples, 0.95),
+                       "total": total}
+                for name, (count, total, samples) in stages.items()}
+
+    def format_summary(self) -> str:
+        rows = sorted(self.summary().items(), key=lambda item: item[1]["total"], reverse=True)
+        width = max([len("stage")] + [len(name) for name, _ in rows])
+        lines = [f"{'stage':<{width}}  {'count':>7}  {'p50 ms':>9}  {'p95 ms':>9}  {'total s':>9}"]
+        for name, s in rows:
+            lines.append(f"{name:<{width}}  {s['count']:>7}  {s['p50'] * 1e3:>9.1f}  {s['p95'] * 1e3:>9.1f}  "
+                         f"{s['total']:>9.2f}")
+        return "\n".join(lines)
+
+    def finish(self):
+        """Stop tracing, complete the trace file and log the per-stage table."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        with self._lock:
+            self._flush()
+            written = self._file is not None
+            if written:
+                try:
+                    self._file.write("\n]}\n")
+                    self._file.close()
+                    self._file = None
+                    os.replace(f"{self.path}.tmp", self.path)
+                except OSError as e:
+                    logger.warning(f"Could not write trace to {self.path}: {e}")
+                    self._close_file()
+                    written = False
+        if written:
+            logger.info(f"Trace written to {self.path}")
+        if self._stages:
+            logger.info("Stage timings:\n" + self.format_summary())
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """The process-wide tracer every enrichment path records into."""
+    return _tracer
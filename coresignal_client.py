@@ -5,13 +5,22 @@ import requests
 import json
 import time
 import logging
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass
 import tldextract
 from config import (
     CORESIGNAL_BASE_URL, CORESIGNAL_API_KEY, ENDPOINTS,
-    RATE_LIMIT_DELAY, MAX_RETRIES, REQUEST_TIMEOUT
+    MAX_RETRIES, REQUEST_TIMEOUT, CREDITS_PER_SECOND, RATE_LIMIT_BURST,
+    CACHE_DB_PATH, CACHE_MAX_ENTRIES, CACHE_TTLS, COLLECT_BATCH_SIZE, PAYLOAD_STORE_PATH
 )
+from core_sig.cache import ResponseCache, get_cache
+from core_sig.metrics import MetricsRegistry, get_metrics
+from core_sig.payloads import PayloadStore, get_payload_store
+from core_sig.rate_limit import TokenBucket, get_limiter, parse_retry_after
+
+_MISSING = object()
+# Statuses with which a collect endpoint rejects ?ids= batches; they are not retried
+BATCH_REJECTED = (400, 404, 405, 422)
 
 logger = logging.getLogger(__name__)
 
@@ -29,13 +38,18 @@ class APIStats:
 class CoreSignalClient:
     """CoreSignal v2 API Client with proper error handling and caching"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, pool_size: int = 10, rate_limiter: TokenBucket = None,
+                 cache: ResponseCache = None, payloads: PayloadStore = None, metrics: MetricsRegistry = None):
         self.api_key = api_key or CORESIGNAL_API_KEY
         if not self.api_key:
             raise ValueError("CoreSignal API key is required")
             
         self.base_url = CORESIGNAL_BASE_URL
         self.session = requests.Session()
+        # One pooled connection per worker thread so concurrent callers reuse sockets
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.session.headers.update({
             "apikey": self.api_key,
             "Content-Type": "application/json",
@@ -43,36 +57,94 @@ class CoreSignalClient:
         })
         
         self.stats = APIStats()
-        self.company_cache: Dict[str, Any] = {}
-        self.member_cache: Dict[str, Any] = {}
-        self.last_request_time = 0
+        # Latency, status, wait, byte and credit metrics, shared by every client in the process
+        self.metrics = metrics or get_metrics()
+        # Persistent across runs, so re-enriching the same leads costs no credits
+        # (an empty ResponseCache is falsy, so test for None rather than using `or`)
+        self.cache = cache if cache is not None else get_cache(CACHE_DB_PATH or ":memory:", ttls=CACHE_TTLS,
+                                                               max_entries=CACHE_MAX_ENTRIES)
+        # Every collected payload is kept raw (compressed, once per version); rows carry a reference
+        self.payloads = payloads or (get_payload_store(PAYLOAD_STORE_PATH) if PAYLOAD_STORE_PATH else None)
+        # (kind, entity id) -> reference, so each payload is serialized and hashed once per run
+        self._payload_refs: Dict[Tuple[str, str], str] = {}
+        self.batch_size = COLLECT_BATCH_SIZE
+        # Collect endpoints that rejected ?ids= batches; those fall back to one id per request
+        self._no_batch = set()
+        # Shared across clients and worker threads so they draw from one credit budget
+        self.rate_limiter = rate_limiter or get_limiter("coresignal", CREDITS_PER_SECOND, RATE_LIMIT_BURST)
         
         logger.info("CoreSignal client initialized")
 
-    def _rate_limit(self):
-        """Implement rate limiting between requests"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < RATE_LIMIT_DELAY:
-            time.sleep(RATE_LIMIT_DELAY - elapsed)
-        self.last_request_time = time.time()
+    def _cache_get(self, namespace: str, key: str) -> Any:
+        value = self.cache.get(namespace, key, _MISSING)
+        if value is not _MISSING:
+            self.stats.cache_hits += 1
+        self.metrics.record_cache(namespace, value is not _MISSING)
+        return value
+
+    def _store_payload(self, kind: str, entity_id: str, data: Any):
+        if self.payloads is not None and isinstance(data, dict):
+            self._payload_refs[(kind, str(entity_id))] = self.payloads.put(kind, entity_id, data)
+
+    def payload_ref(self, kind: str, data: Any) -> Optional[str]:
+        """
+        Reference to a collected payload in the payload store (None when there is no store).
+
+        Payloads collected in this run already have one from the collect step;
+        others (served from the response cache) are stored on first use.
+        """
+        if self.payloads is None or not isinstance(data, dict):
+            return None
+        key = (kind, str(data.get("id")))
+        ref = self._payload_refs.get(key)
+        if ref is None:
+            ref = self._payload_refs[key] = self.payloads.put(kind, data.get("id"), data)
+        return ref
+
+    @staticmethod
+    def _log_response(name: str, response: requests.Response):
+        """Log the start of a response body, at DEBUG only: decoding response.text is not free."""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[API DEBUG] {name} response: {response.status_code} {response.text[:500]}")
+
+    def _rate_limit(self, name: str):
+        """Wait for a token from the shared rate limiter"""
+        self.metrics.record_wait(name, self.rate_limiter.acquire())
+
+    def _backoff(self, name: str, seconds: float):
+        time.sleep(seconds)
+        self.metrics.record_wait(name, seconds, reason="backoff")
+
+    def _make_request(self, method: str, endpoint: str, name: Optional[str] = None, credits: float = 1.0,
+                      give_up_on: Tuple[int, ...] = (), **kwargs) -> requests.Response:
+        """
+        Send a request with rate limiting and retries; `name` labels its metrics (default: the endpoint path).
 
-    def _make_request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        A response whose status is in `give_up_on` is returned as is, without
+        retrying; other failures come back as an empty Response.
+        """
         url = f"{self.base_url}{endpoint}"
+        name = name or endpoint
         payload = kwargs.get('json', None)
         
         for attempt in range(MAX_RETRIES):
+            if attempt:
+                self.metrics.record_retry(name)
+            started = time.perf_counter()
             try:
-                self._rate_limit()
+                self._rate_limit(name)
+                started = time.perf_counter()
                 
                 if 'timeout' not in kwargs:
                     kwargs['timeout'] = REQUEST_TIMEOUT
                 
                 logger.debug(f"API Request: {method} {url}")
-                if 'json' in kwargs:
+                if 'json' in kwargs and logger.isEnabledFor(logging.DEBUG):
                     logger.debug(f"Payload: {json.dumps(kwargs['json'], indent=2)}")
                 
                 response = self.session.request(method, url, **kwargs)
                 self.stats.total_calls += 1
+                self.metrics.record_response(name, response, time.perf_counter() - started, credits)
                 
                 logger.debug(f"Response: {response.status_code}")
                 
@@ -81,15 +153,16 @@ class CoreSignalClient:
                 # In each API call (search and collect), replace file-writing with logger.debug or logger.info as appropriate.
                 # Example: logger.info(f"[CURL DEBUG] {curl_cmd}") and logger.info(f"[CURL DEBUG] response: {response.status_code} {response.text}")
 
-                if response.status_code == 200:
+                if response.status_code == 200 or response.status_code in give_up_on:
                     return response
                 elif response.status_code == 422:
                     logger.error(f"API validation error: {response.text}")
                     break
                 elif response.status_code == 429:
-                    retry_after = int(response.headers.get('Retry-After', 60))
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'), 60)
                     logger.warning(f"Rate limited, waiting {retry_after}s")
-                    time.sleep(retry_after)
+                    # The next _rate_limit() call blocks until the limiter's pause ends
+                    self.rate_limiter.penalize(retry_after)
                     continue
                 elif response.status_code == 401:
                     logger.error("Authentication failed - check API key")
@@ -97,14 +170,15 @@ class CoreSignalClient:
                 else:
                     logger.warning(f"HTTP {response.status_code}: {response.text}")
                     if attempt < MAX_RETRIES - 1:
-                        time.sleep(2 ** attempt)
+                        self._backoff(name, 2 ** attempt)
                         continue
                     break
                     
             except requests.exceptions.RequestException as e:
+                self.metrics.record_error(name, time.perf_counter() - started)
                 logger.error(f"Request failed: {e}")
                 if attempt < MAX_RETRIES - 1:
-                    time.sleep(2 ** attempt)
+                    self._backoff(name, 2 ** attempt)
                     continue
                 break
         
@@ -116,18 +190,19 @@ class CoreSignalClient:
         if not name and not website:
             return []
         cache_key = f"{name}|{website}"
-        if cache_key in self.company_cache:
-            self.stats.cache_hits += 1
-            return self.company_cache[cache_key]
+        cached = self._cache_get("company_search", cache_key)
+        if cached is not _MISSING:
+            return cached
         payload = {}
         if name:
             payload["name"] = name.strip()
         if website:
             payload["website"] = website.strip()
-        logger.info(f"[API DEBUG] company_search payload: {json.dumps(payload)}")
-        response = self._make_request("POST", ENDPOINTS["company_search"], json=payload)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[API DEBUG] company_search payload: {json.dumps(payload)}")
+        response = self._make_request("POST", ENDPOINTS["company_search"], name="company_search", json=payload)
         self.stats.company_searches += 1
-        logger.info(f"[API DEBUG] company_search response: {response.status_code} {response.text[:500]}")
+        self._log_response("company_search", response)
         results = []
         if response.status_code == 200:
             try:
@@ -137,9 +212,10 @@ class CoreSignalClient:
                     raw_results = data[:10]
                 elif isinstance(data, dict) and 'hits' in data:
                     raw_results = data['hits'][:10]
+                details = self.get_company_details_batch([e for e in raw_results if isinstance(e, int)])
                 for entry in raw_results:
                     if isinstance(entry, int):
-                        detailed = self.get_company_details(entry)
+                        detailed = details.get(str(entry))
                         if isinstance(detailed, dict):
                             results.append(detailed)
                         else:
@@ -148,7 +224,7 @@ class CoreSignalClient:
                         results.append(entry)
                     else:
                         logger.warning(f"Company search result is not a dict or int: {entry}")
-                self.company_cache[cache_key] = results
+                self.cache.set("company_search", cache_key, results)
                 logger.debug(f"Found {len(results)} companies for search")
                 return results
             except Exception as e:
@@ -159,37 +235,39 @@ class CoreSignalClient:
         """Return the best company match (first result) for compatibility with enrichment logic."""
         results = self.search_companies(name, website)
         if results:
-            logger.info(f"[DEBUG] search_company found {len(results)} results, returning first.")
+            logger.debug(f"[DEBUG] search_company found {len(results)} results, returning first.")
             return results[0]
-        logger.info("[DEBUG] search_company found no results.")
+        logger.debug("[DEBUG] search_company found no results.")
         return None
 
     def get_company_details(self, company_id: Union[str, int]) -> Optional[Dict]:
-        """Get detailed company information by ID, with debug logging and save raw JSON to file."""
+        """Get detailed company information by ID, served from the persistent cache when fresh."""
         if not company_id:
             return None
         company_id = str(company_id)
-        if company_id in self.company_cache:
-            self.stats.cache_hits += 1
-            return self.company_cache[company_id]
+        cached = self._cache_get("company_collect", company_id)
+        if cached is not _MISSING:
+            return cached
         endpoint = f"{ENDPOINTS['company_collect']}/{company_id}"
-        logger.info(f"[API DEBUG] company_collect endpoint: {endpoint}")
-        response = self._make_request("GET", endpoint)
+        logger.debug(f"[API DEBUG] company_collect endpoint: {endpoint}")
+        response = self._make_request("GET", endpoint, name="company_collect")
         self.stats.company_collects += 1
-        logger.info(f"[API DEBUG] company_collect response: {response.status_code} {response.text[:500]}")
+        self._log_response("company_collect", response)
         if response.status_code == 200:
             try:
                 data = response.json()
-                # Save raw JSON for debugging
-                with open(f"company_{company_id}.json", "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2)
-                self.company_cache[company_id] = data
+                self.cache.set("company_collect", company_id, data)
+                self._store_payload("company", company_id, data)
                 logger.debug(f"Retrieved company details for ID {company_id}")
                 return data
             except Exception as e:
                 logger.error(f"Failed to parse company details: {e}")
         return None
 
+    def get_company_details_batch(self, company_ids: List[Union[str, int]]) -> Dict[str, Dict]:
+        """Get company details for many IDs with as few requests as possible. Returns {id: company}."""
+        return self._collect_batch(company_ids, "company_collect", "company_collects", self.get_company_details)
+
     def collect_company(self, company_id: str) -> Optional[Dict]:
         """Alias for get_company_details for compatibility with enrichment logic."""
         return self.get_company_details(company_id)
@@ -205,13 +283,14 @@ class CoreSignalClient:
         cache_key = json.dumps(payload, sort_keys=True)
         if not payload:
             return []
-        if cache_key in self.member_cache:
-            self.stats.cache_hits += 1
-            return self.member_cache[cache_key]
-        logger.info(f"[API DEBUG] member_search payload: {json.dumps(payload)}")
-        response = self._make_request("POST", ENDPOINTS["member_search"], json=payload)
+        cached = self._cache_get("member_search", cache_key)
+        if cached is not _MISSING:
+            return cached
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[API DEBUG] member_search payload: {json.dumps(payload)}")
+        response = self._make_request("POST", ENDPOINTS["member_search"], name="member_search", json=payload)
         self.stats.member_searches += 1
-        logger.info(f"[API DEBUG] member_search response: {response.status_code} {response.text[:500]}")
+        self._log_response("member_search", response)
         results = []
         if response.status_code == 200:
             try:
@@ -221,9 +300,10 @@ class CoreSignalClient:
                     raw_results = data[:10]
                 elif isinstance(data, dict) and 'hits' in data:
                     raw_results = data['hits'][:10]
+                details = self.get_member_details_batch([e for e in raw_results if isinstance(e, int)])
                 for entry in raw_results:
                     if isinstance(entry, int):
-                        detailed = self.get_member_details(entry)
+                        detailed = details.get(str(entry))
                         if isinstance(detailed, dict):
                             results.append(detailed)
                         else:
@@ -232,7 +312,7 @@ class CoreSignalClient:
                         results.append(entry)
                     else:
                         logger.warning(f"Member search result is not a dict or int: {entry}")
-                self.member_cache[cache_key] = results
+                self.cache.set("member_search", cache_key, results)
                 logger.debug(f"API member search response: {results}")
                 return results
             except Exception as e:
@@ -243,43 +323,91 @@ class CoreSignalClient:
         """Return the best person match (first result) for compatibility with enrichment logic."""
         results = self.search_members(name, experience_company_name)
         if results:
-            logger.info(f"[DEBUG] search_person found {len(results)} results, returning first.")
+            logger.debug(f"[DEBUG] search_person found {len(results)} results, returning first.")
             return results[0]
-        logger.info("[DEBUG] search_person found no results.")
+        logger.debug("[DEBUG] search_person found no results.")
         return None
 
     def get_member_details(self, member_id: Union[str, int]) -> Optional[Dict]:
-        """Get detailed member information by ID, with debug logging and save raw JSON to file."""
+        """Get detailed member information by ID, served from the persistent cache when fresh."""
         if not member_id:
             return None
         member_id = str(member_id)
-        if member_id in self.member_cache:
-            self.stats.cache_hits += 1
-            return self.member_cache[member_id]
+        cached = self._cache_get("member_collect", member_id)
+        if cached is not _MISSING:
+            return cached
         endpoint = f"{ENDPOINTS['member_collect']}/{member_id}"
-        logger.info(f"[API DEBUG] member_collect endpoint: {endpoint}")
-        response = self._make_request("GET", endpoint)
+        logger.debug(f"[API DEBUG] member_collect endpoint: {endpoint}")
+        response = self._make_request("GET", endpoint, name="member_collect")
         self.stats.member_collects += 1
-        logger.info(f"[API DEBUG] member_collect response: {response.status_code} {response.text[:500]}")
+        self._log_response("member_collect", response)
         if response.status_code == 200:
             try:
                 data = response.json()
-                # Save raw JSON for debugging
-                with open(f"member_{member_id}.json", "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2)
-                self.member_cache[member_id] = data
+                self.cache.set("member_collect", member_id, data)
+                self._store_payload("member", member_id, data)
                 logger.debug(f"Retrieved member details for ID {member_id}")
                 return data
             except Exception as e:
                 logger.error(f"Failed to parse member details: {e}")
         return None
 
+    def get_member_details_batch(self, member_ids: List[Union[str, int]]) -> Dict[str, Dict]:
+        """Get member details for many IDs with as few requests as possible. Returns {id: member}."""
+        return self._collect_batch(member_ids, "member_collect", "member_collects", self.get_member_details)
+
+    def _collect_batch(self, ids: List[Union[str, int]], endpoint_name: str, stat: str, collect_one) -> Dict[str, Dict]:
+        """
+        Dedupe ids, serve what the cache has, and collect the rest in chunks of
+        batch_size via `collect?ids=a,b,c`. Ids a batch does not return (or all
+        of them, if the endpoint rejects batches) go through collect_one.
+        """
+        results: Dict[str, Dict] = {}
+        pending = []
+        for raw_id in ids:
+            key = str(raw_id)
+            if not raw_id or key in results or key in pending:
+                continue
+            cached = self._cache_get(endpoint_name, key)
+            if cached is not _MISSING:
+                results[key] = cached
+            else:
+                pending.append(key)
+        endpoint = ENDPOINTS[endpoint_name]
+        for start in range(0, len(pending), self.batch_size):
+            chunk = pending[start:start + self.batch_size]
+            if len(chunk) > 1 and endpoint not in self._no_batch:
+                logger.debug(f"[API DEBUG] {endpoint_name} batch of {len(chunk)} ids")
+                response = self._make_request("GET", endpoint, name=endpoint_name, credits=len(chunk),
+                                              give_up_on=BATCH_REJECTED, params={"ids": ",".join(chunk)})
+                setattr(self.stats, stat, getattr(self.stats, stat) + 1)
+                if response.status_code == 200:
+                    try:
+                        data = response.json()
+                        for item in data if isinstance(data, list) else [data]:
+                            if isinstance(item, dict) and str(item.get("id")) in chunk:
+                                results[str(item["id"])] = item
+                                self.cache.set(endpoint_name, str(item["id"]), item)
+                                self._store_payload(endpoint_name.split("_")[0], str(item["id"]), item)
+                    except Exception as e:
+                        logger.error(f"Failed to parse {endpoint_name} batch response: {e}")
+                elif response.status_code in BATCH_REJECTED:
+                    logger.warning(f"{endpoint_name} does not accept batched ids (HTTP {response.status_code}); collecting one at a time")
+                    self._no_batch.add(endpoint)
+            for key in chunk:
+                if key not in results:
+                    item = collect_one(key)
+                    if isinstance(item, dict):
+                        results[key] = item
+        return results
+
     def collect_person(self, person_id: str) -> Optional[Dict]:
         """Alias for get_member_details for compatibility with enrichment logic."""
         return self.get_member_details(person_id)
 
     def get_stats(self) -> Dict[str, Any]:
-        """Get API usage statistics"""
+        """Get API usage and cache statistics"""
+        sizes = self.cache.sizes()
         return {
             "total_api_calls": self.stats.total_calls,
             "company_searches": self.stats.company_searches,
@@ -289,7 +417,9 @@ class CoreSignalClient:
             "cache_hits": self.stats.cache_hits,
             "errors": self.stats.errors,
             "cache_sizes": {
-                "companies": len(self.company_cache),
-                "members": len(self.member_cache)
-            }
+                "companies": sizes.get("company_search", 0) + sizes.get("company_collect", 0),
+                "members": sizes.get("member_search", 0) + sizes.get("member_collect", 0)
+            },
+            "cache": self.cache.get_stats(),
+            "payloads": self.payloads.get_stats() if self.payloads is not None else None
         }
\ No newline at end of file
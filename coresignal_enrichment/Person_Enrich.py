@@ -21,11 +21,11 @@ def preprocess_leads(df):
         df['company_name'] = df['recipient_email'].str.split('@').str[1].str.split('.').str[0].str.title()
     return df
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Enrich Mademarket recipients with CoreSignal employee data (async, unified logic)")
     parser.add_argument('--input', required=True, help='Input CSV file (from new data collection)')
     parser.add_argument('--output', required=True, help='Output enriched CSV file')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     input_file = args.input
     output_file = args.output
@@ -44,6 +44,8 @@ def main():
     logger.info(f"Enrichment complete. Writing {len(enriched_df)} rows to {output_file}")
     logger.info(f"Enriched columns: {list(enriched_df.columns)}")
     logger.info(f"First 5 enriched rows:\n{enriched_df.head()}\n")
+    if os.path.dirname(output_file):
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
     enriched_df.to_csv(output_file, index=False)
     logger.info("Done.")
 
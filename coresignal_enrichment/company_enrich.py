@@ -1,4 +1,5 @@
 import os
+import sys
 import csv
 import requests
 import time
@@ -7,39 +8,47 @@ from typing import Dict, Any, Optional, List
 from dotenv import load_dotenv
 import argparse
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import (
+    CACHE_DB_PATH, CACHE_MAX_ENTRIES, CACHE_TTLS, CORESIGNAL_API_ROOT, CREDITS_PER_SECOND, METRICS_DUMP_INTERVAL,
+    METRICS_JSON_PATH, METRICS_PROM_PATH, RATE_LIMIT_BURST, TRACE_PATH,
+)
+from core_sig.cache import get_cache
+from core_sig.checkpoint import CheckpointJournal
+from core_sig.flatten import EXPAND, flatten_nested
+from core_sig.columnar import OUTPUT_FORMATS, ParquetRowWriter, output_path, require_pyarrow
+from core_sig.metrics import get_metrics
+from core_sig.rate_limit import get_limiter, parse_retry_after
+from core_sig.tracing import get_tracer
+
 # Load CoreSignal API key
 load_dotenv()
 CORESIGNAL_API_KEY = os.getenv("CORESIGNAL_API_KEY", "")
 if not CORESIGNAL_API_KEY:
     raise RuntimeError("CORESIGNAL_API_KEY environment variable not set.")
 
-SEARCH_ENDPOINT = "https://api.coresignal.com/cdapi/v2/company_multi_source/search/es_dsl"
-COLLECT_ENDPOINT = "https://api.coresignal.com/cdapi/v2/company_multi_source/collect"
+SEARCH_ENDPOINT = f"{CORESIGNAL_API_ROOT}/cdapi/v2/company_multi_source/search/es_dsl"
+COLLECT_ENDPOINT = f"{CORESIGNAL_API_ROOT}/cdapi/v2/company_multi_source/collect"
 HEADERS = {
     "apikey": CORESIGNAL_API_KEY,
     "Content-Type": "application/json"
 }
-RATE_LIMIT_DELAY = 1.0
 MAX_RETRIES = 3
 REQUEST_TIMEOUT = 30
+# Every search and collect draws from the shared CoreSignal token bucket
+rate_limiter = get_limiter("coresignal", rate=CREDITS_PER_SECOND, burst=RATE_LIMIT_BURST)
+# ...and successful lookups land in the shared response cache, so a domain seen
+# in both the opened and unopened files (or a previous run) is only paid for once
+cache = get_cache(CACHE_DB_PATH or ":memory:", ttls=CACHE_TTLS, max_entries=CACHE_MAX_ENTRIES)
+metrics = get_metrics()
+tracer = get_tracer()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 logger = logging.getLogger("Company_Enrich")
 
 def flatten_json(y: Dict[str, Any], parent_key: str = '', sep: str = '__') -> Dict[str, Any]:
-    """Flatten nested JSON structure."""
-    out = {}
-    def flatten(x, name=''):
-        if isinstance(x, dict):
-            for a in x:
-                flatten(x[a], f'{name}{a}{sep}')
-        elif isinstance(x, list):
-            for i, a in enumerate(x):
-                flatten(a, f'{name}{i}{sep}')
-        else:
-            out[name[:-len(sep)]] = x
-    flatten(y, parent_key)
-    return out
+    """Flatten nested JSON structure (parent_key is prefixed with no separator)."""
+    return flatten_nested(y, parent_key, sep, lists=EXPAND, index_start=0, root_sep='')
 
 def extract_domain(email: str) -> str:
     """Extract domain from email address."""
@@ -56,6 +65,18 @@ def normalize_domain(domain: str) -> str:
 def search_company_by_domain(domain: str) -> Optional[str]:
     """Search for company by domain using multiple search strategies."""
     normalized_domain = normalize_domain(domain)
+    company_id = cache.get("domain_search", normalized_domain)
+    metrics.record_cache("domain_search", bool(company_id))
+    if company_id:
+        logger.info(f"[SEARCH] Cached company ID: {company_id} for domain: {domain}")
+        return company_id
+    # Misses are not cached: a None here can also mean a transient error
+    company_id = _search_company_by_domain(domain, normalized_domain)
+    if company_id:
+        cache.set("domain_search", normalized_domain, company_id)
+    return company_id
+
+def _search_company_by_domain(domain: str, normalized_domain: str) -> Optional[str]:
     
     # Strategy 1: Exact match on website field
     payloads = [
@@ -101,8 +122,14 @@ def search_company_by_domain(domain: str) -> Optional[str]:
         logger.info(f"[SEARCH] Strategy {i+1} for domain '{domain}' | Payload: {payload}")
         
         for attempt in range(MAX_RETRIES):
+            if attempt:
+                metrics.record_retry("company_multi_source_search")
+            resp = None
             try:
+                metrics.record_wait("company_multi_source_search", rate_limiter.acquire())
+                started = time.perf_counter()
                 resp = requests.post(SEARCH_ENDPOINT, headers=HEADERS, json=payload, timeout=REQUEST_TIMEOUT)
+                metrics.record_response("company_multi_source_search", resp, time.perf_counter() - started)
                 logger.info(f"[SEARCH] Strategy {i+1} Attempt {attempt+1} | Response: {resp.status_code}")
                 
                 if resp.status_code == 200:
@@ -132,8 +159,9 @@ def search_company_by_domain(domain: str) -> Optional[str]:
                     break  # Try next strategy
                     
                 elif resp.status_code == 429:
-                    logger.warning("Rate limited, sleeping...")
-                    time.sleep(5)
+                    retry_after = parse_retry_after(resp.headers.get('Retry-After'), 5)
+                    logger.warning(f"Rate limited, backing off {retry_after:.0f}s...")
+                    rate_limiter.penalize(retry_after)
                 elif resp.status_code == 403:
                     logger.error("Forbidden: Check API key permissions for multi-source company data.")
                     return None
@@ -144,24 +172,41 @@ def search_company_by_domain(domain: str) -> Optional[str]:
                     logger.warning(f"Unexpected status code {resp.status_code}: {resp.text}")
                     
             except Exception as e:
+                if resp is None:
+                    metrics.record_error("company_multi_source_search", time.perf_counter() - started)
                 logger.error(f"Error during company search: {e}")
                 if attempt < MAX_RETRIES - 1:
                     time.sleep(2)
-        
-        # Small delay between strategies
-        time.sleep(0.5)
+                    metrics.record_wait("company_multi_source_search", 2, reason="backoff")
     
     logger.warning(f"[SEARCH] No company found for domain: {domain} after trying all strategies")
     return None
 
 def collect_company(company_id: str) -> Optional[Dict[str, Any]]:
     """Collect full company details by ID."""
+    data = cache.get("multi_source_collect", str(company_id))
+    metrics.record_cache("multi_source_collect", bool(data))
+    if data:
+        logger.info(f"[COLLECT] Cached data for company ID: {company_id}")
+        return data
+    data = _collect_company(company_id)
+    if data:
+        cache.set("multi_source_collect", str(company_id), data)
+    return data
+
+def _collect_company(company_id: str) -> Optional[Dict[str, Any]]:
     url = f"{COLLECT_ENDPOINT}/{company_id}"
     
     for attempt in range(MAX_RETRIES):
+        if attempt:
+            metrics.record_retry("company_multi_source_collect")
+        resp = None
         try:
             logger.info(f"[COLLECT] Attempt {attempt+1} | URL: {url}")
+            metrics.record_wait("company_multi_source_collect", rate_limiter.acquire())
+            started = time.perf_counter()
             resp = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+            metrics.record_response("company_multi_source_collect", resp, time.perf_counter() - started)
             logger.info(f"[COLLECT] Response: {resp.status_code}")
             
             if resp.status_code == 200:
@@ -170,8 +215,9 @@ def collect_company(company_id: str) -> Optional[Dict[str, Any]]:
                 return data
                 
             elif resp.status_code == 429:
-                logger.warning("Rate limited, sleeping...")
-                time.sleep(5)
+                retry_after = parse_retry_after(resp.headers.get('Retry-After'), 5)
+                logger.warning(f"Rate limited, backing off {retry_after:.0f}s...")
+                rate_limiter.penalize(retry_after)
             elif resp.status_code == 403:
                 logger.error("Forbidden: Check API key permissions for multi-source company data.")
                 break
@@ -182,9 +228,12 @@ def collect_company(company_id: str) -> Optional[Dict[str, Any]]:
                 logger.warning(f"Unexpected status code {resp.status_code}: {resp.text}")
                 
         except Exception as e:
+            if resp is None:
+                metrics.record_error("company_multi_source_collect", time.perf_counter() - started)
             logger.error(f"Error during company collect: {e}")
             if attempt < MAX_RETRIES - 1:
                 time.sleep(2)
+                metrics.record_wait("company_multi_source_collect", 2, reason="backoff")
     
     return None
 
@@ -204,22 +253,16 @@ def test_api_connectivity():
     logger.error("✗ API connectivity test failed - no results for any test domains")
     return False
 
-def main():
-    parser = argparse.ArgumentParser(description="Enrich Mademarket recipients with CoreSignal company data")
-    parser.add_argument('--input', default=os.path.join("Made_Market_Data", "mademarket_2025_ISTE.csv"), help='Input CSV file')
-    parser.add_argument('--output', default=os.path.join("coresignal_enrichment", "company_enriched", "mademarket_2025_ISTE_company_enriched.csv"), help='Output enriched CSV file')
-    parser.add_argument('--test-api', action='store_true', help='Test API connectivity first')
-    parser.add_argument('--limit', type=int, default=5, help='Limit number of domains to process (for testing)')
-    args = parser.parse_args()
-    
+def run(args) -> int:
+    """Enrich the unique recipient domains of args.input and write args.output; returns the exit code."""
     # Test API connectivity if requested
     if args.test_api:
         if not test_api_connectivity():
             logger.error("Exiting due to API connectivity issues")
-            return
+            return 1
     
     input_file = args.input
-    output_file = args.output
+    output_file = output_path(args.output, args.output_format)
     
     # Read input
     logger.info(f"Reading input file: {input_file}")
@@ -230,7 +273,7 @@ def main():
         logger.info(f"Read {len(rows)} rows from input file")
     except Exception as e:
         logger.error(f"Error reading input file: {e}")
-        return
+        return 1
     
     # Get unique domains (limited for testing)
     domains = []
@@ -248,25 +291,36 @@ def main():
     # Query CoreSignal for each domain
     domain_to_company = {}
     successful_lookups = 0
+    journal = CheckpointJournal(args.checkpoint) if args.checkpoint else None
     
     for i, domain in enumerate(domains):
+        if journal is not None and domain in journal:
+            domain_to_company[domain] = journal.get(domain) or {}
+            if domain_to_company[domain]:
+                successful_lookups += 1
+            logger.info(f"Domain {i+1}/{len(domains)} already in checkpoint: {domain}")
+            continue
         logger.info(f"Processing domain {i+1}/{len(domains)}: {domain}")
         
-        company_id = search_company_by_domain(domain)
-        if company_id:
-            company_data = collect_company(company_id)
-            if company_data:
-                domain_to_company[domain] = flatten_json(company_data, parent_key='cs_company')
-                successful_lookups += 1
-                logger.info(f"✓ Successfully enriched domain: {domain}")
+        with tracer.span("enrich_domain"):
+            company_id = search_company_by_domain(domain)
+            if company_id:
+                company_data = collect_company(company_id)
+                if company_data:
+                    domain_to_company[domain] = flatten_json(company_data, parent_key='cs_company')
+                    successful_lookups += 1
+                    logger.info(f"✓ Successfully enriched domain: {domain}")
+                else:
+                    domain_to_company[domain] = {}
+                    logger.warning(f"✗ Found company ID but failed to collect data for: {domain}")
             else:
                 domain_to_company[domain] = {}
-                logger.warning(f"✗ Found company ID but failed to collect data for: {domain}")
-        else:
-            domain_to_company[domain] = {}
-            logger.warning(f"✗ No company found for domain: {domain}")
-        
-        time.sleep(RATE_LIMIT_DELAY)
+                logger.warning(f"✗ No company found for domain: {domain}")
+        # A failed collect is likely transient, so leave that domain for the next run
+        if journal is not None and (domain_to_company[domain] or not company_id):
+            journal.record(domain, domain_to_company[domain])
+    if journal is not None:
+        journal.close()
     
     logger.info(f"Successfully enriched {successful_lookups}/{len(domains)} domains")
     
@@ -274,42 +328,84 @@ def main():
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     
     try:
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            # Filter rows to only include those with processed domains
-            filtered_rows = [row for row in rows if extract_domain(row.get('recipient_email', '')) in domains]
+        # Filter rows to only include those with processed domains
+        filtered_rows = [row for row in rows if extract_domain(row.get('recipient_email', '')) in domains]
+        
+        if filtered_rows:
+            fieldnames = list(filtered_rows[0].keys())
             
-            if filtered_rows:
-                fieldnames = list(filtered_rows[0].keys())
-                
-                # Add all company fields found
-                all_company_fields = set()
-                for v in domain_to_company.values():
-                    all_company_fields.update(v.keys())
-                fieldnames += sorted([f for f in all_company_fields if f not in fieldnames])
-                
+            # Add all company fields found
+            all_company_fields = set()
+            for v in domain_to_company.values():
+                all_company_fields.update(v.keys())
+            fieldnames += sorted([f for f in all_company_fields if f not in fieldnames])
+            
+            if args.output_format == 'parquet':
+                f = None
+                writer = ParquetRowWriter(output_file, columns=fieldnames)
+            else:
+                f = open(output_file, 'w', newline='', encoding='utf-8')
                 writer = csv.DictWriter(f, fieldnames=fieldnames)
                 writer.writeheader()
-                
-                for row in filtered_rows:
-                    domain = extract_domain(row.get('recipient_email', ''))
-                    company_data = domain_to_company.get(domain, {})
-                    out_row = row.copy()
-                    out_row.update(company_data)
+            
+            for row in filtered_rows:
+                domain = extract_domain(row.get('recipient_email', ''))
+                company_data = domain_to_company.get(domain, {})
+                out_row = row.copy()
+                out_row.update(company_data)
+                if f is None:
+                    writer.write_row(out_row)
+                else:
                     writer.writerow(out_row)
-                
-                logger.info(f"✓ Wrote enriched CSV to {output_file}")
-                logger.info(f"Output contains {len(filtered_rows)} rows with {len(all_company_fields)} company fields")
+            if f is None:
+                writer.close()
+            else:
+                f.close()
+            
+            logger.info(f"✓ Wrote enriched {args.output_format.upper()} to {output_file}")
+            logger.info(f"Output contains {len(filtered_rows)} rows with {len(all_company_fields)} company fields")
+        else:
+            if args.output_format == 'csv':
+                open(output_file, 'w', newline='', encoding='utf-8').close()
             else:
-                logger.warning("No rows to write to output file")
+                # An empty table that still carries the input columns
+                ParquetRowWriter(output_file, columns=list(reader.fieldnames or [])).close()
+            logger.warning("No rows to write to output file")
                 
     except Exception as e:
         logger.error(f"Error writing output file: {e}")
-        return
+        return 1
     
     print(f"Enrichment complete:")
     print(f"  - Processed {len(domains)} unique domains")
     print(f"  - Successfully enriched {successful_lookups} companies")
     print(f"  - Output written to: {output_file}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enrich Mademarket recipients with CoreSignal company data")
+    parser.add_argument('--input', default=os.path.join("Made_Market_Data", "mademarket_2025_ISTE.csv"), help='Input CSV file')
+    parser.add_argument('--output', default=os.path.join("coresignal_enrichment", "company_enriched", "mademarket_2025_ISTE_company_enriched.csv"), help='Output enriched CSV file')
+    parser.add_argument('--test-api', action='store_true', help='Test API connectivity first')
+    parser.add_argument('--limit', type=int, default=5, help='Limit number of domains to process (for testing)')
+    parser.add_argument('--checkpoint', help='Journal of finished domains; re-running with the same file skips them')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv', help='csv, or parquet for typed, compressed columnar output (needs pyarrow)')
+    args = parser.parse_args(argv)
+    if args.output_format == 'parquet':
+        try:
+            require_pyarrow()
+        except RuntimeError as e:
+            logger.error(str(e))
+            return 1
+    
+    metrics.start_dumping(METRICS_JSON_PATH, METRICS_PROM_PATH, METRICS_DUMP_INTERVAL)
+    if not tracer.enabled:
+        # Written (with the stage table) at exit, so repeated calls share one trace
+        tracer.start(TRACE_PATH)
+    try:
+        return run(args)
+    finally:
+        metrics.stop_dumping()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -1,5 +1,7 @@
-import subprocess
 import os
+import sys
+import argparse
+import importlib
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
@@ -7,13 +9,34 @@ logger = logging.getLogger("FullPipeline")
 
 # Determine project root (directory containing both Made_Market and coresignal_enrichment)
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The step scripts are imported and run in this process rather than as subprocesses
+for path in (PROJECT_ROOT, os.path.join(PROJECT_ROOT, "Made_Market"), os.path.join(PROJECT_ROOT, "coresignal_enrichment")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
 
-# Paths to scripts
-mademarket_pull = os.path.join(PROJECT_ROOT, "Made_Market", "MadeMarket_Pull.py")
-company_enrich = os.path.join(PROJECT_ROOT, "coresignal_enrichment", "Company_Enrich.py")
-person_enrich = os.path.join(PROJECT_ROOT, "coresignal_enrichment", "Person_Enrich.py")
+from config import CREDITS_PER_SECOND, RATE_LIMIT_BURST
+from core_sig.pipeline import FAILED, BLOCKED, Pipeline, Step
+from core_sig.rate_limit import get_limiter
+
+# Modules whose main(argv) implements each step
+mademarket_pull = "MadeMarket_Pull"
+company_enrich = "company_enrich"
+person_enrich = "Person_Enrich"
+
+# Source files that define each step's behaviour; editing one re-runs that step
+pull_code = [os.path.join(PROJECT_ROOT, "Made_Market", "MadeMarket_Pull.py"),
+             os.path.join(PROJECT_ROOT, "Made_Market", "mademarket_store.py")]
+company_code = [os.path.join(PROJECT_ROOT, "coresignal_enrichment", "company_enrich.py"),
+                os.path.join(PROJECT_ROOT, "config.py")] + [
+                   os.path.join(PROJECT_ROOT, "core_sig", f"{module}.py")
+                   for module in ("cache", "checkpoint", "columnar", "flatten", "metrics", "rate_limit", "tracing")]
+person_code = [os.path.join(PROJECT_ROOT, "coresignal_enrichment", "Person_Enrich.py"),
+               os.path.join(PROJECT_ROOT, "stuff", "config.py")] + [
+                  os.path.join(PROJECT_ROOT, "core_sig", f"{module}.py")
+                  for module in ("enrichment", "checkpoint", "flatten", "rate_limit", "tracing")]
 
 # Input/Output files
+pull_csv = os.path.join(PROJECT_ROOT, "Made_Market_Data", "mademarket_2025_ISTE.csv")
 opened_csv = os.path.join(PROJECT_ROOT, "Made_Market_Data", "opened", "mademarket_2025_ISTE_opened.csv")
 unopened_csv = os.path.join(PROJECT_ROOT, "Made_Market_Data", "unopened", "mademarket_2025_ISTE_unopened.csv")
 company_opened_out = os.path.join(PROJECT_ROOT, "coresignal_enrichment", "company_enriched", "opened_enriched.csv")
@@ -22,28 +45,62 @@ person_opened_out = os.path.join(PROJECT_ROOT, "coresignal_enrichment", "person_
 person_unopened_out = os.path.join(PROJECT_ROOT, "coresignal_enrichment", "person_enriched", "unopened_enriched.csv")
 
 
-def run_step(cmd_args, desc):
-    logger.info(f"Starting: {desc}")
-    result = subprocess.run(cmd_args)
-    if result.returncode != 0:
-        logger.error(f"Step failed: {desc}")
-        exit(1)
-    logger.info(f"Completed: {desc}")
+def script_step(module_name, argv):
+    """Step callable that imports `module_name` on first run and calls its main(argv)."""
+    def run():
+        return importlib.import_module(module_name).main(argv)
+    return run
+
+
+def enrich_step(name, module_name, input_csv, output_csv, code, description):
+    argv = ["--input", input_csv, "--output", output_csv]
+    return Step(name, script_step(module_name, argv), deps=["pull"], description=description,
+                inputs=[input_csv], outputs=[output_csv], params={"argv": argv}, code=code)
 
 
-def main():
-    # 1. Pull and segment Mademarket data
-    run_step(["python", mademarket_pull], "Pull and segment Mademarket data")
+def build_steps(pull_max_age=None):
+    return [
+        # 1. Pull and segment Mademarket data (no input files, so it is refreshed by age)
+        Step("pull", script_step(mademarket_pull, []), description="Pull and segment Mademarket data",
+             outputs=[pull_csv, opened_csv, unopened_csv], params={"argv": []}, code=pull_code,
+             max_age=pull_max_age),
+        # 2. Company enrichment
+        enrich_step("company_opened", company_enrich, opened_csv, company_opened_out, company_code,
+                    "Company enrichment (opened)"),
+        enrich_step("company_unopened", company_enrich, unopened_csv, company_unopened_out, company_code,
+                    "Company enrichment (unopened)"),
+        # 3. Person enrichment
+        enrich_step("person_opened", person_enrich, opened_csv, person_opened_out, person_code,
+                    "Person enrichment (opened)"),
+        enrich_step("person_unopened", person_enrich, unopened_csv, person_unopened_out, person_code,
+                    "Person enrichment (unopened)"),
+    ]
 
-    # 2. Company enrichment
-    run_step(["python", company_enrich, "--input", opened_csv, "--output", company_opened_out], "Company enrichment (opened)")
-    run_step(["python", company_enrich, "--input", unopened_csv, "--output", company_unopened_out], "Company enrichment (unopened)")
 
-    # 3. Person enrichment
-    run_step(["python", person_enrich, "--input", opened_csv, "--output", person_opened_out], "Person enrichment (opened)")
-    run_step(["python", person_enrich, "--input", unopened_csv, "--output", person_unopened_out], "Person enrichment (unopened)")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pull Mademarket data and run the CoreSignal enrichments")
+    parser.add_argument('--max-workers', type=int, default=4,
+                        help='Steps run at once once their inputs are ready (1 runs them one after another)')
+    parser.add_argument('--force', action='append', default=[], metavar='STEP',
+                        help='Re-run STEP even if its inputs, parameters and code are unchanged (repeatable; "all" for every step)')
+    parser.add_argument('--pull-max-age', type=float, default=0,
+                        help='Hours a finished Mademarket pull is reused for (default 0: pull on every run)')
+    args = parser.parse_args(argv)
 
+    # Create the shared limiter up front so every step draws from the same configured bucket
+    get_limiter("coresignal", rate=CREDITS_PER_SECOND, burst=RATE_LIMIT_BURST)
+    steps = build_steps(pull_max_age=args.pull_max_age * 3600)
+    try:
+        pipeline = Pipeline(steps, max_workers=args.max_workers, force=args.force)
+    except ValueError as e:
+        parser.error(f"{e}; steps are: {', '.join(step.name for step in steps)}")
+    results = pipeline.run()
+    failed = [name for name, result in results.items() if result.status in (FAILED, BLOCKED)]
+    if failed:
+        logger.error(f"Pipeline finished with failed or skipped steps: {failed}")
+        return 1
     logger.info("Full pipeline completed successfully.")
+    return 0
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main()) 
\ No newline at end of file
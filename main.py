@@ -45,9 +45,9 @@ import requests
 import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Union
+from functools import lru_cache
 from dotenv import load_dotenv
 import random
-import re
 import argparse
 from fuzzywuzzy import fuzz
 import tldextract
@@ -56,6 +56,9 @@ import numpy as np
 import collections.abc
 from difflib import SequenceMatcher
 import math
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables
 load_dotenv()
@@ -63,15 +66,15 @@ load_dotenv()
 # Ensure config.py is importable regardless of working directory
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('coresignal_enrichment.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
+# Setup logging: records go through a queue to a background thread that writes
+# the (rotated, gzipped) log file and stdout; repetitive records are sampled
+from config import (
+    LOG_BACKUPS, LOG_LEVEL, LOG_MAX_BYTES, LOG_SAMPLE_BURST, LOG_SAMPLE_EVERY,
+    METRICS_DUMP_INTERVAL, METRICS_JSON_PATH, METRICS_PROM_PATH, TRACE_PATH, CORESIGNAL_API_ROOT,
 )
+from core_sig.logs import get_sampling_stats, setup_logging
+setup_logging('coresignal_enrichment.log', level=LOG_LEVEL.upper(), max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS,
+              sample_burst=LOG_SAMPLE_BURST, sample_every=LOG_SAMPLE_EVERY)
 logger = logging.getLogger(__name__)
 
 # Now import OUTPUT_SCHEMA
@@ -80,10 +83,18 @@ try:
 except ImportError as e:
     logger.error(f"Could not import OUTPUT_SCHEMA from config.py: {e}")
     sys.exit(1)
+from schema_resolver import SchemaProjection, get_resolver
+from core_sig.checkpoint import CheckpointJournal, lead_key
+from core_sig.flatten import JOIN_AND_INDEX, flatten_nested
+from core_sig.columnar import OUTPUT_FORMATS, ParquetRowWriter, output_path, require_pyarrow, write_table
+from core_sig.tracing import get_tracer
+
+# Stage spans (no-ops unless --trace is given)
+tracer = get_tracer()
 
 # Configuration
 API_KEY = os.getenv('CORESIGNAL_API_KEY')
-BASE_URL = "https://api.coresignal.com/cdapi"
+BASE_URL = f"{CORESIGNAL_API_ROOT}/cdapi"
 REQUEST_TIMEOUT = 30
 MAX_RETRIES = 3
 INITIAL_RETRY_DELAY = 1
@@ -128,90 +139,14 @@ def calculate_name_similarity(name1: str, name2: str) -> float:
         return 1.0
     return fuzz.ratio(name1, name2) / 100.0
 
-def flatten_dict(d: dict, prefix: str = "") -> dict:
-    """Recursively flatten a nested dictionary or list into a flat dict with dynamic keys."""
-    flat = {}
-    try:
-        if isinstance(d, dict):
-            for k, v in d.items():
-                new_prefix = f"{prefix}_{k}" if prefix else k
-                if isinstance(v, dict):
-                    flat.update(flatten_dict(v, new_prefix))
-                elif isinstance(v, list):
-                    if all(isinstance(item, dict) for item in v):
-                        for idx, item in enumerate(v, 1):
-                            try:
-                                flat.update(flatten_dict(item, f"{new_prefix}_{idx}"))
-                            except Exception as e:
-                                logger.error(f"Error flattening list item at {new_prefix}_{idx}: {e}")
-                    else:
-                        try:
-                            flat[new_prefix] = '|'.join(str(item) for item in v if item is not None)
-                        except Exception as e:
-                            logger.error(f"Error joining array at {new_prefix}: {e}")
-                else:
-                    flat[new_prefix] = str(v) if v is not None else ''
-        elif isinstance(d, list):
-            for idx, item in enumerate(d, 1):
-                try:
-                    flat.update(flatten_dict(item, f"{prefix}_{idx}"))
-                except Exception as e:
-                    logger.error(f"Error flattening top-level list at {prefix}_{idx}: {e}")
-        else:
-            flat[prefix] = str(d) if d is not None else ''
-    except Exception as e:
-        logger.error(f"Error flattening dict at {prefix}: {e}")
-    return flat
+def flatten_all_fields(d, parent_key='', sep='_', max_items=5, projection: Optional[SchemaProjection] = None):
+    """Flatten any JSON: lists of dicts expanded, other lists both '|'-joined and indexed (first max_items).
 
-def flatten_multisource_json(d, parent_key='', sep='_', max_items=5):
-    """Recursively flatten a nested dict/list structure for multi-source CoreSignal JSON."""
-    items = {}
-    if isinstance(d, dict):
-        for k, v in d.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.update(flatten_multisource_json(v, new_key, sep, max_items))
-            elif isinstance(v, list):
-                for i, item in enumerate(v[:max_items], 1):
-                    if isinstance(item, dict):
-                        items.update(flatten_multisource_json(item, f"{new_key}_{i}", sep, max_items))
-                    else:
-                        items[f"{new_key}_{i}"] = item
-                if all(isinstance(item, (str, int, float, bool, type(None))) for item in v):
-                    # Also join all values for a summary field
-                    items[new_key] = ", ".join(str(x) for x in v if x is not None)
-            else:
-                items[new_key] = v
-    else:
-        items[parent_key] = d
-    return items
-
-def flatten_all_fields(d, parent_key='', sep='_', max_items=5):
-    """Recursively flatten a nested dict/list structure for any JSON, including all arrays and dicts."""
-    items = {}
-    if isinstance(d, dict):
-        for k, v in d.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.update(flatten_all_fields(v, new_key, sep, max_items))
-            elif isinstance(v, list):
-                # For lists of dicts, flatten each up to max_items
-                if all(isinstance(item, dict) for item in v):
-                    for i, item in enumerate(v[:max_items], 1):
-                        items.update(flatten_all_fields(item, f"{new_key}_{i}", sep, max_items))
-                # For lists of primitives, join as string and also keep first N
-                else:
-                    items[new_key] = '|'.join(str(item) for item in v if item is not None)
-                    for i, item in enumerate(v[:max_items], 1):
-                        items[f"{new_key}_{i}"] = item
-            else:
-                items[new_key] = v
-    elif isinstance(d, list):
-        for i, item in enumerate(d[:max_items], 1):
-            items.update(flatten_all_fields(item, f"{parent_key}_{i}", sep, max_items))
-    else:
-        items[parent_key] = d
-    return items
+    With a projection only the keys it keeps are materialized.
+    """
+    keep, enter = (projection.keep, projection.enter) if projection is not None else (None, None)
+    return flatten_nested(d, parent_key, sep, lists=JOIN_AND_INDEX, index_sep='_', max_items=max_items,
+                          keep=keep, enter=enter)
 
 def find_best_company_match(api, company_name: str, company_website: str) -> dict:
     """Find the best company match using multiple strategies and fuzzy matching."""
@@ -279,42 +214,79 @@ def find_best_employee_match(api, full_name: str, company_name: str) -> dict:
     logger.info(f"[EMPLOYEE SEARCH] Best match score: {best_score}")
     return best_match
 
+# (months field, duration text it is parsed from) for smart_postprocess
+EXPERIENCE_DURATION_KEYS = [(f"employee_experience_{i}_duration_months", f"employee_experience_{i}_duration") for i in range(1, 6)]
+
+
+def duration_months(exp_str: str) -> str:
+    """Months in an experience duration like "2 years 3 months", as a string."""
+    years = months = 0
+    if 'year' in exp_str:
+        try:
+            years = int(exp_str.split('year')[0].strip())
+        except Exception:
+            years = 0
+    if 'month' in exp_str:
+        try:
+            months = int(exp_str.split('month')[0].split()[-2].strip()) if 'month' in exp_str else 0
+        except Exception:
+            months = 0
+    return str(years * 12 + months)
+
+
+@lru_cache(maxsize=65536)
+def date_year(text: str) -> Optional[str]:
+    """Year of a (fuzzy) date string, or None if it does not parse. Memoized: leads repeat the same dates."""
+    try:
+        return str(dateutil.parser.parse(text, fuzzy=True).year)
+    except Exception:
+        return None
+
+
+def postprocess_rows(rows: List[dict]) -> List[Dict[str, tuple]]:
+    """Try to convert non-actionable or empty fields into usable data using creative logic.
+
+    Works on a batch of enriched rows in place and returns, for each row, the
+    fields it changed as {field: (before, after)}. New derived fields
+    (*_year, *_numeric) are added, not reported as changes. Running it again
+    over its own output changes nothing.
+    """
+    changes = []
+    for row in rows:
+        changed = {}
+        # 1. Parse experience durations
+        for dur_key, exp_key in EXPERIENCE_DURATION_KEYS:
+            if dur_key in row and (not row[dur_key] or not str(row[dur_key]).isdigit()):
+                exp_str = row.get(exp_key, "")
+                if exp_str:
+                    before, row[dur_key] = row[dur_key], duration_months(str(exp_str))
+                    if before != row[dur_key]:
+                        changed[dur_key] = (before, row[dur_key])
+        # 2. Parse dates to year
+        for key in list(row):
+            if key.endswith('_date'):
+                value = row[key]
+                if value and isinstance(value, str):
+                    year = date_year(value)
+                    if year is not None:
+                        row[key + '_year'] = year
+        # 3. Convert string numbers (not the *_numeric fields themselves, so a second pass adds nothing)
+        for key in list(row):
+            value = row[key]
+            if key.endswith('_numeric'):
+                continue
+            if isinstance(value, str) and value.replace(',', '').replace('.', '').isdigit():
+                try:
+                    row[key + '_numeric'] = str(float(value.replace(',', '')))
+                except Exception:
+                    pass
+        changes.append(changed)
+    return changes
+
+
 def smart_postprocess(row: dict) -> dict:
-    """Try to convert non-actionable or empty fields into usable data using creative logic."""
-    # 1. Parse experience durations
-    for i in range(1, 6):
-        dur_key = f"employee_experience_{i}_duration_months"
-        if dur_key in row and (not row[dur_key] or not str(row[dur_key]).isdigit()):
-            exp_str = row.get(f"employee_experience_{i}_duration", "")
-            if exp_str:
-                years = months = 0
-                if 'year' in exp_str:
-                    try:
-                        years = int(exp_str.split('year')[0].strip())
-                    except Exception:
-                        years = 0
-                if 'month' in exp_str:
-                    try:
-                        months = int(exp_str.split('month')[0].split()[-2].strip()) if 'month' in exp_str else 0
-                    except Exception:
-                        months = 0
-                row[dur_key] = str(years * 12 + months)
-    # 2. Parse dates to year
-    for key in list(row):
-        if key.endswith('_date') or key.endswith('_announced_date'):
-            try:
-                if row[key]:
-                    dt = dateutil.parser.parse(row[key], fuzzy=True)
-                    row[key + '_year'] = str(dt.year)
-            except Exception:
-                pass
-    # 3. Convert string numbers
-    for key in list(row):
-        if isinstance(row[key], str) and row[key].replace(',', '').replace('.', '').isdigit():
-            try:
-                row[key + '_numeric'] = str(float(row[key].replace(',', '')))
-            except Exception:
-                pass
+    """postprocess_rows for a single row; returns the row."""
+    postprocess_rows([row])
     return row
 
 def extract_member_collections(member_json: dict) -> dict:
@@ -425,250 +397,265 @@ def extract_company_collections(company_json: dict) -> dict:
             logger.debug(f"[ENRICH] Unmapped company field: {k}")
     return mapped
 
-def enrich_lead(api, lead: dict) -> dict:
-    """Enrich a single lead with robust company and employee finding, flattening, and field population."""
-    enriched = lead.copy()
-    contact_email = lead.get('contact_email', '').strip()
-    contact_full_name = lead.get('contact_full_name', '').strip()
-    contact_firm_name = lead.get('contact_firm_name', '').strip()
-    cs_company_website = lead.get('cs_company_website', '').strip()
-    # --- Company search ---
+def resolve_company(api, contact_firm_name: str, cs_company_website: str) -> Optional[dict]:
+    """Search for the lead's company and collect its full record."""
     company_data = None
     try:
-        best_company = find_best_company_match(api, contact_firm_name, cs_company_website)
+        with tracer.span("find_best_company_match"):
+            best_company = find_best_company_match(api, contact_firm_name, cs_company_website)
         if best_company:
             company_id = best_company.get('id')
             if company_id:
                 logger.info(f"[ENRICHMENT] Collecting company by id: {company_id}")
-                company_data = api.collect_company(company_id=str(company_id))
+                with tracer.span("collect_company"):
+                    company_data = api.collect_company(company_id=str(company_id))
     except Exception as e:
         logger.error(f"Error during company enrichment: {e}")
+    return company_data
+
+
+def _normalize_text(value) -> str:
+    return ' '.join(value.lower().split()) if isinstance(value, str) else ''
+
+
+def company_group_key(lead: dict) -> Optional[tuple]:
+    """
+    Key shared by leads at the same company: the normalized website domain
+    (or email domain when there is no website) plus the normalized firm name.
+    """
+    firm = _normalize_text(lead.get('contact_firm_name'))
+    website = lead.get('cs_company_website')
+    domain = extract_domain(website.strip()) if isinstance(website, str) and website.strip() else ''
+    if not domain:
+        email = lead.get('contact_email')
+        domain = extract_domain(email.strip()) if isinstance(email, str) and '@' in email else ''
+    if not firm and not domain:
+        return None
+    return (domain, firm)
+
+
+class CompanyFanout:
+    """
+    Resolves each company once and fans the result out to every lead at it.
+
+    Built from a planning pass over the leads (plan()), which counts how many
+    leads share each company_group_key. Concurrent workers asking for the same
+    company wait for the first lookup instead of repeating it, and a result is
+    dropped once its last lead has taken it, so memory tracks the companies
+    still in flight rather than the whole distribution.
+    """
+
+    def __init__(self, api, counts: Dict[tuple, int]):
+        self.api = api
+        self._remaining = dict(counts)
+        self._entries: Dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.saved = 0
+
+    @classmethod
+    def plan(cls, api, leads) -> 'CompanyFanout':
+        counts = Counter()
+        total = 0
+        for lead in leads:
+            total += 1
+            key = company_group_key(lead)
+            if key is not None:
+                counts[key] += 1
+        fanout = cls(api, counts)
+        planned = sum(counts.values())
+        logger.info(f"[COMPANY PLAN] {total} leads, {planned} with company info -> {len(counts)} unique companies "
+                    f"({planned - len(counts)} company lookups saved)")
+        return fanout
+
+    def get_company(self, lead: dict) -> Optional[dict]:
+        contact_firm_name = lead.get('contact_firm_name', '').strip()
+        cs_company_website = lead.get('cs_company_website', '').strip()
+        key = company_group_key(lead)
+        if key is None:
+            return resolve_company(self.api, contact_firm_name, cs_company_website)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {'lock': threading.Lock(), 'resolved': False, 'data': None}
+        with entry['lock']:
+            if entry['resolved']:
+                with self._lock:
+                    self.saved += 1
+                logger.info(f"[COMPANY PLAN] Reusing company lookup for {key}")
+            else:
+                entry['data'] = resolve_company(self.api, contact_firm_name, cs_company_website)
+                entry['resolved'] = True
+                with self._lock:
+                    self.lookups += 1
+            data = entry['data']
+        with self._lock:
+            remaining = self._remaining.get(key, 0) - 1
+            self._remaining[key] = remaining
+            if remaining <= 0:
+                self._entries.pop(key, None)
+                self._remaining.pop(key, None)
+        return data
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'company_lookups': self.lookups, 'company_lookups_saved': self.saved}
+
+
+def raw_payload_cell(api, kind: str, data) -> Any:
+    """
+    Payload-store reference for a raw payload (for the debug output); the
+    payload itself if the client has no store.
+    """
+    if not data:
+        return ''
+    payload_ref = getattr(api, 'payload_ref', None)
+    return (payload_ref(kind, data) if payload_ref else None) or data
+
+
+def postprocess_inputs(schema) -> List[str]:
+    """Non-schema fields postprocess_rows reads to fill schema fields."""
+    keys = [exp_key for _, exp_key in EXPERIENCE_DURATION_KEYS]
+    for field in schema:
+        if field.endswith('_numeric'):
+            keys.append(field[:-len('_numeric')])
+        elif field.endswith('_date_year'):
+            keys.append(field[:-len('_year')])
+    return [k for k in dict.fromkeys(keys) if k not in schema]
+
+
+def projection_inputs(schema) -> List[str]:
+    """Flattened keys enrich_lead reads besides field aliases: collection keys renamed to schema fields, and postprocess inputs."""
+    fields = set(schema)
+    keys = postprocess_inputs(schema)
+    for coll_prefix, schema_prefix in SCHEMA_COLLECTION_PREFIXES.items():
+        for field in fields:
+            if field.startswith(schema_prefix + '_'):
+                rest = field[len(schema_prefix) + 1:]
+                keys.append(f"{coll_prefix}_{rest}")
+                if not rest.startswith('_'):
+                    keys.append(coll_prefix + rest)
+    return keys
+
+
+_projections: Dict[tuple, SchemaProjection] = {}
+
+
+def schema_projection() -> SchemaProjection:
+    """The payload projection for the current OUTPUT_SCHEMA, built on first use."""
+    key = tuple(OUTPUT_SCHEMA)
+    projection = _projections.get(key)
+    if projection is None:
+        projection = _projections.setdefault(key, SchemaProjection(get_resolver(key), projection_inputs(key)))
+    return projection
+
+
+def enrich_lead(api, lead: dict, fanout: Optional[CompanyFanout] = None, project: bool = False) -> dict:
+    """Enrich a single lead with robust company and employee finding, flattening, and field population.
+
+    With project=True the payloads are flattened only as far as OUTPUT_SCHEMA
+    needs (see schema_resolver.SchemaProjection): the schema fields come out the
+    same, but the row carries only the flat fields the schema could use rather
+    than every field for the debug CSV.
+    """
+    with tracer.span("enrich_lead"):
+        return _enrich_lead(api, lead, fanout, project)
+
+
+def _enrich_lead(api, lead: dict, fanout: Optional[CompanyFanout], project: bool) -> dict:
+    enriched = lead.copy()
+    projection = schema_projection() if project else None
+    contact_email = lead.get('contact_email', '').strip()
+    contact_full_name = lead.get('contact_full_name', '').strip()
+    contact_firm_name = lead.get('contact_firm_name', '').strip()
+    cs_company_website = lead.get('cs_company_website', '').strip()
+    # --- Company search (once per company when a fan-out plan is given) ---
+    if fanout is not None:
+        with tracer.span("company_fanout"):
+            company_data = fanout.get_company(lead)
+    else:
+        company_data = resolve_company(api, contact_firm_name, cs_company_website)
     # --- Extract and flatten ALL company fields ---
-    company_flat = flatten_all_fields(company_data, parent_key='company') if company_data else {}
-    company_flat = postprocess_flattened_for_schema(company_flat, OUTPUT_SCHEMA)
-    company_map = extract_company_collections(company_data) if company_data else {}
+    with tracer.span("flatten_company"):
+        company_flat = flatten_all_fields(company_data, parent_key='company', projection=projection) if company_data else {}
+    with tracer.span("schema_mapping"):
+        company_flat = postprocess_flattened_for_schema(company_flat, OUTPUT_SCHEMA)
+        company_map = extract_company_collections(company_data) if company_data else {}
     # --- Employee search (only if company found) ---
     person_data = None
     try:
         if contact_full_name and company_data:
-            best_person = find_best_employee_match(api, contact_full_name, contact_firm_name)
+            with tracer.span("find_best_employee_match"):
+                best_person = find_best_employee_match(api, contact_full_name, contact_firm_name)
             if best_person:
                 person_id = best_person.get('id')
                 if person_id:
                     logger.info(f"[ENRICHMENT] Collecting person by id: {person_id}")
-                    person_data = api.collect_person(person_id=str(person_id))
+                    with tracer.span("collect_person"):
+                        person_data = api.collect_person(person_id=str(person_id))
         # Fallback: try name only
         if not person_data and contact_full_name:
             logger.info(f"[ENRICHMENT] [Fallback] Attempting person search by name only: '{contact_full_name}'")
-            best_person = find_best_employee_match(api, contact_full_name, "")
+            with tracer.span("find_best_employee_match", fallback=True):
+                best_person = find_best_employee_match(api, contact_full_name, "")
             if best_person:
                 person_id = best_person.get('id')
                 if person_id:
-                    person_data = api.collect_person(person_id=str(person_id))
+                    with tracer.span("collect_person"):
+                        person_data = api.collect_person(person_id=str(person_id))
     except Exception as e:
         logger.error(f"Error during person enrichment: {e}")
-    person_flat = flatten_all_fields(person_data, parent_key='employee') if person_data else {}
-    person_flat = postprocess_flattened_for_schema(person_flat, OUTPUT_SCHEMA)
-    person_map = extract_member_collections(person_data) if person_data else {}
-    # --- Schema-driven population ---
-    for field in OUTPUT_SCHEMA:
-        val = None
-        sources = [company_map, person_map, company_flat, person_flat, enriched]
-        key_variants = [field]
-        # --- Add dynamic collection/array pattern matching ---
-        m = re.match(r'(company|employee)_(\w+?)_(\d+)_(\w+)', field)
-        if m:
-            prefix, coll, idx, sub = m.groups()
-            key_variants.append(f"{prefix}_{coll}_{idx}_{sub}")
-            key_variants.append(f"{prefix}_{coll}_collection_{idx}_{sub}")
-            key_variants.append(f"{prefix}_{prefix}_{coll}_collection_{idx}_{sub}")
-            key_variants.append(f"cs_{prefix}_{coll}_collection_{idx}_{sub}")
-        # --- Add common aliases and flattening patterns ---
-        # Remove company_ or employee_ prefix for base keys
-        if field.startswith("company_"):
-            base = field[len("company_"):]
-            key_variants.append(base)
-            # Common alias patterns
-            if base == "display_name":
-                key_variants.append("name")
-            if base == "website_url":
-                key_variants.append("website")
-            if base == "logo_url":
-                key_variants.append("logo")
-            if base == "industry":
-                key_variants.append("industry")
-            if base == "description":
-                key_variants.append("description")
-            if base == "size":
-                key_variants.append("size")
-            if base == "founded":
-                key_variants.append("founded_year")
-            if base == "headquarters":
-                key_variants.append("headquarters_city")
-                key_variants.append("headquarters_new_address")
-            # Flattening patterns for collections
-            if "updates_" in base:
-                m = re.match(r"updates_(\d+)_(.*)", base)
-                if m:
-                    idx, sub = m.groups()
-                    key_variants.append(f"company_company_updates_collection_{idx}_{sub}")
-            if "locations_" in base:
-                m = re.match(r"locations_(\d+)_(.*)", base)
-                if m:
-                    idx, sub = m.groups()
-                    key_variants.append(f"company_company_locations_collection_{idx}_location_{sub}")
-                    key_variants.append(f"company_company_locations_collection_{idx}_{sub}")
-            if "specialties_" in base:
-                m = re.match(r"specialties_(\d+)_(.*)", base)
-                if m:
-                    idx, sub = m.groups()
-                    key_variants.append(f"company_company_specialties_collection_{idx}_{sub}")
-            if "featured_employees_" in base:
-                m = re.match(r"featured_employees_(\d+)_(.*)", base)
-                if m:
-                    idx, sub = m.groups()
-                    key_variants.append(f"company_company_featured_employees_collection_{idx}_{sub}")
-            if "funding_rounds_" in base:
-                m = re.match(r"funding_rounds_(\d+)_(.*)", base)
-                if m:
-                    idx, sub = m.groups()
-                    key_variants.append(f"company_company_funding_rounds_collection_{idx}_{sub}")
-            if "also_viewed_" in base:
-                m = re.match(r"also_viewed_(\d+)_(.*)", base)
-                if m:
-                    idx, sub = m.groups()
-                    key_variants.append(f"company_company_also_viewed_collection_{idx}_{sub}")
-            if "crunchbase_info_" in base:
-                m = re.match(r"crunchbase_info_(\d+)_(.*)", base)
-                if m:
-                    idx, sub = m.groups()
-                    key_variants.append(f"company_company_crunchbase_info_collection_{idx}_{sub}")
-            if "featured_investors_" in base:
-                m = re.match(r"featured_investors_(\d+)_(.*)", base)
-                if m:
-                    idx, sub = m.groups()
-                    key_variants.append(f"company_company_featured_investors_collection_{idx}_{sub}")
-        if field.startswith("employee_"):
-            base = field[len("employee_"):]
-            key_variants.append(base)
-            # Common alias patterns
-            if base == "full_name":
-                key_variants.append("name")
-            if base == "headline":
-                key_variants.append("user_generated_headline")
-            if base == "url":
-                key_variants.append("professional_network_url")
-            if base == "canonical_url":
-                key_variants.append("canonical_url")
-            if base == "location":
-                key_variants.append("location_full")
-            # Flattening patterns for collections
-            if "experience_" in base:
-                m = re.match(r"experience_(\d+)_(.*)", base)
-                if m:
-                    idx, sub = m.groups()
-                    key_variants.append(f"employee_member_experience_collection_{idx}_{sub}")
-            if "education_" in base:
-                m = re.match(r"education_(\d+)_(.*)", base)
-                if m:
-                    idx, sub = m.groups()
-                    key_variants.append(f"employee_member_education_collection_{idx}_{sub}")
-        found = False
-        closest = None
-        closest_val = None
-        max_ratio = 0.0
-        used_key = None
-        # Try all sources and key variants
-        for src in sources:
-            for k in key_variants:
-                if k in src and src[k] not in [None, '', [], {}]:
-                    val = src[k]
-                    found = True
-                    used_key = k
-                    break
-            if found:
-                break
-            # Find closest key for debugging and fallback
-            for key in src.keys():
-                ratio = SequenceMatcher(None, key.lower(), field.lower()).ratio()
-                if ratio > max_ratio:
-                    max_ratio = ratio
-                    closest = key
-                    closest_val = src[key]
-        # --- NEW: Always check debug/flattened dicts as last resort ---
-        if val in [None, '', [], {}]:
-            for flat in [company_flat, person_flat]:
-                if field in flat and flat[field] not in [None, '', [], {}]:
-                    val = flat[field]
-                    used_key = field
-                    logger.info(f"[ENRICH][USED_KEY][DEBUG_FLAT] Field '{field}' populated from debug flat key '{field}'")
-                    break
-        # --- Fuzzy fallback in debug/flattened dicts ---
-        if val in [None, '', [], {}]:
-            for flat in [company_flat, person_flat]:
-                for key in flat.keys():
-                    ratio = SequenceMatcher(None, key.lower(), field.lower()).ratio()
-                    if ratio > 0.8 and flat[key] not in [None, '', [], {}]:
-                        val = flat[key]
-                        used_key = key
-                        logger.warning(f"[ENRICH][MISSING][DEBUG_FLAT_FUZZY] Field '{field}' not found, using closest debug flat key '{key}' (similarity {ratio:.2f})")
-                        break
-                if val not in [None, '', [], {}]:
-                    break
-        # --- End new debug/flat fallback ---
-        if val in [None, '', [], {}]:
-            if max_ratio > 0.90 and closest_val not in [None, '', [], {}]:
-                val = closest_val
-                logger.warning(f"[ENRICH][MISSING][FUZZY] Field '{field}' not found, using closest key '{closest}' (similarity {max_ratio:.2f})")
-                used_key = closest
-            elif closest:
-                logger.warning(f"[ENRICH][MISSING][ALIAS] Field '{field}' not found, closest match: '{closest}' (similarity {max_ratio:.2f})")
-            else:
-                logger.warning(f"[ENRICH][MISSING] Field '{field}' not found in any enrichment source for lead: {enriched.get('name', '')} / {enriched.get('email', '')}")
-            if val in [None, '', [], {}]:
-                val = ''
-        if used_key:
-            logger.info(f"[ENRICH][USED_KEY] Field '{field}' populated from key '{used_key}'")
-        enriched[field] = val
+    with tracer.span("flatten_person"):
+        person_flat = flatten_all_fields(person_data, parent_key='employee', projection=projection) if person_data else {}
+    with tracer.span("schema_mapping"):
+        person_flat = postprocess_flattened_for_schema(person_flat, OUTPUT_SCHEMA)
+        person_map = extract_member_collections(person_data) if person_data else {}
+        # --- Schema-driven population (aliases and fuzzy fallbacks precompiled per schema) ---
+        get_resolver(OUTPUT_SCHEMA).resolve(enriched, company_map, person_map, company_flat, person_flat)
     # --- Add ALL flattened fields for debug CSV ---
-    enriched['company_raw_json'] = company_data if company_data else ''
-    enriched['employee_raw_json'] = person_data if person_data else ''
+    # Raw payloads go to the client's payload store; the debug row keeps a short reference
+    if not project:
+        with tracer.span("store_raw_payloads"):
+            enriched['company_raw_json'] = raw_payload_cell(api, 'company', company_data)
+            enriched['employee_raw_json'] = raw_payload_cell(api, 'member', person_data)
     # Add all company/person flat fields not in OUTPUT_SCHEMA
     for k, v in {**company_flat, **person_flat}.items():
         if k not in OUTPUT_SCHEMA:
             enriched[k] = v
     # Log unmapped fields for review
-    if company_data:
+    if company_data and logger.isEnabledFor(logging.DEBUG):
         for k in company_flat:
             if k not in OUTPUT_SCHEMA:
                 logger.debug(f"[ENRICH] Unmapped company field: {k}")
-    if person_data:
+    if person_data and logger.isEnabledFor(logging.DEBUG):
         for k in person_flat:
             if k not in OUTPUT_SCHEMA:
                 logger.debug(f"[ENRICH] Unmapped person field: {k}")
     return enriched
 
+# Flattened collection prefixes postprocess_flattened_for_schema renames to schema prefixes
+SCHEMA_COLLECTION_PREFIXES = {
+    "company_company_updates_collection": "company_updates",
+    "company_company_funding_rounds_collection": "company_funding_rounds",
+    "company_company_locations_collection": "company_locations",
+    "company_company_competitors_collection": "company_competitors",
+    "company_company_technologies_used_collection": "company_technologies_used",
+    "company_company_key_executive_collection": "company_key_executive",
+    "company_company_top_previous_company_collection": "company_top_previous_company",
+    "company_company_top_next_company_collection": "company_top_next_company",
+    "company_company_phone_number_collection": "company_phone_number",
+    "company_company_email_collection": "company_email",
+    "company_company_visits_country_collection": "company_visits_country",
+    "company_company_similar_website_collection": "company_similar_website",
+    "company_company_linkedin_followers_collection": "company_linkedin_followers",
+    "company_company_employees_collection": "company_employees",
+    # Add more as needed
+}
+
+
 def postprocess_flattened_for_schema(flat, schema):
     """Map collection keys in the flattened dict to schema-expected keys."""
-    collection_map = {
-        "company_company_updates_collection": "company_updates",
-        "company_company_funding_rounds_collection": "company_funding_rounds",
-        "company_company_locations_collection": "company_locations",
-        "company_company_competitors_collection": "company_competitors",
-        "company_company_technologies_used_collection": "company_technologies_used",
-        "company_company_key_executive_collection": "company_key_executive",
-        "company_company_top_previous_company_collection": "company_top_previous_company",
-        "company_company_top_next_company_collection": "company_top_next_company",
-        "company_company_phone_number_collection": "company_phone_number",
-        "company_company_email_collection": "company_email",
-        "company_company_visits_country_collection": "company_visits_country",
-        "company_company_similar_website_collection": "company_similar_website",
-        "company_company_linkedin_followers_collection": "company_linkedin_followers",
-        "company_company_employees_collection": "company_employees",
-        # Add more as needed
-    }
     for flat_key in list(flat.keys()):
-        for coll_prefix, schema_prefix in collection_map.items():
+        for coll_prefix, schema_prefix in SCHEMA_COLLECTION_PREFIXES.items():
             if flat_key.startswith(coll_prefix):
                 rest = flat_key[len(coll_prefix):]
                 if rest.startswith('_'):
@@ -678,46 +665,327 @@ def postprocess_flattened_for_schema(flat, schema):
                     flat[schema_key] = flat[flat_key]
     return flat
 
-def main():
-    parser = argparse.ArgumentParser(description="CoreSignal Lead Enrichment Script")
-    parser.add_argument('--sample', action='store_true', help='Process only the first row of leads.csv')
-    parser.add_argument('--row', type=int, help='Process only the specified row index (0-based) of leads.csv')
-    parser.add_argument('--postprocess-report', action='store_true', help='Print a report of fields that were enhanced or could be enhanced')
-    parser.add_argument('--debug-csv', action='store_true', help='Output a debug CSV with all flattened fields for inspection')
-    parser.add_argument('--local-json', action='store_true', help='Use local JSON files for enrichment (companycurl.txt, curlc2.txt)')
-    parser.add_argument('--n', type=int, default=None, help='Number of rows to process from leads.csv')
-    args = parser.parse_args()
-    if not API_KEY:
-        logger.error("CORESIGNAL_API_KEY environment variable not set")
-        sys.exit(1)
-    input_file = 'leads.csv'
-    if not os.path.exists(input_file):
-        logger.error(f"Input file '{input_file}' not found")
-        sys.exit(1)
-    output_file = 'enriched.csv'
+def enrich_local_row(idx, row, api=None) -> Optional[dict]:
+    """Populate a lead from the local JSON captures (companycurl.txt, curlc2.txt).
 
-    # Read input CSV
+    Returns the enriched row (not yet postprocessed), or None when the local
+    JSONs cannot be used and the lead should fall back to API mode. The raw
+    payloads are referenced through `api`'s payload store, as in API mode.
+    """
+    import json
+    def load_json_robust(filepath):
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                text = f.read()
+            # Find the first '{' and last '}'
+            start = text.find('{')
+            end = text.rfind('}')
+            if start != -1 and end != -1 and end > start:
+                json_str = text[start:end+1]
+                return json.loads(json_str)
+            else:
+                raise ValueError('No JSON object found in file')
+        except Exception as e:
+            logger.error(f"[LOCAL ENRICHMENT] Could not parse JSON from {filepath}: {e}")
+            return None
     try:
-        df = pd.read_csv(input_file)
+        company_data = load_json_robust('companycurl.txt')
+        person_data = load_json_robust('curlc2.txt')
+        if not company_data or not person_data:
+            raise ValueError('One or both local JSONs could not be loaded')
+        company_flat = flatten_all_fields(company_data, parent_key='company') if company_data else {}
+        company_flat = postprocess_flattened_for_schema(company_flat, OUTPUT_SCHEMA)
+        company_map = extract_company_collections(company_data) if company_data else {}
+        person_flat = flatten_all_fields(person_data, parent_key='employee') if person_data else {}
+        person_flat = postprocess_flattened_for_schema(person_flat, OUTPUT_SCHEMA)
+        person_map = extract_member_collections(person_data) if person_data else {}
+        enriched = row.to_dict()
+        # --- Robust is_opened extraction ---
+        is_opened = None
+        if 'email_opened' in row:
+            is_opened = row['email_opened']
+        else:
+            # Fallback: case/whitespace-insensitive match
+            for col in row.index:
+                if col.strip().lower() == 'email_opened':
+                    is_opened = row[col]
+                    break
+            if is_opened is None:
+                for col in row.index:
+                    if 'open' in col.strip().lower():
+                        is_opened = row[col]
+                        break
+        # Normalize is_opened: if NaN/None/empty, set to 0; else cast to int
+        if is_opened is None or (isinstance(is_opened, float) and math.isnan(is_opened)) or str(is_opened).strip() == '':
+            is_opened = 0
+        else:
+            is_opened = int(float(is_opened))
+        logger.info(f"[DEBUG] Row {idx} final is_opened value: {is_opened} (type: {type(is_opened)})")
+        enriched_row = {'is_opened': is_opened}
+        # --- Enhanced mapping logic ---
+        for field in OUTPUT_SCHEMA:
+            if field == 'is_opened':
+                continue  # Already set, do not remap
+            val = None
+            sources = [company_map, person_map, company_flat, person_flat, enriched]
+            key_variants = [field]
+            # Add common aliases and flattening patterns
+            # ... (existing alias logic) ...
+            # Try all key variants in all sources
+            found = False
+            for src in sources:
+                for k in key_variants:
+                    if k in src and src[k] not in [None, '', [], {}]:
+                        val = src[k]
+                        found = True
+                        break
+                if found:
+                    break
+            # Fuzzy match if still not found
+            if not found:
+                max_ratio = 0
+                closest_key = None
+                for src in sources:
+                    for k in src.keys():
+                        ratio = SequenceMatcher(None, field, k).ratio()
+                        if ratio > max_ratio:
+                            max_ratio = ratio
+                            closest_key = k
+                            val = src[k]
+                if max_ratio > 0.8 and val not in [None, '', [], {}]:
+                    logger.info(f"[ENRICH][FUZZY] Field '{field}' populated from fuzzy key '{closest_key}' (similarity {max_ratio:.2f})")
+                    found = True
+            if not found or val in [None, '', [], {}]:
+                logger.warning(f"[ENRICH][MISSING][DEBUG] Field '{field}' not found. Tried: {key_variants}. Available keys: {list(company_flat.keys())[:10]} ...")
+            enriched_row[field] = val if val not in [None, '', [], {}] else ''
+        # --- Actionable field fill summary (inside enrichment loop) ---
+        actionable_fields = [f for f in OUTPUT_SCHEMA if not any(x in f for x in ['id', 'email', 'url', 'contact', 'canonical', 'hash', 'api_calls', 'score', 'error', 'status', 'is_opened'])]
+        filled = sum(1 for f in actionable_fields if enriched_row.get(f, '') not in ['', None, [], {}])
+        logger.info(f"[SUMMARY] Row actionable fields filled: {filled} / {len(actionable_fields)}")
+        # Add all flattened fields for debug
+        enriched['company_raw_json'] = raw_payload_cell(api, 'company', company_data)
+        enriched['employee_raw_json'] = raw_payload_cell(api, 'member', person_data)
+        for k, v in {**company_flat, **person_flat}.items():
+            if k not in OUTPUT_SCHEMA:
+                enriched[k] = v
+        logger.info(f"[LOCAL ENRICHMENT] Populated lead {idx+1} from local JSONs.")
+        return enriched
     except Exception as e:
-        logger.error(f"Failed to read input file: {e}")
-        sys.exit(1)
-    if args.n is not None:
-        df = df.head(args.n)
-    elif args.sample:
-        df = df.head(1)
-    elif args.row is not None:
-        df = df.iloc[[args.row]]
+        logger.error(f"[LOCAL ENRICHMENT] Failed to load local JSONs: {e}")
+        return None
+
+# process_lead outcomes
+LEAD_ENRICHED = 'enriched'    # freshly enriched; postprocess it and include it in the debug output
+LEAD_RESUMED = 'checkpoint'   # taken from the checkpoint journal; postprocess it
+LEAD_FAILED = 'failed'        # enrichment failed; the input row is kept as is
+
+
+def checkpoint_fields() -> List[str]:
+    """Fields journaled per lead: enough to rebuild its OUTPUT_SCHEMA row with postprocess_rows."""
+    return OUTPUT_SCHEMA + postprocess_inputs(OUTPUT_SCHEMA)
+
+
+def process_lead(api, idx, row, total: Optional[int], local_json: bool = False,
+                 journal: Optional[CheckpointJournal] = None, fanout: Optional[CompanyFanout] = None,
+                 project: bool = False) -> tuple:
+    """Enrich one input row.
+
+    Returns (enriched, status), status being one of the LEAD_* outcomes.
+    Postprocessing is left to the caller (postprocess_rows), which can then
+    run it over a whole batch. On failure the original row is returned, so
+    one bad lead never aborts the run.
+    With a checkpoint journal, leads already in it are returned from the
+    journal without any API calls, and newly enriched leads are appended.
+    project=True flattens payloads only as far as OUTPUT_SCHEMA needs; the
+    row then carries just the fields the schema could use.
+    """
+    key = lead_key(row.to_dict()) if journal is not None else None
+    if key is not None and key in journal:
+        logger.info(f"Lead {idx+1} ({key}) already enriched in checkpoint, skipping")
+        return dict(journal.get(key)), LEAD_RESUMED
+    enriched, status = _process_lead(api, idx, row, total, local_json, fanout, project)
+    if key is not None and status == LEAD_ENRICHED:
+        journal.record(key, {field: enriched.get(field) for field in checkpoint_fields()})
+    return enriched, status
+
+
+def _process_lead(api, idx, row, total: Optional[int], local_json: bool = False,
+                  fanout: Optional[CompanyFanout] = None, project: bool = False) -> tuple:
+    try:
+        if local_json and idx == 0:
+            enriched = enrich_local_row(idx, row, api)
+            if enriched is not None:
+                return enriched, LEAD_ENRICHED
+            # Fallback to API mode for this row
+        enriched = enrich_lead(api, row.to_dict(), fanout=fanout, project=project)
+        logger.info(f"Processed lead {idx+1}/{total}" if total else f"Processed lead {idx+1}")
+        return enriched, LEAD_ENRICHED
+    except Exception as e:
+        logger.error(f"Error enriching lead {idx}: {e}")
+        return row.to_dict(), LEAD_FAILED
+
+def iter_leads(input_file: str, chunksize: int, n: Optional[int] = None, row: Optional[int] = None, sample: bool = False):
+    """Yield (idx, row) from the leads CSV chunk by chunk, honouring --n/--sample/--row."""
+    limit = n if n is not None else (1 if sample else None)
+    for chunk in pd.read_csv(input_file, chunksize=chunksize):
+        for idx, lead in chunk.iterrows():
+            if limit is not None and idx >= limit:
+                return
+            if limit is None and row is not None:
+                if idx < row:
+                    continue
+                if idx > row:
+                    return
+            yield idx, lead
+
+
+def bounded_map(pool, fn, iterable, window: int):
+    """Like pool.map, but keeps at most `window` items in flight so the input is never read ahead."""
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def csv_value(value) -> Any:
+    """Format a cell the way DataFrame.to_csv renders an object column: NaN/None as empty."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return value
+
+
+class CsvRowWriter:
+    """csv.writer behind the same write_row/close interface as ParquetRowWriter; flushes every row."""
+
+    def __init__(self, f, columns: List[str]):
+        self.f = f
+        self.columns = columns
+        self.writer = csv.writer(f)
+        self.writer.writerow(columns)
+
+    def write_row(self, row: Dict[str, Any]):
+        self.writer.writerow([csv_value(row.get(c)) for c in self.columns])
+        self.f.flush()
+
+    def close(self):
+        self.f.flush()
+
+
+def plan_company_fanout(api, rows, journal: Optional[CheckpointJournal] = None) -> CompanyFanout:
+    """Planning pass: count leads per company, skipping leads the checkpoint already has."""
+    return CompanyFanout.plan(api, (row for row in rows if journal is None or lead_key(row) not in journal))
+
+
+def run_streaming(args, api, input_file: str, output_file: str, chunksize: int = 1000,
+                  journal: Optional[CheckpointJournal] = None) -> int:
+    """
+    Enrich leads chunk by chunk and append each finished chunk to the output.
+
+    Finished leads are collected into chunks of `chunksize` rows; each chunk
+    is postprocessed as one batch (as the non-stream path does for the whole
+    file) and its rows are appended in input order. The enriched.csv header
+    is OUTPUT_SCHEMA, fixed before the first lead, and every row is flushed
+    as soon as it is written, so memory stays flat and a crash keeps every
+    completed chunk (the checkpoint journal has the rest). The debug CSV
+    (optional) has a fixed header too: input columns, OUTPUT_SCHEMA, the raw
+    JSONs, and one extra_fields_json column holding the remaining flattened
+    fields. With
+    --output-format parquet the same columns go to enriched.parquet and
+    enriched_debug.parquet, a row group at a time; those files are finished
+    on errors and Ctrl-C as well, but a killed process leaves them unreadable.
+    """
+    input_columns = list(pd.read_csv(input_file, nrows=0).columns)
+    debug_columns = list(dict.fromkeys(input_columns + OUTPUT_SCHEMA + ['company_raw_json', 'employee_raw_json']))
+    debug_known = set(debug_columns)
+    written = 0
+    fanout = None
+    if not args.no_dedupe:
+        # Cheap extra pass over the input: only per-company counts are kept
+        fanout = plan_company_fanout(
+            api, (lead.to_dict() for _, lead in iter_leads(input_file, chunksize, n=args.n, row=args.row, sample=args.sample)), journal)
+    if args.output_format == 'parquet':
+        out = ParquetRowWriter(output_path(output_file, 'parquet'), columns=OUTPUT_SCHEMA)
+        debug_out = ParquetRowWriter('enriched_debug.parquet', columns=debug_columns + ['extra_fields_json']) if args.debug_csv else None
+        out_file = debug_file = None
+    else:
+        out_file = open(output_file, 'w', newline='', encoding='utf-8')
+        debug_file = open('enriched_debug.csv', 'w', newline='', encoding='utf-8') if args.debug_csv else None
+        out = CsvRowWriter(out_file, OUTPUT_SCHEMA)
+        debug_out = CsvRowWriter(debug_file, debug_columns + ['extra_fields_json']) if debug_file else None
+
+    def write_chunk(chunk) -> int:
+        """Postprocess a chunk of finished leads as one batch, then append its rows in input order."""
+        processed = [enriched for _, (enriched, status) in chunk if status != LEAD_FAILED]
+        with tracer.span("postprocess_batch", rows=len(processed)):
+            batch_changes = iter(postprocess_rows(processed))
+        for idx, (enriched_post, status) in chunk:
+            changes = next(batch_changes) if status != LEAD_FAILED else None
+            debug_row = enriched_post if status == LEAD_ENRICHED else None
+            row_values = [csv_value(enriched_post.get(field)) for field in OUTPUT_SCHEMA]
+            if all(str(x).strip() == "" for x in row_values):
+                logger.warning(f"Enriched row {idx} is completely empty after processing!")
+            out.write_row({field: enriched_post.get(field) for field in OUTPUT_SCHEMA})
+            if debug_out and debug_row is not None:
+                extra = {k: v for k, v in debug_row.items() if k not in debug_known}
+                debug_out.write_row(dict({c: debug_row.get(c) for c in debug_columns},
+                                         extra_fields_json=json.dumps(extra, ensure_ascii=False, default=str)))
+            if args.postprocess_report and changes:
+                print(f"Row {idx}: {changes}")
+        return len(chunk)
 
-    # Initialize API client
+    try:
+        leads = iter_leads(input_file, chunksize, n=args.n, row=args.row, sample=args.sample)
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            results = bounded_map(
+                pool,
+                lambda item: (item[0], process_lead(api, item[0], item[1], None, local_json=args.local_json, journal=journal, fanout=fanout,
+                                                 project=not args.debug_csv)),
+                leads,
+                window=max(1, args.workers) * 2,
+            )
+            chunk = []
+            for result in results:
+                chunk.append(result)
+                if len(chunk) >= chunksize:
+                    written += write_chunk(chunk)
+                    chunk = []
+            if chunk:
+                written += write_chunk(chunk)
+    finally:
+        # Parquet needs its footer to be readable, so the writers are closed on errors too
+        for writer in (out, debug_out):
+            if writer:
+                writer.close()
+        for f in (out_file, debug_file):
+            if f:
+                f.close()
+    logger.info(f"Streamed {written} enriched leads to {output_path(output_file, args.output_format)}")
+    if fanout is not None:
+        logger.info(f"[COMPANY PLAN] {fanout.get_stats()}")
+    if args.debug_csv:
+        logger.info(f"Debug CSV with all flattened fields streamed to '{output_path('enriched_debug.csv', args.output_format)}'")
+    return written
+
+
+def create_client(args):
+    """Initialize the API client shared by all workers."""
     try:
         from coresignal_client import CoreSignalClient
-        api = CoreSignalClient(API_KEY)
+        client = CoreSignalClient(API_KEY, pool_size=max(10, args.workers))
     except Exception as e:
         logger.error(f"Failed to initialize CoreSignalClient: {e}")
         sys.exit(1)
+    # Latency/status/credit metrics go to disk periodically; main() stops the dumps
+    # (writing the final numbers) once the run is over, on errors too
+    client.metrics.start_dumping(METRICS_JSON_PATH, METRICS_PROM_PATH, METRICS_DUMP_INTERVAL)
+    return client
+
 
-    # At the start of main(), add a check
+def prepare_output_schema():
+    """Add the derived columns to OUTPUT_SCHEMA before any row is written."""
     try:
         _ = OUTPUT_SCHEMA
     except NameError:
@@ -728,142 +996,42 @@ def main():
     if 'is_pe_vc_funded' not in OUTPUT_SCHEMA:
         OUTPUT_SCHEMA.append('is_pe_vc_funded')
 
-    # --- At the start of main(), after loading leads.csv ---
     # Ensure 'is_opened' is the first column in OUTPUT_SCHEMA
     if 'is_opened' not in OUTPUT_SCHEMA:
         OUTPUT_SCHEMA.insert(0, 'is_opened')
 
-    # Enrich each lead
-    enriched_rows = []
+
+def run_batch(args, api, df: pd.DataFrame, output_file: str):
+    """Enrich every lead in df, postprocess them as one batch, and write the output in one go."""
+    prepare_output_schema()
+    journal = CheckpointJournal(args.checkpoint) if args.checkpoint else None
+
+    # Enrich each lead. Workers share one client (and its caches and rate limit);
+    # pool.map yields results in input order, so output rows keep the input order.
     postprocess_changes = []
-    debug_rows = []
-    for idx, row in df.iterrows():
-        try:
-            if args.local_json and idx == 0:
-                import json
-                def load_json_robust(filepath):
-                    try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            text = f.read()
-                        # Find the first '{' and last '}'
-                        start = text.find('{')
-                        end = text.rfind('}')
-                        if start != -1 and end != -1 and end > start:
-                            json_str = text[start:end+1]
-                            return json.loads(json_str)
-                        else:
-                            raise ValueError('No JSON object found in file')
-                    except Exception as e:
-                        logger.error(f"[LOCAL ENRICHMENT] Could not parse JSON from {filepath}: {e}")
-                        return None
-                try:
-                    company_data = load_json_robust('companycurl.txt')
-                    person_data = load_json_robust('curlc2.txt')
-                    if not company_data or not person_data:
-                        raise ValueError('One or both local JSONs could not be loaded')
-                    company_flat = flatten_all_fields(company_data, parent_key='company') if company_data else {}
-                    company_flat = postprocess_flattened_for_schema(company_flat, OUTPUT_SCHEMA)
-                    company_map = extract_company_collections(company_data) if company_data else {}
-                    person_flat = flatten_all_fields(person_data, parent_key='employee') if person_data else {}
-                    person_flat = postprocess_flattened_for_schema(person_flat, OUTPUT_SCHEMA)
-                    person_map = extract_member_collections(person_data) if person_data else {}
-                    enriched = row.to_dict()
-                    # --- Robust is_opened extraction ---
-                    is_opened = None
-                    if 'email_opened' in row:
-                        is_opened = row['email_opened']
-                    else:
-                        # Fallback: case/whitespace-insensitive match
-                        for col in row.index:
-                            if col.strip().lower() == 'email_opened':
-                                is_opened = row[col]
-                                break
-                        if is_opened is None:
-                            for col in row.index:
-                                if 'open' in col.strip().lower():
-                                    is_opened = row[col]
-                                    break
-                    # Normalize is_opened: if NaN/None/empty, set to 0; else cast to int
-                    if is_opened is None or (isinstance(is_opened, float) and math.isnan(is_opened)) or str(is_opened).strip() == '':
-                        is_opened = 0
-                    else:
-                        is_opened = int(float(is_opened))
-                    logger.info(f"[DEBUG] Row {idx} final is_opened value: {is_opened} (type: {type(is_opened)})")
-                    enriched_row = {'is_opened': is_opened}
-                    # --- Enhanced mapping logic ---
-                    for field in OUTPUT_SCHEMA:
-                        if field == 'is_opened':
-                            continue  # Already set, do not remap
-                        val = None
-                        sources = [company_map, person_map, company_flat, person_flat, enriched]
-                        key_variants = [field]
-                        # Add common aliases and flattening patterns
-                        # ... (existing alias logic) ...
-                        # Try all key variants in all sources
-                        found = False
-                        for src in sources:
-                            for k in key_variants:
-                                if k in src and src[k] not in [None, '', [], {}]:
-                                    val = src[k]
-                                    found = True
-                                    break
-                            if found:
-                                break
-                        # Fuzzy match if still not found
-                        if not found:
-                            max_ratio = 0
-                            closest_key = None
-                            for src in sources:
-                                for k in src.keys():
-                                    ratio = SequenceMatcher(None, field, k).ratio()
-                                    if ratio > max_ratio:
-                                        max_ratio = ratio
-                                        closest_key = k
-                                        val = src[k]
-                            if max_ratio > 0.8 and val not in [None, '', [], {}]:
-                                logger.info(f"[ENRICH][FUZZY] Field '{field}' populated from fuzzy key '{closest_key}' (similarity {max_ratio:.2f})")
-                                found = True
-                        if not found or val in [None, '', [], {}]:
-                            logger.warning(f"[ENRICH][MISSING][DEBUG] Field '{field}' not found. Tried: {key_variants}. Available keys: {list(company_flat.keys())[:10]} ...")
-                        enriched_row[field] = val if val not in [None, '', [], {}] else ''
-                    # --- Actionable field fill summary (inside enrichment loop) ---
-                    actionable_fields = [f for f in OUTPUT_SCHEMA if not any(x in f for x in ['id', 'email', 'url', 'contact', 'canonical', 'hash', 'api_calls', 'score', 'error', 'status', 'is_opened'])]
-                    filled = sum(1 for f in actionable_fields if enriched_row.get(f, '') not in ['', None, [], {}])
-                    logger.info(f"[SUMMARY] Row actionable fields filled: {filled} / {len(actionable_fields)}")
-                    # Add all flattened fields for debug
-                    enriched['company_raw_json'] = company_data if company_data else ''
-                    enriched['employee_raw_json'] = person_data if person_data else ''
-                    for k, v in {**company_flat, **person_flat}.items():
-                        if k not in OUTPUT_SCHEMA:
-                            enriched[k] = v
-                    debug_row = {**row.to_dict(), **enriched}
-                    debug_rows.append(debug_row)
-                    enriched_post = smart_postprocess(enriched.copy())
-                    changes = {k: (enriched[k], enriched_post[k]) for k in enriched if enriched[k] != enriched_post[k]}
-                    if changes:
-                        postprocess_changes.append({'row': idx, 'changes': changes})
-                    enriched_rows.append(enriched_post)
-                    logger.info(f"[LOCAL ENRICHMENT] Populated lead {idx+1} from local JSONs.")
-                    continue
-                except Exception as e:
-                    logger.error(f"[LOCAL ENRICHMENT] Failed to load local JSONs: {e}")
-                    # Fallback to API mode for this row
-            enriched = enrich_lead(api, row.to_dict())
-            enriched_post = smart_postprocess(enriched.copy())
-            changes = {k: (enriched[k], enriched_post[k]) for k in enriched if enriched[k] != enriched_post[k]}
-            if changes:
-                postprocess_changes.append({'row': idx, 'changes': changes})
-            enriched_rows.append(enriched_post)
-            debug_row = {**row.to_dict(), **enriched, **enriched_post}
-            debug_rows.append(debug_row)
-            logger.info(f"Processed lead {idx+1}/{len(df)}")
-        except Exception as e:
-            logger.error(f"Error enriching lead {idx}: {e}")
-            enriched_rows.append(row.to_dict())
-        # --- At the end of the enrichment loop for each row ---
-        # actionable_fields = [f for f in OUTPUT_SCHEMA if not any(x in f for x in ['id', 'email', 'url', 'contact', 'canonical', 'hash', 'api_calls', 'score', 'error', 'status', 'is_opened'])]
-        # filled = sum(1 for f in actionable_fields if enriched_row.get(f, '') not in ['', None, [], {}])
-        # logger.info(f"[SUMMARY] Row actionable fields filled: {filled} / {len(actionable_fields)}")
+    total = len(df)
+    fanout = None if args.no_dedupe else plan_company_fanout(api, (row.to_dict() for _, row in df.iterrows()), journal)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = pool.map(
+            lambda item: (item[0], process_lead(api, item[0], item[1], total, local_json=args.local_json, journal=journal, fanout=fanout,
+                                                 project=not args.debug_csv)),
+            df.iterrows(),
+        )
+        outcomes = [(idx, enriched, status) for idx, (enriched, status) in results]
+    # Postprocess the whole batch in one pass; each row is changed in place
+    processed = [(idx, enriched) for idx, enriched, status in outcomes if status != LEAD_FAILED]
+    with tracer.span("postprocess_batch", rows=len(processed)):
+        batch_changes = postprocess_rows([enriched for _, enriched in processed])
+    for (idx, _), changes in zip(processed, batch_changes):
+        if changes:
+            postprocess_changes.append({'row': idx, 'changes': changes})
+    enriched_rows = [enriched for _, enriched, _ in outcomes]
+    # A fresh lead's row already holds its input columns, so it is its own debug row
+    debug_rows = [enriched for _, enriched, status in outcomes if status == LEAD_ENRICHED]
+    if journal:
+        journal.close()
+    if fanout is not None:
+        logger.info(f"[COMPANY PLAN] {fanout.get_stats()}")
 
     # Write output CSV
     try:
@@ -874,11 +1042,17 @@ def main():
         for idx, row in out_df.iterrows():
             if all((str(x).strip() == "" for x in row)):
                 logger.warning(f"Enriched row {idx} is completely empty after processing!")
-        out_df.to_csv(output_file, index=False)
+        if args.output_format == 'parquet':
+            output_file = write_table(enriched_rows, output_file, 'parquet', columns=OUTPUT_SCHEMA)
+        else:
+            out_df.to_csv(output_file, index=False)
         logger.info(f"Successfully wrote {len(out_df)} enriched leads to {output_file}")
     except Exception as e:
         logger.error(f"Failed to write output file: {e}")
         sys.exit(1)
+    logger.info(f"API usage: {api.get_stats()}")
+    logger.info(f"Log sampling: {get_sampling_stats()}")
+    tracer.finish()
 
     # Postprocess report
     if args.postprocess_report:
@@ -888,15 +1062,84 @@ def main():
         print("=== End of Report ===\n")
 
     if args.debug_csv:
-        pd.DataFrame(debug_rows).to_csv('enriched_debug.csv', index=False)
-        logger.info(f"Debug CSV with all flattened fields written to 'enriched_debug.csv'")
+        debug_file = write_table(debug_rows, 'enriched_debug.csv', args.output_format)
+        logger.info(f"Debug CSV with all flattened fields written to '{debug_file}'")
 
     # --- After writing the output CSV ---
     df_out = pd.DataFrame(enriched_rows)
     df_out = df_out.reindex(columns=OUTPUT_SCHEMA)
-    df_out.to_csv('enriched.csv', index=False)
+    if args.output_format == 'csv':
+        df_out.to_csv('enriched.csv', index=False)
     logger.info(f"[DEBUG] First 5 rows of enriched.csv:\n{df_out.head()}\n")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="CoreSignal Lead Enrichment Script")
+    parser.add_argument('--sample', action='store_true', help='Process only the first row of leads.csv')
+    parser.add_argument('--row', type=int, help='Process only the specified row index (0-based) of leads.csv')
+    parser.add_argument('--postprocess-report', action='store_true', help='Print a report of fields that were enhanced or could be enhanced')
+    parser.add_argument('--debug-csv', action='store_true', help='Output a debug CSV with all flattened fields for inspection (without it, payloads are only flattened as far as OUTPUT_SCHEMA needs)')
+    parser.add_argument('--local-json', action='store_true', help='Use local JSON files for enrichment (companycurl.txt, curlc2.txt)')
+    parser.add_argument('--n', type=int, default=None, help='Number of rows to process from leads.csv')
+    parser.add_argument('--workers', type=int, default=1, help='Number of leads to enrich concurrently (shares one client and its rate limit)')
+    parser.add_argument('--stream', action='store_true', help='Read leads in chunks and append each enriched row to the output as it finishes (bounded memory)')
+    parser.add_argument('--chunksize', type=int, default=1000, help='Rows read from leads.csv per chunk in --stream mode')
+    parser.add_argument('--no-dedupe', action='store_true', help='Look up the company separately for every lead instead of once per company')
+    parser.add_argument('--checkpoint', help='Append-only journal of finished leads (keyed by email); re-running with the same file resumes where it stopped')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv', help='csv, or parquet for typed, compressed columnar output (needs pyarrow)')
+    parser.add_argument('--trace', default=TRACE_PATH or None, help='Write per-stage spans as Chrome trace-event JSON to this file and log a p50/p95 table per stage')
+    args = parser.parse_args()
+    tracer.start(args.trace)
+    if args.output_format == 'parquet':
+        try:
+            require_pyarrow()
+        except RuntimeError as e:
+            logger.error(str(e))
+            sys.exit(1)
+    if not API_KEY:
+        logger.error("CORESIGNAL_API_KEY environment variable not set")
+        sys.exit(1)
+    input_file = 'leads.csv'
+    if not os.path.exists(input_file):
+        logger.error(f"Input file '{input_file}' not found")
+        sys.exit(1)
+    output_file = 'enriched.csv'
+
+    if args.stream:
+        # Never materializes the lead file or the results; header is fixed up front
+        prepare_output_schema()
+        api = create_client(args)
+        journal = CheckpointJournal(args.checkpoint) if args.checkpoint else None
+        try:
+            run_streaming(args, api, input_file, output_file, chunksize=args.chunksize, journal=journal)
+        finally:
+            if journal:
+                journal.close()
+            api.metrics.stop_dumping()
+        logger.info(f"API usage: {api.get_stats()}")
+        logger.info(f"Log sampling: {get_sampling_stats()}")
+        tracer.finish()
+        return
+
+    # Read input CSV
+    try:
+        df = pd.read_csv(input_file)
+    except Exception as e:
+        logger.error(f"Failed to read input file: {e}")
+        sys.exit(1)
+    if args.n is not None:
+        df = df.head(args.n)
+    elif args.sample:
+        df = df.head(1)
+    elif args.row is not None:
+        df = df.iloc[[args.row]]
+
+    api = create_client(args)
+    try:
+        run_batch(args, api, df, output_file)
+    finally:
+        api.metrics.stop_dumping()
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
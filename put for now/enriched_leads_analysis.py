@@ -17,6 +17,7 @@ import seaborn as sns
 import json
 import os
 from pathlib import Path
+import sys
 from scipy import stats
 from scipy.stats import shapiro, pearsonr, chi2_contingency
 from sklearn.ensemble import RandomForestClassifier
@@ -26,6 +27,9 @@ from sklearn.model_selection import train_test_split, KFold
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score, accuracy_score
 from sklearn.feature_selection import SelectKBest, f_classif, chi2, mutual_info_classif
 import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core_sig.columnar import read_table, table_columns
 warnings.filterwarnings('ignore')
 
 # Create output directories
@@ -39,29 +43,33 @@ def load_and_analyze_real_data(csv_path):
     print("1. LOADING REAL DATA")
     print("="*60)
     
-    # Load data
-    df = pd.read_csv(csv_path, low_memory=False)
+    # Identifier columns are dropped right away, so only the rest are read
+    # (Parquet input skips them entirely; CSV still has to parse every line)
+    identifier_patterns = [
+        '_id', 'name', 'email', 'contact_', '_url', 'timestamp', 'created_at', 'updated_at', 'date', 'time'
+    ]
+    def normalize(c):
+        return c.strip().lower().replace(' ', '_')
+    all_columns = table_columns(csv_path)
+    id_cols = [normalize(c) for c in all_columns if any(
+        normalize(c).endswith(p) or p in normalize(c) for p in identifier_patterns
+    )]
+    wanted = [c for c in all_columns if normalize(c) not in id_cols]
+    df = read_table(csv_path, columns=wanted, low_memory=False)
     
-    print(f"Dataset Shape: {df.shape}")
-    print(f"Column Names: {list(df.columns)}")
+    print(f"Dataset Shape: {(len(df), len(all_columns))}")
+    print(f"Column Names: {all_columns}")
 
     # Normalize column names
-    df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+    df.columns = [normalize(c) for c in df.columns]
     
     # Trim whitespace from string columns
     for col in df.select_dtypes(include='object').columns:
         df[col] = df[col].astype(str).str.strip()
 
     # --- DROP IDENTIFIER FIELDS EARLY ---
-    identifier_patterns = [
-        '_id', 'name', 'email', 'contact_', '_url', 'timestamp', 'created_at', 'updated_at', 'date', 'time'
-    ]
-    id_cols = [c for c in df.columns if any(
-        c.lower().endswith(p) or p in c.lower() for p in identifier_patterns
-    )]
     if id_cols:
         print(f"Dropping identifier columns: {id_cols}")
-        df = df.drop(columns=id_cols, errors='ignore')
     else:
         print("No identifier columns found to drop.")
     
@@ -10,8 +10,10 @@ from fuzzywuzzy import fuzz
 import tldextract
 from coresignal_client import CoreSignalClient
 from config import OUTPUT_SCHEMA
+from core_sig.tracing import get_tracer
 
 logger = logging.getLogger(__name__)
+tracer = get_tracer()
 
 @dataclass
 class ContactRecord:
@@ -228,6 +230,10 @@ class EnrichmentEngine:
         
         return active_items
 
+    def raw_json(self, payload_ref: Optional[str], key: str, value: Any) -> str:
+        """Reference to one field of a stored payload, or the field's JSON when there is no payload store"""
+        return f"{payload_ref}#{key}" if payload_ref else json.dumps(value, ensure_ascii=False)
+    
     def flatten_collection(self, collection: List[Dict], prefix: str, max_items: int = 10) -> Dict[str, Any]:
         """Flatten a collection of dictionaries into individual fields"""
         flattened = {}
@@ -238,9 +244,8 @@ class EnrichmentEngine:
         # Filter active items first
         active_items = self.filter_active_items(collection)
         
-        # Add JSON representation of the full collection
+        # The full collection is kept as a {prefix}_json payload reference by the caller
         if active_items:
-            flattened[f"{prefix}_json"] = json.dumps(active_items, ensure_ascii=False)
             flattened[f"{prefix}_count"] = len(active_items)
         
         # Flatten individual items
@@ -258,7 +263,9 @@ class EnrichmentEngine:
 
     def enrich_company_data(self, contact: ContactRecord, company_data: Dict) -> None:
         """Populate company fields from API data with maximum extraction and explicit high-value fields"""
-        logger.debug(f"[DEBUG] Raw company_data: {json.dumps(company_data, indent=2, default=str)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[DEBUG] Raw company_data: {json.dumps(company_data, indent=2, default=str)}")
+        payload_ref = self.client.payload_ref('company', company_data)
         # --- CORE COMPANY FIELDS ---
         contact.company_id = str(company_data.get('id', ''))
         contact.company_display_name = company_data.get('name', '')
@@ -391,12 +398,12 @@ class EnrichmentEngine:
                     collection_fields = self.flatten_collection(value, field_name, max_items=10)
                     for cf_name, cf_value in collection_fields.items():
                         contact.__dict__[cf_name] = cf_value
-                    contact.__dict__[f"{field_name}_json"] = json.dumps(value, ensure_ascii=False)
+                    contact.__dict__[f"{field_name}_json"] = self.raw_json(payload_ref, key, value)
                     logger.info(f"Extracted {len(collection_fields)} fields from collection {field_name}")
                 else:
                     contact.__dict__[field_name] = '|'.join(str(v) for v in value if v is not None)
             elif isinstance(value, dict):
-                contact.__dict__[f"{field_name}_json"] = json.dumps(value, ensure_ascii=False)
+                contact.__dict__[f"{field_name}_json"] = self.raw_json(payload_ref, key, value)
                 for sub_key, sub_value in value.items():
                     contact.__dict__[f"{field_name}_{sub_key}"] = str(sub_value) if sub_value is not None else ""
             else:
@@ -405,7 +412,9 @@ class EnrichmentEngine:
 
     def enrich_employee_data(self, contact: ContactRecord, employee_data: Dict) -> None:
         """Populate employee fields from API data with maximum extraction and explicit high-value fields"""
-        logger.debug(f"[DEBUG] Raw employee_data: {json.dumps(employee_data, indent=2, default=str)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[DEBUG] Raw employee_data: {json.dumps(employee_data, indent=2, default=str)}")
+        payload_ref = self.client.payload_ref('member', employee_data)
         # --- PERSON CORE FIELDS ---
         contact.employee_id = str(employee_data.get('public_profile_id', employee_data.get('id', '')))
         # full_name.exact
@@ -499,12 +508,12 @@ class EnrichmentEngine:
                     collection_fields = self.flatten_collection(value, field_name, max_items=10)
                     for cf_name, cf_value in collection_fields.items():
                         contact.__dict__[cf_name] = cf_value
-                    contact.__dict__[f"{field_name}_json"] = json.dumps(value, ensure_ascii=False)
+                    contact.__dict__[f"{field_name}_json"] = self.raw_json(payload_ref, key, value)
                     logger.info(f"Extracted {len(collection_fields)} fields from collection {field_name}")
                 else:
                     contact.__dict__[field_name] = '|'.join(str(v) for v in value if v is not None)
             elif isinstance(value, dict):
-                contact.__dict__[f"{field_name}_json"] = json.dumps(value, ensure_ascii=False)
+                contact.__dict__[f"{field_name}_json"] = self.raw_json(payload_ref, key, value)
                 for sub_key, sub_value in value.items():
                     contact.__dict__[f"{field_name}_{sub_key}"] = str(sub_value) if sub_value is not None else ""
             else:
@@ -512,6 +521,10 @@ class EnrichmentEngine:
         logger.debug(f"[DEBUG] Employee fields added: {len([k for k in contact.__dict__.keys() if k.startswith('employee_')])}")
 
     def enrich_contact(self, contact: ContactRecord) -> ContactRecord:
+        with tracer.span("enrich_contact"):
+            return self._enrich_contact(contact)
+
+    def _enrich_contact(self, contact: ContactRecord) -> ContactRecord:
         initial_api_calls = self.client.stats.total_calls
         try:
             # Input validation for company_name
@@ -522,14 +535,16 @@ class EnrichmentEngine:
                 return contact
             logger.info(f"Enriching contact: {contact.name} at {contact.company_name}")
             # Step 1: Find company first (never use IDs from CSV)
-            company_match, company_score = self.find_best_company_match(contact)
+            with tracer.span("find_best_company_match"):
+                company_match, company_score = self.find_best_company_match(contact)
             logger.debug(f"[DEBUG] Company match: {company_match}, score: {company_score}")
             contact.company_match_score = company_score
             company_data = None
             if company_match:
                 logger.debug(f"Found company match with score {company_score:.2f}")
                 if isinstance(company_match, int):
-                    detailed_company = self.client.get_company_details(company_match)
+                    with tracer.span("collect_company"):
+                        detailed_company = self.client.get_company_details(company_match)
                     if isinstance(detailed_company, dict):
                         company_data = detailed_company
                     else:
@@ -537,7 +552,8 @@ class EnrichmentEngine:
                         company_data = None
                 elif isinstance(company_match, dict):
                     if 'id' in company_match and len(company_match) < 10:
-                        detailed_company = self.client.get_company_details(company_match['id'])
+                        with tracer.span("collect_company"):
+                            detailed_company = self.client.get_company_details(company_match['id'])
                         company_data = detailed_company if detailed_company else company_match
                     else:
                         company_data = company_match
@@ -545,20 +561,23 @@ class EnrichmentEngine:
                     logger.warning(f"Company match is not a dict or int: {company_match}")
                     company_data = None
                 if company_data:
-                    self.enrich_company_data(contact, company_data)
+                    with tracer.span("enrich_company_data"):
+                        self.enrich_company_data(contact, company_data)
             else:
                 logger.debug("No company match found")
             # Step 2: Find employee ONLY within the found company
             employee_match = None
             employee_score = 0.0
             if company_data:
-                employee_match, employee_score = self.find_best_employee_match(contact, company_data)
+                with tracer.span("find_best_employee_match"):
+                    employee_match, employee_score = self.find_best_employee_match(contact, company_data)
                 logger.debug(f"[DEBUG] Employee match: {employee_match}, score: {employee_score}")
             contact.employee_match_score = employee_score
             if employee_match:
                 logger.debug(f"Found employee match with score {employee_score:.2f}")
                 if isinstance(employee_match, int):
-                    detailed_employee = self.client.get_member_details(employee_match)
+                    with tracer.span("collect_person"):
+                        detailed_employee = self.client.get_member_details(employee_match)
                     if isinstance(detailed_employee, dict):
                         employee_match = detailed_employee
                     else:
@@ -566,14 +585,16 @@ class EnrichmentEngine:
                         employee_match = None
                 elif isinstance(employee_match, dict):
                     if 'id' in employee_match and len(employee_match) < 15:
-                        detailed_employee = self.client.get_member_details(employee_match['id'])
+                        with tracer.span("collect_person"):
+                            detailed_employee = self.client.get_member_details(employee_match['id'])
                         if detailed_employee:
                             employee_match = detailed_employee
                         else:
                             logger.warning(f"Employee match is not a dict or int: {employee_match}")
                             employee_match = None
                 if employee_match:
-                    self.enrich_employee_data(contact, employee_match)
+                    with tracer.span("enrich_employee_data"):
+                        self.enrich_employee_data(contact, employee_match)
                 else:
                     logger.debug("No employee match found in company")
             else:
@@ -11,7 +11,11 @@ import time
 from datetime import datetime
 from dataclasses import asdict
 
-from config import INPUT_COLUMN_MAPPING, OUTPUT_SCHEMA, DEFAULT_INPUT_FILE, DEFAULT_OUTPUT_FILE
+from config import (
+    INPUT_COLUMN_MAPPING, OUTPUT_SCHEMA, DEFAULT_INPUT_FILE, DEFAULT_OUTPUT_FILE,
+    METRICS_DUMP_INTERVAL, METRICS_JSON_PATH, METRICS_PROM_PATH, TRACE_PATH,
+)
+from core_sig.tracing import get_tracer
 from coresignal_client import CoreSignalClient
 from enrichment_engine import EnrichmentEngine, ContactRecord
 
@@ -136,6 +140,8 @@ def main():
                        help="CoreSignal API key")
     parser.add_argument("--sample", type=int,
                        help="Process only first N rows (for testing)")
+    parser.add_argument("--trace", default=TRACE_PATH or None,
+                       help="Write per-stage spans as Chrome trace-event JSON to this file")
     parser.add_argument("--log-file", default="pipeline.log",
                        help="Log file path")
     
@@ -144,6 +150,7 @@ def main():
     # Setup logging
     logger = setup_logging(args.log_file)
     logger.info("Starting CoreSignal enrichment pipeline")
+    get_tracer().start(args.trace)
     
     start_time = time.time()
     
@@ -157,6 +164,7 @@ def main():
         
         # Initialize CoreSignal client and enrichment engine
         client = CoreSignalClient(args.api_key)
+        client.metrics.start_dumping(METRICS_JSON_PATH, METRICS_PROM_PATH, METRICS_DUMP_INTERVAL)
         engine = EnrichmentEngine(client)
         
         # Process each contact
@@ -207,6 +215,8 @@ def main():
         stats = client.get_stats()
         logger.info(f"Pipeline completed in {duration:.2f} seconds")
         logger.info(f"API Statistics: {stats}")
+        client.metrics.stop_dumping()
+        get_tracer().finish()
         
     except Exception as e:
         logger.error(f"Pipeline failed: {e}")
@@ -0,0 +1,269 @@
+"""
+Precompiled OUTPUT_SCHEMA field resolver used by main.enrich_lead.
+
+enrich_lead used to rebuild every field's alias list with a dozen regexes and
+run SequenceMatcher against every key of every source dict, for every lead.
+The resolver does that work once per schema: alias lists are compiled up
+front, and the fuzzy similarity of a flattened key against the schema is
+computed the first time that key shape is seen and memoized. Resolving a lead
+is then dictionary lookups only, with the same results as the original loop.
+Per-field outcomes are logged at DEBUG; each lead gets one INFO summary record
+instead, carrying the full outcome (which fields came from fuzzy matches, which
+are missing) as its `lead_summary` attribute.
+
+SchemaProjection uses the same compiled schema to decide, while a payload is
+being flattened, which keys the resolver could ever read, so the rest of the
+payload never has to be flattened at all.
+"""
+import logging
+import re
+import threading
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+EMPTY_VALUES = [None, '', [], {}]
+# Flat keys this similar to a field are used when no alias matches
+FLAT_FUZZY_THRESHOLD = 0.8
+# The single closest key across all sources is used above this similarity
+CLOSEST_FUZZY_THRESHOLD = 0.90
+
+# Collections whose "<base>_<n>_<sub>" schema fields map to "<prefix>_<collection>_collection_<n>_<sub>"
+COMPANY_COLLECTIONS = [
+    "updates", "specialties", "featured_employees", "funding_rounds",
+    "also_viewed", "crunchbase_info", "featured_investors",
+]
+COMPANY_ALIASES = {
+    "display_name": ["name"],
+    "website_url": ["website"],
+    "logo_url": ["logo"],
+    "industry": ["industry"],
+    "description": ["description"],
+    "size": ["size"],
+    "founded": ["founded_year"],
+    "headquarters": ["headquarters_city", "headquarters_new_address"],
+}
+EMPLOYEE_ALIASES = {
+    "full_name": ["name"],
+    "headline": ["user_generated_headline"],
+    "url": ["professional_network_url"],
+    "canonical_url": ["canonical_url"],
+    "location": ["location_full"],
+}
+
+
+def _is_empty(value) -> bool:
+    return value in EMPTY_VALUES
+
+
+def field_key_variants(field: str) -> List[str]:
+    """Ordered list of source keys that may hold `field`, most specific first."""
+    key_variants = [field]
+    m = re.match(r'(company|employee)_(\w+?)_(\d+)_(\w+)', field)
+    if m:
+        prefix, coll, idx, sub = m.groups()
+        key_variants.append(f"{prefix}_{coll}_{idx}_{sub}")
+        key_variants.append(f"{prefix}_{coll}_collection_{idx}_{sub}")
+        key_variants.append(f"{prefix}_{prefix}_{coll}_collection_{idx}_{sub}")
+        key_variants.append(f"cs_{prefix}_{coll}_collection_{idx}_{sub}")
+    if field.startswith("company_"):
+        base = field[len("company_"):]
+        key_variants.append(base)
+        key_variants.extend(COMPANY_ALIASES.get(base, []))
+        for coll in COMPANY_COLLECTIONS:
+            m = re.match(rf"{coll}_(\d+)_(.*)", base) if f"{coll}_" in base else None
+            if m:
+                idx, sub = m.groups()
+                key_variants.append(f"company_company_{coll}_collection_{idx}_{sub}")
+        if "locations_" in base:
+            m = re.match(r"locations_(\d+)_(.*)", base)
+            if m:
+                idx, sub = m.groups()
+                key_variants.append(f"company_company_locations_collection_{idx}_location_{sub}")
+                key_variants.append(f"company_company_locations_collection_{idx}_{sub}")
+    if field.startswith("employee_"):
+        base = field[len("employee_"):]
+        key_variants.append(base)
+        key_variants.extend(EMPLOYEE_ALIASES.get(base, []))
+        for coll in ("experience", "education"):
+            m = re.match(rf"{coll}_(\d+)_(.*)", base) if f"{coll}_" in base else None
+            if m:
+                idx, sub = m.groups()
+                key_variants.append(f"employee_member_{coll}_collection_{idx}_{sub}")
+    return list(dict.fromkeys(key_variants))
+
+
+class SchemaResolver:
+    """
+    Maps OUTPUT_SCHEMA fields to values from the enrichment source dicts.
+
+    Sources are searched in order (company_map, person_map, company_flat,
+    person_flat, the lead itself) for the first non-empty alias. Fields with no
+    alias hit fall back to the most similar flattened key, exactly as the old
+    per-field SequenceMatcher scan did, but similarities are memoized per key.
+    """
+
+    def __init__(self, schema: Sequence[str]):
+        self.schema = list(schema)
+        self.fields = list(dict.fromkeys(self.schema))
+        self.variants: Dict[str, List[str]] = {f: field_key_variants(f) for f in self.fields}
+        # One matcher per field with the field as seq2, so its b2j index is built once
+        self._matchers = {f: SequenceMatcher(None, '', f.lower()) for f in self.fields}
+        self._similar: Dict[str, List[Tuple[str, float]]] = {}
+        self._lock = threading.Lock()
+        self._learn(self.fields)
+
+    def _learn(self, keys):
+        """Memoize which schema fields each new key is similar to."""
+        new_keys = [k for k in keys if k not in self._similar]
+        if not new_keys:
+            return
+        with self._lock:
+            for key in new_keys:
+                if key in self._similar:
+                    continue
+                matches = []
+                for field in self.fields:
+                    sm = self._matchers[field]
+                    sm.set_seq1(key.lower())
+                    # real_quick_ratio/quick_ratio are upper bounds on ratio, so this prefilter is exact
+                    if sm.real_quick_ratio() <= FLAT_FUZZY_THRESHOLD or sm.quick_ratio() <= FLAT_FUZZY_THRESHOLD:
+                        continue
+                    ratio = sm.ratio()
+                    if ratio > FLAT_FUZZY_THRESHOLD:
+                        matches.append((field, ratio))
+                self._similar[key] = matches
+
+    def similar_fields(self, key: str) -> List[Tuple[str, float]]:
+        if key not in self._similar:
+            self._learn([key])
+        return self._similar[key]
+
+    def resolve(self, enriched: dict, company_map: dict, person_map: dict, company_flat: dict, person_flat: dict) -> dict:
+        """Populate every schema field of `enriched` in place and return it."""
+        sources = [company_map, person_map, company_flat, person_flat, enriched]
+        for src in sources:
+            self._learn(src)
+        # field -> [(similarity, source index, position in source, key)], in source order
+        candidates = defaultdict(list)
+        for si, src in enumerate(sources):
+            for pos, key in enumerate(src):
+                for field, ratio in self._similar[key]:
+                    candidates[field].append((ratio, si, pos, key))
+        next_pos = len(enriched)
+        detail = logger.isEnabledFor(logging.DEBUG)
+        summary = {"lead": enriched.get('contact_email') or enriched.get('email') or enriched.get('name', ''),
+                   "fields": len(self.schema), "alias": 0, "fuzzy": {}, "missing": []}
+        for field in self.schema:
+            val, used_key, outcome = self._lookup(field, sources, candidates.get(field, ()), detail)
+            if outcome == "alias":
+                summary["alias"] += 1
+            elif outcome == "fuzzy":
+                summary["fuzzy"][field] = used_key
+            else:
+                summary["missing"].append(field)
+            if used_key and detail:
+                logger.debug(f"[ENRICH][USED_KEY] Field '{field}' populated from key '{used_key}'")
+            if field not in enriched:
+                # The lead is itself a source, so later fields can match this one
+                for other, ratio in self.similar_fields(field):
+                    candidates[other].append((ratio, 4, next_pos, field))
+                next_pos += 1
+            enriched[field] = val
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"[ENRICH][SUMMARY] lead={summary['lead']} fields={summary['fields']} alias={summary['alias']} "
+                        f"fuzzy={len(summary['fuzzy'])} missing={len(summary['missing'])}", extra={"lead_summary": summary})
+        return enriched
+
+    def _lookup(self, field, sources, candidates, detail=False):
+        """(value, key it came from, "alias" | "fuzzy" | "missing")."""
+        for src in sources:
+            for k in self.variants[field]:
+                if k in src and not _is_empty(src[k]):
+                    return src[k], k, "alias"
+        # Fuzzy fallback: earliest sufficiently similar non-empty key in the flattened dicts
+        for si in (2, 3):
+            best = None
+            for ratio, s, pos, key in candidates:
+                if s == si and not _is_empty(sources[si][key]) and (best is None or pos < best[0]):
+                    best = (pos, key, ratio)
+            if best:
+                if detail:
+                    logger.debug(f"[ENRICH][MISSING][DEBUG_FLAT_FUZZY] Field '{field}' not found, using closest debug flat key '{best[1]}' (similarity {best[2]:.2f})")
+                return sources[si][best[1]], best[1], "fuzzy"
+        if candidates:
+            max_ratio, si, _, closest = max(candidates, key=lambda c: (c[0], -c[1], -c[2]))
+            closest_val = sources[si][closest]
+            if max_ratio > CLOSEST_FUZZY_THRESHOLD and not _is_empty(closest_val):
+                if detail:
+                    logger.debug(f"[ENRICH][MISSING][FUZZY] Field '{field}' not found, using closest key '{closest}' (similarity {max_ratio:.2f})")
+                return closest_val, closest, "fuzzy"
+            if detail:
+                logger.debug(f"[ENRICH][MISSING][ALIAS] Field '{field}' not found, closest match: '{closest}' (similarity {max_ratio:.2f})")
+        elif detail:
+            logger.debug(f"[ENRICH][MISSING] Field '{field}' not found in any enrichment source for lead: {sources[4].get('name', '')} / {sources[4].get('email', '')}")
+        return '', None, "missing"
+
+
+class SchemaProjection:
+    """
+    The flattened keys a SchemaResolver can use, as keep/enter predicates for
+    core_sig.flatten.flatten_nested.
+
+    A leaf key is kept if it is an alias of some field, one of `extra_keys`, or
+    similar enough to a field for the fuzzy fallback. A container is entered if
+    it is on the path to such a key, or if some key below it could still reach
+    FLAT_FUZZY_THRESHOLD: a key extending prefix p by any characters has
+    ratio <= 2|f| / (2|f| + u) against field f, where u is the number of
+    characters of p that f cannot match, so nothing below p can match f unless
+    u < |f| / 2. Resolving over a projection therefore gives the same values as
+    resolving over the full flattening; only keys no field can use are dropped.
+    """
+
+    def __init__(self, resolver: SchemaResolver, extra_keys: Iterable[str] = ()):
+        self.resolver = resolver
+        self.keys = {k for variants in resolver.variants.values() for k in variants}
+        self.keys.update(extra_keys)
+        self.prefixes = {k[:i] for k in self.keys for i, ch in enumerate(k) if ch == '_'}
+        self._field_chars = [(Counter(f.lower()), len(f.lower())) for f in resolver.fields]
+        self._keep: Dict[str, bool] = {}
+        self._enter: Dict[str, bool] = {}
+
+    def keep(self, key: str) -> bool:
+        wanted = self._keep.get(key)
+        if wanted is None:
+            wanted = self._keep[key] = key in self.keys or bool(self.resolver.similar_fields(key))
+        return wanted
+
+    def enter(self, prefix: str) -> bool:
+        wanted = self._enter.get(prefix)
+        if wanted is None:
+            wanted = self._enter[prefix] = prefix in self.prefixes or self._may_match_below(prefix)
+        return wanted
+
+    def _may_match_below(self, prefix: str) -> bool:
+        chars = Counter(prefix.lower())
+        size = sum(chars.values())
+        for field_chars, field_len in self._field_chars:
+            unmatched = size - sum(min(n, field_chars[c]) for c, n in chars.items())
+            if 2 * unmatched < field_len:
+                return True
+        return False
+
+
+_resolvers: Dict[tuple, SchemaResolver] = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_resolver(schema: Sequence[str]) -> SchemaResolver:
+    """Return the resolver compiled for this exact schema, compiling it on first use."""
+    key = tuple(schema)
+    with _resolvers_lock:
+        resolver = _resolvers.get(key)
+        if resolver is None:
+            resolver = SchemaResolver(key)
+            _resolvers[key] = resolver
+            logger.info(f"Compiled schema resolver for {len(resolver.fields)} fields")
+        return resolver
@@ -1,10 +1,17 @@
+import os
+import sys
 import pandas as pd
 
-# Read the enhanced enrichment CSV
-df = pd.read_csv('enhanced_enrichment.csv')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core_sig.columnar import read_table, table_columns
+
+# Read the enhanced enrichment output (Parquet if there is one), only the columns checked below
+path = 'enhanced_enrichment.parquet' if os.path.exists('enhanced_enrichment.parquet') else 'enhanced_enrichment.csv'
+all_columns = table_columns(path)
+df = read_table(path, columns=[c for c in all_columns if c.startswith('cs_employee_') or c == 'recipient_email'])
 
 print(f"Total rows: {len(df)}")
-print(f"Total columns: {len(df.columns)}")
+print(f"Total columns: {len(all_columns)}")
 
 # Check for employee columns
 employee_cols = [col for col in df.columns if col.startswith('cs_employee_')]
@@ -2,7 +2,16 @@ import os
 from datetime import timedelta
 
 API_KEY = os.getenv('CORESIGNAL_API_KEY')
+API_ROOT = os.getenv('CORESIGNAL_API_ROOT', 'https://api.coresignal.com').rstrip('/')
 CONCURRENCY = 10
 CACHE_TTL_DAYS = 7
 CACHE_DIR = '.cache'
-LOG_LEVEL = 'INFO' 
\ No newline at end of file
+LOG_LEVEL = 'INFO'
+# Per-stage span trace (core_sig/tracing.py) as Chrome trace-event JSON; '' disables tracing
+TRACE_PATH = os.getenv('CORESIGNAL_TRACE', '')
+
+# Pooled httpx.AsyncClient (core_sig/client.py)
+HTTP_MAX_CONNECTIONS = int(os.getenv('CORESIGNAL_HTTP_MAX_CONNECTIONS', 20))
+HTTP_MAX_KEEPALIVE = int(os.getenv('CORESIGNAL_HTTP_MAX_KEEPALIVE', 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('CORESIGNAL_HTTP_KEEPALIVE_EXPIRY', 30))
+HTTP2 = os.getenv('CORESIGNAL_HTTP2', '').lower() in ('1', 'true', 'yes')
@@ -8,11 +8,15 @@ from pathlib import Path
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 import asyncio
 from tqdm.asyncio import tqdm
+from stuff.config import API_ROOT, CONCURRENCY, TRACE_PATH
+from core_sig.tracing import get_tracer
 
 CORESIGNAL_API_KEY = os.getenv("CORESIGNAL_API_KEY")
 CACHE_ROOT = Path(".cache")
 CACHE_ROOT.mkdir(exist_ok=True)
 
+tracer = get_tracer()
+
 HEADERS = {"Authorization": f"Token {CORESIGNAL_API_KEY}"}
 
 CACHE_TTL = timedelta(days=7)
@@ -38,7 +42,7 @@ async def cached_get(client: httpx.AsyncClient, endpoint: str, cache_key: str) -
         if datetime.now() - mtime < CACHE_TTL:
             with open(cache_path, "r", encoding="utf-8") as f:
                 return json.load(f)
-    url = f"https://api.coresignal.com{endpoint}"
+    url = f"{API_ROOT}{endpoint}"
     resp = await client.get(url, headers=HEADERS, timeout=30)
     resp.raise_for_status()
     data = resp.json()
@@ -113,7 +117,31 @@ def pct_delta(a: Optional[float], b: Optional[float]) -> Optional[float]:
         return None
     return round(100 * (a - b) / b, 2)
 
+async def fetch_org(client: httpx.AsyncClient, company_id) -> Dict[str, Any]:
+    """The six org calls only need the company id, so they run concurrently."""
+    date_from = (datetime.now() - timedelta(days=30)).date().isoformat()
+    with tracer.span("fetch_org"):
+        org, head, fund, jobs, tech, traffic = await asyncio.gather(
+            cached_get(client, ENDPOINTS["org_core"].format(org_id=company_id), f"org_{company_id}"),
+            cached_get(client, ENDPOINTS["org_headcount"].format(org_id=company_id), f"head_{company_id}"),
+            cached_get(client, ENDPOINTS["org_funding"].format(org_id=company_id), f"fund_{company_id}"),
+            cached_get(client, ENDPOINTS["org_jobs"].format(org_id=company_id, date_from=date_from), f"jobs_{company_id}_{date_from}"),
+            cached_get(client, ENDPOINTS["org_tech"].format(org_id=company_id), f"tech_{company_id}"),
+            cached_get(client, ENDPOINTS["org_traffic"].format(org_id=company_id), f"traffic_{company_id}"),
+        )
+    return {"org": org, "head": head, "fund": fund, "jobs": jobs, "tech": tech, "traffic": traffic}
+
 async def enrich_one(lead: pd.Series, client: httpx.AsyncClient) -> Dict[str, Any]:
+    """
+    Calls run in dependency order: person search, then profile and skills
+    together, then the org calls together. When the company id is already
+    known (from the lead or the search hit) the org calls start alongside the
+    profile instead of waiting for it.
+    """
+    with tracer.span("enrich_one"):
+        return await _enrich_one(lead, client)
+
+async def _enrich_one(lead: pd.Series, client: httpx.AsyncClient) -> Dict[str, Any]:
     out = {k: lead.get(k, "") for k in lead.index}
     email = lead.get("email", "")
     profile_id = None
@@ -121,7 +149,8 @@ async def enrich_one(lead: pd.Series, client: httpx.AsyncClient) -> Dict[str, An
     # 1. Person by email
     if email:
         try:
-            person = await cached_get(client, ENDPOINTS["person_search"].format(email=email), email)
+            with tracer.span("person_search"):
+                person = await cached_get(client, ENDPOINTS["person_search"].format(email=email), email)
             if person and person.get("results"):
                 profile_id = person["results"][0]["profile_id"]
                 org_id = person["results"][0].get("org_id")
@@ -132,8 +161,21 @@ async def enrich_one(lead: pd.Series, client: httpx.AsyncClient) -> Dict[str, An
         out["error"] = "not_found"
         return out
     out["person_id"] = profile_id
-    # 3. Person profile
-    person_profile = await cached_get(client, ENDPOINTS["person_profile"].format(profile_id=profile_id), profile_id)
+    # 3-4. Person profile and skills, plus the org calls if the company id is already known
+    org_task = None
+    company_id = lead.get("coresignal_company_id") or org_id
+    if company_id:
+        org_task = asyncio.ensure_future(fetch_org(client, company_id))
+    try:
+        with tracer.span("person_profile"):
+            person_profile, skills = await asyncio.gather(
+                cached_get(client, ENDPOINTS["person_profile"].format(profile_id=profile_id), profile_id),
+                cached_get(client, ENDPOINTS["person_skills"].format(profile_id=profile_id), f"skills_{profile_id}"),
+            )
+    except BaseException:
+        if org_task:
+            org_task.cancel()
+        raise
     out["first_name"] = person_profile.get("first_name", "")
     out["last_name"] = person_profile.get("last_name", "")
     out["location_city"] = person_profile.get("location", {}).get("city", "")
@@ -143,8 +185,6 @@ async def enrich_one(lead: pd.Series, client: httpx.AsyncClient) -> Dict[str, An
     out["linkedin_connections"] = person_profile.get("connections_count", "")
     stats = person_profile.get("stats", {})
     out["activity_score_30d"] = stats.get("posts_30d", 0) * 0.4 + stats.get("reactions_30d", 0) * 0.6
-    # 4. Skills
-    skills = await cached_get(client, ENDPOINTS["person_skills"].format(profile_id=profile_id), f"skills_{profile_id}")
     out["skills_top5"] = top5_skills(skills.get("skills", []))
     # 5. Current title/role
     exp = person_profile.get("experience", [])
@@ -154,40 +194,32 @@ async def enrich_one(lead: pd.Series, client: httpx.AsyncClient) -> Dict[str, An
     out["department"] = derive_department(title)
     out["persona_type"] = derive_persona_type(out["seniority"], out["department"])
     # 6. Company ID
-    company_id = lead.get("coresignal_company_id") or org_id or current_exp.get("org_id")
+    company_id = company_id or current_exp.get("org_id")
     if not company_id:
         out["error"] = "no_company_id"
         return out
     out["company_id"] = company_id
-    # 7. Company core
-    org = await cached_get(client, ENDPOINTS["org_core"].format(org_id=company_id), f"org_{company_id}")
+    # 7-12. Company core, headcount, funding, jobs, tech, traffic
+    with tracer.span("await_org"):
+        company = await (org_task or fetch_org(client, company_id))
+    org = company["org"]
     out["company_name"] = org.get("name", "")
     out["website"] = org.get("website", "")
     out["industry"] = org.get("industry", "")
-    # 8. Headcount
-    head = await cached_get(client, ENDPOINTS["org_headcount"].format(org_id=company_id), f"head_{company_id}")
-    months = sorted(head.get("data", []), key=lambda x: x["date"], reverse=True)
+    months = sorted(company["head"].get("data", []), key=lambda x: x["date"], reverse=True)
     out["headcount_current"] = months[0]["value"] if months else None
     out["headcount_3mo_delta_pct"] = pct_delta(months[0]["value"], months[2]["value"]) if len(months) > 2 else None
-    # 9. Funding
-    fund = await cached_get(client, ENDPOINTS["org_funding"].format(org_id=company_id), f"fund_{company_id}")
+    fund = company["fund"]
     if fund.get("results"):
         f = fund["results"][0]
         out["funding_round_type"] = f.get("type", "")
         out["funding_amount_usd"] = f.get("amount_usd", "")
         out["funding_announced_date"] = f.get("announced_date", "")
-    # 10. Jobs
-    date_from = (datetime.now() - timedelta(days=30)).date().isoformat()
-    jobs = await cached_get(client, ENDPOINTS["org_jobs"].format(org_id=company_id, date_from=date_from), f"jobs_{company_id}_{date_from}")
-    out["open_jobs_30d"] = len(jobs.get("results", []))
-    # 11. Tech
-    tech = await cached_get(client, ENDPOINTS["org_tech"].format(org_id=company_id), f"tech_{company_id}")
+    out["open_jobs_30d"] = len(company["jobs"].get("results", []))
     out["tech_tags"] = ", ".join(
         t.get("name", "") if isinstance(t, dict) and t.get("name") else json.dumps(t, ensure_ascii=False) if isinstance(t, dict) else str(t)
-        for t in tech.get("technologies", []) if (isinstance(t, dict) and t.get("name")) or t)
-    # 12. Traffic
-    traffic = await cached_get(client, ENDPOINTS["org_traffic"].format(org_id=company_id), f"traffic_{company_id}")
-    visits = sorted(traffic.get("data", []), key=lambda x: x["date"], reverse=True)
+        for t in company["tech"].get("technologies", []) if (isinstance(t, dict) and t.get("name")) or t)
+    visits = sorted(company["traffic"].get("data", []), key=lambda x: x["date"], reverse=True)
     out["traffic_monthly_visits"] = visits[0]["visits"] if visits else None
     out["traffic_3mo_delta_pct"] = pct_delta(visits[0]["visits"], visits[2]["visits"]) if len(visits) > 2 else None
     # 13. Staleness
@@ -203,9 +235,17 @@ async def enrich_one(lead: pd.Series, client: httpx.AsyncClient) -> Dict[str, An
             out[f"person_{k}"] = v
     return out
 
-async def enrich_all(leads: pd.DataFrame) -> List[Dict[str, Any]]:
-    async with httpx.AsyncClient(timeout=30) as client:
-        tasks = [enrich_one(row, client) for _, row in leads.iterrows()]
+async def enrich_all(leads: pd.DataFrame, concurrency: int = CONCURRENCY) -> List[Dict[str, Any]]:
+    """Enrich every lead, with at most `concurrency` leads in flight at once."""
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency * 6, max_keepalive_connections=concurrency * 6)
+
+    async def bounded(row):
+        async with semaphore:
+            return await enrich_one(row, client)
+
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        tasks = [bounded(row) for _, row in leads.iterrows()]
         results = []
         for f in tqdm.as_completed(tasks, total=len(tasks), desc="Leads"):
             res = await f
@@ -214,6 +254,9 @@ async def enrich_all(leads: pd.DataFrame) -> List[Dict[str, Any]]:
 
 def enrich_leads(leads: pd.DataFrame) -> pd.DataFrame:
     """Enrich a DataFrame of leads using CoreSignal API."""
+    if not tracer.enabled:
+        # Written (with the stage table) at exit, so repeated calls share one trace
+        tracer.start(TRACE_PATH)
     results = asyncio.run(enrich_all(leads))
     df = pd.DataFrame(results)
     return df 
\ No newline at end of file
@@ -60,6 +60,8 @@ class CoreSignalEmployeeEnricher:
         self.session.headers.update(self.headers)
         self.employee_search_url = f"{self.base_url}/employee_clean/search/es_dsl"
         self.employee_collect_url = f"{self.base_url}/employee_clean/collect"
+        self.collect_batch_size = 20
+        self._details: Dict[str, Dict] = {}  # employee id -> profile, filled by batch collects
         
     def make_request(self, url: str, method: str = "GET", **kwargs) -> Optional[Dict]:
         """Make a robust API request with error handling."""
@@ -226,6 +228,8 @@ class CoreSignalEmployeeEnricher:
             if not isinstance(results, list) or not results:
                 logger.info(f"[SEARCH] No results for: {full_name}")
                 return None
+            # One batched collect covers the candidates checked below and in the fallback
+            self.get_employee_details_batch([str(c) for c in results[:15]])
             # Check top 10 results for strong matches first
             for idx, candidate_id in enumerate(results[:10]):
                 logger.info(f"[SEARCH] Checking candidate {idx+1}: ID={candidate_id}")
@@ -263,8 +267,24 @@ class CoreSignalEmployeeEnricher:
             logger.error(f"[SEARCH] Exception: {e}")
             return None
 
+    def get_employee_details_batch(self, employee_ids: List[str]) -> Dict[str, Dict]:
+        """Collect many employees with one request per collect_batch_size ids. Returns {id: profile}."""
+        pending = [i for i in dict.fromkeys(str(e) for e in employee_ids) if i not in self._details]
+        for start in range(0, len(pending), self.collect_batch_size):
+            chunk = pending[start:start + self.collect_batch_size]
+            url = f"{self.employee_collect_url}?ids={','.join(chunk)}"
+            logger.info(f"[API] Fetching {len(chunk)} employee details in one request")
+            data = self.make_request(url)
+            for employee in data if isinstance(data, list) else [data] if data else []:
+                if isinstance(employee, dict) and employee.get('id') is not None:
+                    self._details[str(employee['id'])] = employee
+            time.sleep(self.rate_limit_delay)
+        return {i: self._details[i] for i in dict.fromkeys(str(e) for e in employee_ids) if i in self._details}
+
     def get_employee_details(self, employee_id: str) -> Optional[Dict]:
         """Get detailed employee information using the Employee Clean API."""
+        if str(employee_id) in self._details:
+            return self._details[str(employee_id)]
         try:
             url = f"{self.employee_collect_url}?ids={employee_id}"
             logger.info(f"[API] Fetching employee details for ID: {employee_id} at {url}")
@@ -768,6 +788,7 @@ class CoreSignalEmployeeEnricher:
     def enrich_employee_data(self, row: pd.Series, row_index: int = None) -> Dict:
         """Enrich employee data with fallback and warning flags."""
         enriched_data = {}
+        self._details.clear()  # batch-collected candidates are only reused within one row
         
         # Extract employee information
         full_name = row.get('contact_full_name', '')
@@ -20,6 +20,10 @@ from collections import defaultdict
 from pathlib import Path
 import tldextract
 
+# Shared token bucket lives in the repo-level core_sig package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core_sig.rate_limit import get_limiter, parse_retry_after
+
 # Setup logging
 def setup_logging(log_file: str = None):
     """Setup dual logging: INFO to console, DEBUG to file"""
@@ -166,7 +170,7 @@ class CoreSignalClient:
         self.base_url = "https://api.coresignal.com/cdapi/v2"
         self.timeout = timeout
         self.rate_limit = rate_limit
-        self.last_call = 0
+        self.rate_limiter = get_limiter("coresignal", rate=1 / rate_limit)
         
         self.session = requests.Session()
         self.session.headers.update({
@@ -180,11 +184,8 @@ class CoreSignalClient:
         self.employee_cache: Dict[str, Any] = {}
 
     def _wait(self):
-        """Implement rate limiting"""
-        elapsed = time.time() - self.last_call
-        if elapsed < self.rate_limit:
-            time.sleep(self.rate_limit - elapsed)
-        self.last_call = time.time()
+        """Implement rate limiting via the shared token bucket"""
+        self.rate_limiter.acquire()
 
     def _request_with_retry(self, method: str, url: str, **kwargs) -> requests.Response:
         """Make HTTP request with retry logic"""
@@ -214,9 +215,10 @@ class CoreSignalClient:
                     logger.error(f"API validation error (422): {resp.text}")
                     return resp
                 elif resp.status_code == 429:
-                    retry_after = int(resp.headers.get('Retry-After', base_delay * (2 ** attempt)))
+                    retry_after = parse_retry_after(resp.headers.get('Retry-After'), base_delay * (2 ** attempt))
                     logger.warning(f"Rate limited, waiting {retry_after}s")
-                    time.sleep(retry_after)
+                    # The next _wait() blocks until the limiter's pause ends
+                    self.rate_limiter.penalize(retry_after)
                     continue
                 elif resp.status_code == 401:
                     logger.error("Authentication failed - check API key")
@@ -51,6 +51,8 @@ def main():
                     print(f"v2 error: {e}")
             except Exception as e:
                 print(f"Diagnostic error: {e}")
+            finally:
+                await client.aclose()
         asyncio.run(diag())
         return
     if not args.input_csv:
@@ -4,7 +4,15 @@ import csv
 import time
 from tqdm import tqdm
 import os
+import sys
 import logging
+import argparse
+
+# Shared checkpoint journal lives in the repo-level core_sig package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core_sig.checkpoint import CheckpointJournal
+from core_sig.flatten import JSON, flatten_nested
+from core_sig.columnar import OUTPUT_FORMATS, ParquetRowWriter, output_path, require_pyarrow
 
 # READ:
 # Basically, we try to target high level executives/decision makers. If we can't find them, 
@@ -111,16 +119,7 @@ def robust_request(method, url, headers=None, json_data=None, timeout=30, max_re
 
 # --- Helper to flatten employee dicts ---
 def flatten_dict(d, parent_key='', sep='_'):
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
-        elif isinstance(v, list):
-            items.append((new_key, json.dumps(v, ensure_ascii=False)))
-        else:
-            items.append((new_key, v))
-    return dict(items)
+    return flatten_nested(d, parent_key, sep, lists=JSON)
 
 # ========== LOGGING SETUP ==========
 LOG_FILE = 'enrichment.log'
@@ -135,21 +134,23 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # ========== CHECKPOINTING ==========
-CHECKPOINT_FILE = 'enrichment_checkpoint.json'
-def load_checkpoint():
-    if os.path.exists(CHECKPOINT_FILE):
+# Append-only journal: one line per finished company with its employees, so a
+# resumed run restores their rows instead of writing them out empty
+CHECKPOINT_FILE = 'enrichment_checkpoint.jsonl'
+LEGACY_CHECKPOINT_FILE = 'enrichment_checkpoint.json'
+
+def open_checkpoint():
+    journal = CheckpointJournal(CHECKPOINT_FILE)
+    # Carry over company ids from the old whole-set JSON checkpoint (no employees were saved there)
+    if not len(journal) and os.path.exists(LEGACY_CHECKPOINT_FILE):
         try:
-            with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
-                return set(json.load(f))
+            with open(LEGACY_CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
+                for company_id in json.load(f):
+                    journal.record(company_id, [])
+            logger.info(f"Imported {len(journal)} companies from legacy checkpoint {LEGACY_CHECKPOINT_FILE}")
         except Exception as e:
-            logger.warning(f"Failed to load checkpoint: {e}")
-    return set()
-def save_checkpoint(processed_company_ids):
-    try:
-        with open(CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(list(processed_company_ids), f)
-    except Exception as e:
-        logger.error(f"Failed to save checkpoint: {e}")
+            logger.warning(f"Failed to load legacy checkpoint: {e}")
+    return journal
 
 def safe_stringify(value):
     if isinstance(value, (dict, list)):
@@ -236,33 +237,46 @@ def get_employees_for_company(company_id, company_name=None, max_employees=20, c
     return []
 
 # --- Helper to fetch and flatten employees ---
-def fetch_and_flatten_employees(people, company_id, headers, max_employees=20):
-    employees = []
-    seen = set()
-    for idx, emp_id in enumerate(people, 1):
-        if len(employees) >= max_employees:
-            break
-        if emp_id in seen:
-            continue
-        seen.add(emp_id)
-        logger.info(f"  Collecting employee {idx}/{len(people)} for company {company_id}: {emp_id}")
-        emp_id_int = int(float(emp_id))
-        collect_url = f"https://api.coresignal.com/cdapi/v2/employee_clean/collect?ids={emp_id_int}"
+COLLECT_BATCH_SIZE = 20  # ids per employee_clean/collect request
+
+def collect_employees_batch(emp_ids, headers):
+    """Collect employees with one request per COLLECT_BATCH_SIZE ids. Returns {id: employee}."""
+    collected = {}
+    for start in range(0, len(emp_ids), COLLECT_BATCH_SIZE):
+        chunk = emp_ids[start:start + COLLECT_BATCH_SIZE]
+        collect_url = f"https://api.coresignal.com/cdapi/v2/employee_clean/collect?ids={','.join(str(i) for i in chunk)}"
         emp_resp = robust_request('GET', collect_url, headers)
         if not emp_resp or emp_resp.status_code != 200:
-            logger.warning(f"Failed to collect employee {emp_id} for company {company_id}")
+            logger.warning(f"Failed to collect employee batch {chunk}")
             continue
         try:
             data = emp_resp.json()
-            if isinstance(data, list) and data:
-                data = data[0]
         except Exception as e:
-            logger.warning(f"Error parsing employee JSON for {emp_id}: {e}")
+            logger.warning(f"Error parsing employee batch JSON for {chunk}: {e}")
             continue
-        flat = flatten_dict(data)
-        flat['enriched_company_id'] = company_id
-        employees.append(flat)
-        time.sleep(0.5)
+        for emp in data if isinstance(data, list) else [data]:
+            if isinstance(emp, dict) and emp.get('id') is not None:
+                collected[int(float(emp['id']))] = emp
+    return collected
+
+def fetch_and_flatten_employees(people, company_id, headers, max_employees=20):
+    employees = []
+    emp_ids = list(dict.fromkeys(int(float(emp_id)) for emp_id in people))
+    # Collect in batches, topping up until max_employees profiles came back
+    pos = 0
+    while pos < len(emp_ids) and len(employees) < max_employees:
+        chunk = emp_ids[pos:pos + min(COLLECT_BATCH_SIZE, max_employees - len(employees))]
+        pos += len(chunk)
+        logger.info(f"  Collecting {len(chunk)} employees for company {company_id}: {chunk}")
+        collected = collect_employees_batch(chunk, headers)
+        for emp_id in chunk:
+            data = collected.get(emp_id)
+            if data is None:
+                logger.warning(f"Failed to collect employee {emp_id} for company {company_id}")
+                continue
+            flat = flatten_dict(data)
+            flat['enriched_company_id'] = company_id
+            employees.append(flat)
     return employees
 
 # --- Main enrichment loop ---
@@ -271,11 +285,32 @@ OUTPUT_CSV = 'finalenrichment.csv'
 COMPANY_ID_COLUMN = 'cs_company_id'
 
 
-def main():
+def iter_output_rows(rows, company_cache, all_emp_keys):
+    """One output row per employee found for the row's company, or one row with empty employee fields."""
+    for row in rows:
+        employees = company_cache.get(row[COMPANY_ID_COLUMN], [])
+        if employees:
+            for emp in employees:
+                out_row = row.copy()
+                out_row.update(emp)
+                yield out_row
+        else:
+            out_row = row.copy()
+            out_row.update({k: '' for k in all_emp_keys})
+            yield out_row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enrich each company in the input with up to 20 employees")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv', help='csv, or parquet for typed, compressed columnar output (needs pyarrow)')
+    args = parser.parse_args(argv)
+    if args.output_format == 'parquet':
+        require_pyarrow()
+    output_file = output_path(OUTPUT_CSV, args.output_format)
     logger.info("==============================")
     logger.info("Starting Company/Employee Enrichment Script")
     logger.info(f"Input CSV: {INPUT_CSV}")
-    logger.info(f"Output CSV: {OUTPUT_CSV}")
+    logger.info(f"Output file: {output_file}")
     logger.info(f"Checkpoint file: {CHECKPOINT_FILE}")
     logger.info(f"Log file: {LOG_FILE}")
     logger.info("==============================")
@@ -284,14 +319,17 @@ def main():
         rows = list(reader)
         company_ids = set(row[COMPANY_ID_COLUMN] for row in rows if row[COMPANY_ID_COLUMN])
         company_id_to_name = {row[COMPANY_ID_COLUMN]: row.get('company_name', None) for row in rows if row[COMPANY_ID_COLUMN]}
-    processed_company_ids = load_checkpoint()
+    journal = open_checkpoint()
     all_emp_keys = set()
-    logger.info(f"Loaded {len(company_ids)} companies. {len(processed_company_ids)} already processed. Starting enrichment.")
+    logger.info(f"Loaded {len(company_ids)} companies. {len(journal)} already processed. Starting enrichment.")
     company_cache = {}
     with tqdm(total=len(company_ids), desc='Companies') as pbar:
         for company_id in company_ids:
-            if company_id in processed_company_ids:
+            if company_id in journal:
                 logger.debug(f"Skipping already processed company: {company_id}")
+                company_cache[company_id] = journal.get(company_id) or []
+                for emp in company_cache[company_id]:
+                    all_emp_keys.update(emp.keys())
                 pbar.update(1)
                 continue
             logger.info(f"Processing company: {company_id} ({company_id_to_name.get(company_id)})")
@@ -308,32 +346,24 @@ def main():
             company_cache[company_id] = employees
             for emp in employees:
                 all_emp_keys.update(emp.keys())
-            processed_company_ids.add(company_id)
-            save_checkpoint(processed_company_ids)
+            journal.record(company_id, employees)
             logger.debug(f"Checkpoint saved after company {company_id}")
             pbar.update(1)
             time.sleep(1)
-    logger.info(f"Writing output to {OUTPUT_CSV} ...")
-    with open(OUTPUT_CSV, 'w', newline='', encoding='utf-8') as outfile:
-        fieldnames = list(rows[0].keys()) + sorted(all_emp_keys)
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in rows:
-            company_id = row[COMPANY_ID_COLUMN]
-            employees = company_cache.get(company_id, [])
-            if employees:
-                for emp in employees:
-                    out_row = row.copy()
-                    out_row.update(emp)
-                    out_row = {k: safe_stringify(v) for k, v in out_row.items()}
-                    writer.writerow(out_row)
-            else:
-                empty_emp = {k: '' for k in all_emp_keys}
-                out_row = row.copy()
-                out_row.update(empty_emp)
-                out_row = {k: safe_stringify(v) for k, v in out_row.items()}
-                writer.writerow(out_row)
-    logger.info(f"Enrichment complete. Output written to {OUTPUT_CSV}")
+    journal.close()
+    logger.info(f"Writing output to {output_file} ...")
+    fieldnames = list(rows[0].keys()) + sorted(all_emp_keys)
+    if args.output_format == 'parquet':
+        # Parquet keeps the values typed; lists and dicts become JSON strings
+        with ParquetRowWriter(output_file, columns=fieldnames) as writer:
+            writer.write_rows(iter_output_rows(rows, company_cache, all_emp_keys))
+    else:
+        with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+            writer.writeheader()
+            for out_row in iter_output_rows(rows, company_cache, all_emp_keys):
+                writer.writerow({k: safe_stringify(v) for k, v in out_row.items()})
+    logger.info(f"Enrichment complete. Output written to {output_file}")
     logger.info(f"Total companies processed: {len(company_ids)}")
     logger.info(f"Total employees written: {sum(len(company_cache[cid]) for cid in company_cache)}")
     logger.info("==============================")
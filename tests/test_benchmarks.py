@@ -0,0 +1,84 @@
+import csv
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import benchmarks.run as bench
+from benchmarks.standin import COMPANY_CAPTURES, MEMBER_CAPTURES, StandIn, load_capture
+
+
+@pytest.fixture
+def standin():
+    with StandIn(latency=0) as server:
+        yield server
+
+
+def fetch(standin, path, body=None):
+    request = urllib.request.Request(standin.url + path, data=body, method="POST" if body is not None else "GET")
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def test_captures_parse_despite_curl_progress_meter():
+    for path in COMPANY_CAPTURES:
+        assert load_capture(path)["company_name"]
+    assert load_capture(MEMBER_CAPTURES[0])["first_name"]
+
+
+def test_search_ids_are_stable_and_collects_echo_them(standin):
+    first = fetch(standin, "/cdapi/v2/company_base/search/filter", b'{"name": "Acme"}')
+    assert fetch(standin, "/cdapi/v2/company_base/search/filter", b'{"name": "Acme"}') == first
+    assert fetch(standin, "/cdapi/v2/company_base/search/filter", b'{"name": "Other"}') != first
+    company = fetch(standin, f"/cdapi/v2/company_base/collect/{first[0]}")
+    assert company["id"] == first[0] and "company_name" in company
+    member = fetch(standin, "/cdapi/v2/member/collect/12")
+    assert member["id"] == 12 and "first_name" in member
+    assert [m["id"] for m in fetch(standin, "/cdapi/v2/member/collect?ids=1,2,3")] == [1, 2, 3]
+
+
+def test_client_specific_search_shapes(standin):
+    hits = fetch(standin, "/v2/employee_multi_source/search/es_dsl", b"{}")["hits"]["hits"]
+    assert "first_name" in hits[0]["_source"]
+    result = fetch(standin, "/v1/people/search?email=a@example.com")["results"][0]
+    assert result["profile_id"] == result["id"]
+
+
+def test_requests_are_counted_by_route(standin):
+    fetch(standin, "/cdapi/v2/member/search/filter", b"{}")
+    fetch(standin, "/cdapi/v2/member/collect/5")
+    with pytest.raises(urllib.error.HTTPError):
+        fetch(standin, "/unknown")
+    assert standin.requests == {"member_search": 1, "member_collect": 1, "not_found": 1}
+    standin.reset()
+    assert standin.total_requests == 0
+
+
+def test_write_leads_covers_every_entry_points_columns(tmp_path):
+    bench.write_leads(tmp_path / "leads.csv", 10, leads_per_company=5)
+    with open(tmp_path / "leads.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 10
+    assert len({row["contact_firm_name"] for row in rows}) == 2
+    assert rows[0]["contact_email"] == rows[0]["email"] == rows[0]["recipient_email"]
+
+
+def test_run_one_reports_throughput_calls_and_latency(monkeypatch, tmp_path, standin):
+    script = tmp_path / "entry.py"
+    script.write_text(
+        "import json, os, urllib.request\n"
+        "root = os.environ['CORESIGNAL_API_ROOT']\n"
+        "events = []\n"
+        "for i, line in enumerate(open('leads.csv').readlines()[1:]):\n"
+        "    urllib.request.urlopen(root + f'/cdapi/v2/member/collect/{i + 1}').read()\n"
+        "    events.append({'name': 'enrich_lead', 'ph': 'X', 'ts': i, 'dur': 1000 * (i + 1)})\n"
+        "json.dump({'traceEvents': events}, open(os.environ['CORESIGNAL_TRACE'], 'w'))\n"
+    )
+    monkeypatch.setitem(bench.ENTRY_POINTS, "fake", (lambda leads, workers: [str(script)], "enrich_lead"))
+    result = bench.run_one("fake", 20, standin, workers=2, rate=100.0, timeout=60)
+    assert result["returncode"] == 0
+    assert result["api_calls"] == 20 and result["api_calls_per_lead"] == 1.0
+    assert result["traced_leads"] == 20
+    assert result["p95_lead_seconds"] == pytest.approx(0.019)
+    assert result["peak_rss_mb"] > 0 and result["leads_per_second"] > 0
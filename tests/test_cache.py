@@ -0,0 +1,71 @@
+import pytest
+
+from core_sig.cache import ResponseCache, get_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_roundtrip_and_persistence(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, clock=clock)
+    cache.set("company_collect", "42", {"id": 42, "name": "Acme"})
+    cache.set("company_search", "acme|", [])
+    cache.close()
+
+    reopened = ResponseCache(path, clock=clock)
+    assert reopened.get("company_collect", "42") == {"id": 42, "name": "Acme"}
+    # An empty result is a hit, not a miss
+    assert reopened.get("company_search", "acme|", default="miss") == []
+    assert reopened.get("company_collect", "7", default="miss") == "miss"
+    stats = reopened.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 2)
+
+
+def test_per_namespace_ttl(clock):
+    cache = ResponseCache(":memory:", ttls={"member_search": 10}, default_ttl=100, clock=clock)
+    cache.set("member_search", "k", 1)
+    cache.set("member_collect", "k", 2)
+    clock.now += 50
+    assert cache.get("member_search", "k") is None
+    assert cache.get("member_collect", "k") == 2
+    assert cache.purge_expired() == 1
+    assert len(cache) == 1
+
+
+def test_lru_eviction(clock):
+    cache = ResponseCache(":memory:", max_entries=2, clock=clock)
+    cache.set("ns", "a", 1)
+    clock.now += 1
+    cache.set("ns", "b", 2)
+    clock.now += 1
+    cache.get("ns", "a")  # a is now more recent than b
+    clock.now += 1
+    cache.set("ns", "c", 3)
+    assert cache.contains("ns", "a")
+    assert not cache.contains("ns", "b")
+    assert cache.contains("ns", "c")
+    assert cache.evictions == 1
+
+
+def test_overwrite_does_not_grow(clock):
+    cache = ResponseCache(":memory:", max_entries=2, clock=clock)
+    cache.set("ns", "a", 1)
+    cache.set("ns", "a", 2)
+    assert len(cache) == 1
+    assert cache.get("ns", "a") == 2
+
+
+def test_get_cache_is_shared(tmp_path):
+    path = str(tmp_path / "shared.sqlite")
+    assert get_cache(path) is get_cache(path, max_entries=5)
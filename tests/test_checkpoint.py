@@ -0,0 +1,30 @@
+from core_sig.checkpoint import CheckpointJournal, lead_key
+
+
+def test_lead_key_normalizes_email_and_falls_back():
+    assert lead_key({'contact_email': '  Jane@Acme.COM '}) == 'jane@acme.com'
+    assert lead_key({'contact_email': float('nan'), 'contact_full_name': 'Jane Doe',
+                     'contact_firm_name': 'Acme'}) == 'jane doe|acme|'
+    assert lead_key({'contact_email': 'nan'}) is None
+
+
+def test_journal_resumes_with_results(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    with CheckpointJournal(path) as journal:
+        journal.record('a@x.com', {'company_name': 'X'})
+        journal.record('b@y.com')
+    with CheckpointJournal(path) as journal:
+        assert 'a@x.com' in journal and 'b@y.com' in journal
+        assert journal.get('a@x.com') == {'company_name': 'X'}
+        assert len(journal) == 2
+
+
+def test_journal_survives_truncated_last_line(tmp_path):
+    path = tmp_path / 'run.jsonl'
+    path.write_text('{"key": "a", "data": 1}\n{"key": "b", "da', encoding='utf-8')
+    with CheckpointJournal(str(path)) as journal:
+        assert 'a' in journal and 'b' not in journal
+        journal.record('c', 3)
+    with CheckpointJournal(str(path)) as journal:
+        assert journal.get('c') == 3
+        assert len(journal) == 2
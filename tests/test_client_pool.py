@@ -0,0 +1,48 @@
+import httpx
+
+import core_sig.client as client_mod
+from core_sig.client import CoreSignalClient
+from core_sig.rate_limit import TokenBucket
+
+
+def make_client(monkeypatch, tmp_path):
+    opened = []
+    requests = []
+    async_client = httpx.AsyncClient
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[-1]})
+
+    def factory(**kwargs):
+        client = async_client(transport=httpx.MockTransport(handler), **kwargs)
+        opened.append(client)
+        return client
+
+    monkeypatch.setattr(client_mod.httpx, "AsyncClient", factory)
+    client = CoreSignalClient(api_key="k", cache_dir=str(tmp_path), rate_limiter=TokenBucket(rate=1000, burst=1000))
+    return client, opened, requests
+
+
+def test_sync_wrappers_share_one_pooled_client(monkeypatch, tmp_path):
+    client, opened, requests = make_client(monkeypatch, tmp_path)
+    assert client.collect_company("1") == {"id": "1"}
+    assert client.collect_company("2") == {"id": "2"}
+    assert client.collect_person("3") == {"id": "3"}
+    assert len(requests) == 3
+    assert len(opened) == 1
+    client.close()
+    assert opened[0].is_closed
+
+
+def test_async_context_manager_closes_pool(monkeypatch, tmp_path):
+    client, opened, _ = make_client(monkeypatch, tmp_path)
+
+    async def run():
+        async with client:
+            await client.org_core("1")
+            await client.org_core("2")
+        return opened[0].is_closed
+
+    assert client._run_sync(run())
+    assert len(opened) == 1
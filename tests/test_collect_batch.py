@@ -0,0 +1,76 @@
+import json
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+import coresignal_client
+from coresignal_client import CoreSignalClient
+from core_sig.cache import ResponseCache
+from core_sig.metrics import MetricsRegistry
+from core_sig.payloads import PayloadStore
+from core_sig.rate_limit import TokenBucket
+
+
+def make_response(status, data=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(data if data is not None else {}).encode()
+    return response
+
+
+class FakeSession:
+    """Collect endpoints: ?ids= batches (omitting `missing`, or rejected with `batch_status`) and single ids."""
+
+    def __init__(self, batch_status=200, missing=()):
+        self.batch_status = batch_status
+        self.missing = set(missing)
+        self.calls = []
+
+    def request(self, method, url, params=None, **kwargs):
+        if params and "ids" in params:
+            self.calls.append(("batch", params["ids"]))
+            if self.batch_status != 200:
+                return make_response(self.batch_status, {"detail": "ids not supported"})
+            return make_response(200, [{"id": int(i)} for i in params["ids"].split(",") if i not in self.missing])
+        entity_id = urlsplit(url).path.rsplit("/", 1)[-1]
+        self.calls.append(("single", entity_id))
+        return make_response(200, {"id": int(entity_id)})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = CoreSignalClient("k", rate_limiter=TokenBucket(rate=1000, burst=1000), cache=ResponseCache(":memory:"),
+                              payloads=PayloadStore(":memory:"), metrics=MetricsRegistry())
+    client.batch_size = 2
+    client.sleeps = []
+    monkeypatch.setattr(client, "_backoff", lambda name, seconds: client.sleeps.append(seconds))
+    return client
+
+
+def test_batches_are_split_into_per_id_results(client):
+    client.session = FakeSession()
+    results = client.get_member_details_batch([1, 2, 2, 3])
+    assert results == {"1": {"id": 1}, "2": {"id": 2}, "3": {"id": 3}}
+    assert client.session.calls == [("batch", "1,2"), ("single", "3")]
+    # Everything collected is cached per id
+    assert client.get_member_details_batch(["3", "1"]) == {"3": {"id": 3}, "1": {"id": 1}}
+    assert len(client.session.calls) == 2
+
+
+def test_ids_missing_from_a_batch_are_collected_one_by_one(client):
+    client.session = FakeSession(missing={"2"})
+    assert client.get_company_details_batch([1, 2]) == {"1": {"id": 1}, "2": {"id": 2}}
+    assert client.session.calls == [("batch", "1,2"), ("single", "2")]
+
+
+@pytest.mark.parametrize("status", coresignal_client.BATCH_REJECTED)
+def test_rejected_batch_falls_back_once_and_later_chunks_skip_it(client, status):
+    client.session = FakeSession(batch_status=status)
+    results = client.get_member_details_batch([1, 2, 3, 4, 5])
+    assert sorted(results) == ["1", "2", "3", "4", "5"]
+    # One batch attempt, no retries or backoff, then single collects for every chunk
+    assert client.session.calls == [("batch", "1,2")] + [("single", str(i)) for i in range(1, 6)]
+    assert client.sleeps == []
+    client.get_member_details_batch([6, 7])
+    assert ("batch", "6,7") not in client.session.calls
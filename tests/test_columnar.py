@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from core_sig.columnar import ParquetRowWriter, output_path, read_table, table_columns, write_table
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def test_row_groups_are_typed_and_written_incrementally(tmp_path):
+    path = str(tmp_path / "enriched.parquet")
+    with ParquetRowWriter(path, columns=["email", "employees", "funded", "score", "tags"], row_group_size=2) as writer:
+        for i in range(5):
+            writer.write_row({"email": f"a{i}@x.com", "employees": i * 10, "funded": i % 2 == 0,
+                              "score": None if i == 3 else i / 2, "tags": ["a", "b"]})
+            if i == 1:
+                assert writer.rows_written == 2  # first row group already on disk
+    f = pq.ParquetFile(path)
+    assert f.metadata.num_row_groups == 3
+    assert [str(t) for t in f.schema_arrow.types] == ["string", "int64", "bool", "double", "string"]
+    table = f.read().to_pydict()
+    assert table["score"][3] is None
+    assert table["tags"][0] == '["a", "b"]'
+
+
+def test_later_values_widen_the_schema(tmp_path):
+    path = str(tmp_path / "out.parquet")
+    with ParquetRowWriter(path, row_group_size=2) as writer:
+        writer.write_rows([{"n": 1, "flag": True}, {"n": 2, "flag": False},
+                           {"n": 2.5, "flag": "maybe", "new": "x"}])
+    assert os.listdir(tmp_path) == ["out.parquet"]
+    table = pq.read_table(path).to_pydict()
+    assert table == {"n": [1.0, 2.0, 2.5], "flag": ["True", "False", "maybe"], "new": [None, None, "x"]}
+
+
+def test_readers_load_only_requested_columns(tmp_path):
+    rows = [{"a": 1, "b": "x", "c": 2.0}, {"a": 2, "b": "y", "c": None}]
+    parquet = write_table(rows, str(tmp_path / "t.csv"), "parquet")
+    csv = write_table(rows, str(tmp_path / "t.csv"), "csv")
+    assert parquet == output_path(csv, "parquet") == str(tmp_path / "t.parquet")
+    for path in (parquet, csv):
+        assert table_columns(path) == ["a", "b", "c"]
+        df = read_table(path, columns=["a", "c"])
+        assert list(df.columns) == ["a", "c"]
+        assert df["a"].tolist() == [1, 2]
+
+
+def test_repeated_widening_merges_parts_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "out.parquet")
+    reads = []
+    real = pq.ParquetFile
+    monkeypatch.setattr(pq, "ParquetFile", lambda p, *a, **kw: reads.append(p) or real(p, *a, **kw))
+    with ParquetRowWriter(path, row_group_size=1) as writer:
+        writer.write_rows([{"n": 1}, {"n": 1.5}, {"n": "x"}, {"n": 2}])
+        assert writer.rows_written == 4 and not reads
+    assert len(reads) == 3  # each part read once, by close()
+    assert os.listdir(tmp_path) == ["out.parquet"]
+    assert pq.read_table(path).to_pydict() == {"n": ["1", "1.5", "x", "2"]}
+
+
+def test_errors_still_finish_the_file_and_drop_temporary_parts(tmp_path):
+    path = str(tmp_path / "out.parquet")
+    with pytest.raises(KeyboardInterrupt):
+        with ParquetRowWriter(path, row_group_size=1) as writer:
+            writer.write_rows([{"n": 1}, {"n": "x"}])
+            raise KeyboardInterrupt
+    writer.close()
+    assert os.listdir(tmp_path) == ["out.parquet"]
+    assert pq.read_table(path).to_pydict() == {"n": ["1", "x"]}
+
+
+def test_empty_writer_keeps_the_columns(tmp_path):
+    path = str(tmp_path / "empty.parquet")
+    ParquetRowWriter(path, columns=["email", "company"]).close()
+    assert table_columns(path) == ["email", "company"]
+    assert pq.read_table(path).num_rows == 0
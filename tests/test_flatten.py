@@ -0,0 +1,44 @@
+import pytest
+
+from core_sig.flatten import EXPAND, INDEX, JOIN, JOIN_AND_INDEX, JSON, flatten_nested
+
+PAYLOAD = {
+    "name": "Acme",
+    "location": {"city": "Austin", "geo": {"lat": 1.5}},
+    "tags": ["b2b", None, "saas"],
+    "experience": [{"title": "CEO"}, {"title": "CTO", "skills": ["go", "sql"]}],
+    "empty": {},
+}
+
+
+def test_list_policies_keep_each_callers_key_format():
+    assert flatten_nested(PAYLOAD, "company", lists=JOIN_AND_INDEX, max_items=1) == {
+        "company_name": "Acme",
+        "company_location_city": "Austin",
+        "company_location_geo_lat": 1.5,
+        "company_tags": "b2b|saas",
+        "company_tags_1": "b2b",
+        "company_experience_1_title": "CEO",
+    }
+    assert flatten_nested(PAYLOAD, sep="__", lists=INDEX, index_start=0)["experience__1"] == PAYLOAD["experience"][1]
+    expanded = flatten_nested(PAYLOAD, "cs_company", sep="__", lists=EXPAND, index_start=0, root_sep="")
+    assert expanded["cs_companyexperience__1__skills__0"] == "go"
+    assert expanded["cs_companytags__1"] is None
+    assert flatten_nested(PAYLOAD, lists=JSON)["tags"] == '["b2b", null, "saas"]'
+    assert "experience_2_skills" in flatten_nested(PAYLOAD, lists=JOIN)
+
+
+def test_deep_payloads_do_not_recurse():
+    deep = leaf = {}
+    for _ in range(5000):  # far past the interpreter's recursion limit
+        leaf["child"] = {}
+        leaf = leaf["child"]
+    leaf["value"] = 1
+    flat = flatten_nested(deep, sep=".")
+    assert list(flat.values()) == [1]
+    assert list(flat)[0].count(".") == 5000
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        flatten_nested({}, lists="zip")
@@ -0,0 +1,63 @@
+import asyncio
+
+import httpx
+import pandas as pd
+
+import stuff.core_sig as core_sig
+
+
+def handler_for(log):
+    async def handler(request):
+        path = request.url.path
+        log.append(("start", path))
+        await asyncio.sleep(0.01)
+        log.append(("end", path))
+        if path == "/v1/people/search":
+            return httpx.Response(200, json={"results": [{"profile_id": "p1"}]})
+        if path == "/v1/people/p1":
+            return httpx.Response(200, json={"experience": [{"title": "CTO", "org_id": "o1"}]})
+        return httpx.Response(200, json={})
+    return handler
+
+
+def test_enrich_one_runs_independent_calls_concurrently(monkeypatch, tmp_path):
+    monkeypatch.setattr(core_sig, "CACHE_ROOT", tmp_path)
+    log = []
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler_for(log))) as client:
+            return await core_sig.enrich_one(pd.Series({"email": "a@b.com"}), client)
+
+    out = asyncio.run(run())
+    assert out["company_id"] == "o1"
+    assert out["department"] == "engineering"
+    # Three stages: search, then profile + skills, then the six org calls
+    stages, in_flight = [], 0
+    for event, _ in log:
+        if event == "start":
+            if in_flight == 0:
+                stages.append(0)
+            stages[-1] += 1
+            in_flight += 1
+        else:
+            in_flight -= 1
+    assert stages == [1, 2, 6]
+
+
+def test_enrich_all_caps_leads_in_flight(monkeypatch, tmp_path):
+    monkeypatch.setattr(core_sig, "CACHE_ROOT", tmp_path)
+    active = peak = 0
+
+    async def tracked(lead, client):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return {"email": lead["email"]}
+
+    monkeypatch.setattr(core_sig, "enrich_one", tracked)
+    leads = pd.DataFrame({"email": [f"{i}@b.com" for i in range(10)]})
+    results = asyncio.run(core_sig.enrich_all(leads, concurrency=3))
+    assert len(results) == 10
+    assert peak == 3
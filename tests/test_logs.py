@@ -0,0 +1,33 @@
+import gzip
+import logging
+
+from core_sig.logs import GzipRotatingFileHandler, SamplingFilter
+
+
+def record(msg, level=logging.INFO):
+    return logging.LogRecord("enrich", level, __file__, 1, msg, None, None)
+
+
+def test_repetitive_records_are_sampled_with_a_suppressed_count():
+    sampler = SamplingFilter(burst=2, every=3)
+    kept = [r for r in (record(f"[COMPANY SEARCH] Trying name='lead {i}'") for i in range(8)) if sampler.filter(r)]
+    assert [r.getMessage() for r in kept] == [
+        "[COMPANY SEARCH] Trying name='lead 0'",
+        "[COMPANY SEARCH] Trying name='lead 1'",
+        "[COMPANY SEARCH] Trying name='lead 4' [2 similar suppressed]",
+        "[COMPANY SEARCH] Trying name='lead 7' [2 similar suppressed]",
+    ]
+    # Other kinds have their own budget, and errors are never dropped
+    assert sampler.filter(record("Processed lead 9/10"))
+    assert all(sampler.filter(record("[COMPANY SEARCH] failed", logging.ERROR)) for _ in range(5))
+    assert sampler.get_stats()["suppressed"] == 4
+
+
+def test_rotated_logs_are_gzipped(tmp_path):
+    path = tmp_path / "run.log"
+    handler = GzipRotatingFileHandler(str(path), max_bytes=200, backups=2)
+    for i in range(20):
+        handler.emit(record(f"line {i} " + "x" * 40))
+    handler.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["run.log", "run.log.1.gz", "run.log.2.gz"]
+    assert gzip.open(tmp_path / "run.log.1.gz", "rt").read().startswith("line ")
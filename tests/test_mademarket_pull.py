@@ -0,0 +1,104 @@
+import csv
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Made_Market'))
+
+import MadeMarket_Pull  # noqa: E402
+from MadeMarket_Pull import SortedSegment  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data or {}
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Refuses contact 2; every other contact/firm exists. Records each URL requested."""
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        if url.endswith('/contacts/2.json'):
+            return FakeResponse(404)
+        return FakeResponse(200, {'id': url.rsplit('/', 1)[-1].split('.')[0]})
+
+
+def test_external_sort_matches_sorted(tmp_path):
+    rng = random.Random(3)
+    rows = [{'recipient_email': rng.choice(['b@x.com', 'A@x.com', 'a@x.com', 'c@x.com', '']),
+             'recipient_view_count': i, 'recipient_is_bounced': i % 2 == 0} for i in range(200)]
+    expected = sorted(rows, key=lambda r: r.get('recipient_email', '').lower())
+    for buffer_rows in (1000, 7, 1):
+        segment = SortedSegment(buffer_rows=buffer_rows, tmp_dir=str(tmp_path))
+        for row in rows:
+            segment.add(row)
+        assert list(segment.sorted_rows()) == expected
+
+
+def test_write_csv_header_from_first_sorted_row(tmp_path):
+    segment = SortedSegment(buffer_rows=2)
+    for row in ({'recipient_email': 'z@x.com', 'n': 1}, {'recipient_email': 'a@x.com', 'n': 2},
+                {'recipient_email': 'm@x.com', 'n': 3}):
+        segment.add(row)
+    path = tmp_path / 'out.csv'
+    segment.write_csv(str(path))
+    with open(path, newline='', encoding='utf-8') as f:
+        assert [r['n'] for r in csv.DictReader(f)] == ['2', '3', '1']
+    empty = tmp_path / 'empty.csv'
+    SortedSegment().write_csv(str(empty))
+    assert not empty.exists()
+
+
+def test_refused_ids_are_requested_once(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(MadeMarket_Pull, 'get_session', lambda: session)
+    recipients = [{'contact_id': 1, 'firm_detail_id': 9}, {'contact_id': 2, 'firm_detail_id': 9},
+                  {'contact_id': 2, 'firm_detail_id': 9}]
+    contact_cache, firm_cache = {}, {}
+    MadeMarket_Pull.prefetch_details(recipients, contact_cache, firm_cache, max_workers=2)
+    for rec in recipients:
+        MadeMarket_Pull.get_contact_details(rec['contact_id'], contact_cache)
+        MadeMarket_Pull.get_firm_details(rec['firm_detail_id'], firm_cache)
+    assert len(session.urls) == 3
+    assert contact_cache[2] is None
+
+
+def test_streaming_with_store_requests_refused_ids_once(monkeypatch, tmp_path):
+    session = FakeSession()
+    monkeypatch.setattr(MadeMarket_Pull, 'get_session', lambda: session)
+    pages = [[{'email': 'a@x.com', 'contact_id': 2}], [{'email': 'b@x.com', 'contact_id': 2}]]
+    monkeypatch.setattr(MadeMarket_Pull, 'iter_distribution_recipients', lambda dist_id, page_size: iter(pages))
+    store = MadeMarket_Pull.MadeMarketStore(':memory:')
+    counts = MadeMarket_Pull.pull_streaming(1, str(tmp_path / 'all.csv'), str(tmp_path / 'opened.csv'),
+                                            str(tmp_path / 'unopened.csv'), store=store)
+    assert counts == (0, 2)
+    assert session.urls.count(f'{MadeMarket_Pull.BASE_URL}/v2/contacts/2.json') == 1
+
+
+def test_report_pages_continue_past_short_pages(monkeypatch):
+    pages = {1: [{'id': 1}, {'id': 2}], 2: [{'id': 3}], 3: [{'id': 4}], 4: []}
+
+    class PagedSession:
+        def __init__(self, ignores_paging=False):
+            self.ignores_paging = ignores_paging
+
+        def get(self, url, params=None, **kwargs):
+            page = 1 if self.ignores_paging else params['page']
+            return FakeResponse(200, {'distributions_recipients': pages[page]})
+
+    monkeypatch.setattr(MadeMarket_Pull, 'get_session', lambda: PagedSession())
+    assert list(MadeMarket_Pull.iter_report_pages({}, page_size=2)) == [pages[1], pages[2], pages[3]]
+    # An endpoint that ignores paging returns the same page again: stop after the first copy
+    monkeypatch.setattr(MadeMarket_Pull, 'get_session', lambda: PagedSession(ignores_paging=True))
+    assert list(MadeMarket_Pull.iter_report_pages({}, page_size=2)) == [pages[1]]
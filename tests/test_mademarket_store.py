@@ -0,0 +1,77 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Made_Market'))
+
+from mademarket_store import MadeMarketStore, updated_hint  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_only_new_changed_or_stale_records_need_fetching(tmp_path):
+    clock = FakeClock()
+    store = MadeMarketStore(str(tmp_path / 'mm.sqlite'), refresh_days=1, clock=clock)
+    assert store.needs_fetch('contact', 7)
+    store.put('contact', 7, {'id': 7, 'name': 'A', 'updated_at': '2025-01-01'})
+    assert store.get('contact', '7') == {'id': 7, 'name': 'A', 'updated_at': '2025-01-01'}
+    assert not store.needs_fetch('contact', 7)
+    assert not store.needs_fetch('contact', 7, '2025-01-01')
+    assert store.needs_fetch('contact', 7, '2025-02-01')
+    assert store.needs_fetch('firm', 7)
+    clock.now += 2 * 24 * 3600
+    assert store.needs_fetch('contact', 7)
+
+
+def test_store_survives_reopen(tmp_path):
+    path = str(tmp_path / 'mm.sqlite')
+    store = MadeMarketStore(path)
+    store.put('firm', 3, {'name': 'Acme'})
+    store.close()
+    reopened = MadeMarketStore(path)
+    assert reopened.get('firm', 3) == {'name': 'Acme'}
+    assert reopened.sizes() == {'firm': 1}
+
+
+def test_recipient_engagement_deltas(tmp_path):
+    store = MadeMarketStore(str(tmp_path / 'mm.sqlite'))
+    first = [{'email': 'a@x.com', 'view_count': 0}, {'email': 'b@x.com', 'view_count': 1}]
+    assert store.update_recipients(5, first)['new'] == 2
+    second = [{'email': 'A@x.com', 'view_count': 2}, {'email': 'b@x.com', 'view_count': 1, 'is_bounced': True},
+              {'email': 'c@x.com'}]
+    delta = store.update_recipients(5, second)
+    assert delta == {'recipients': 3, 'new': 1, 'changed': 2, 'new_views': 2, 'new_bounces': 1}
+    assert store.update_recipients(5, second)['changed'] == 0
+
+
+def test_update_recipients_spans_lookup_batches(monkeypatch):
+    import mademarket_store
+    monkeypatch.setattr(mademarket_store, 'SQL_BATCH', 3)
+    store = MadeMarketStore(':memory:')
+    recipients = [{'email': f'{i}@x.com', 'view_count': 1} for i in range(10)]
+    assert store.update_recipients(1, recipients[:5])['new'] == 5
+    recipients[0]['view_count'] = 4
+    delta = store.update_recipients(1, recipients)
+    assert delta == {'recipients': 10, 'new': 5, 'changed': 1, 'new_views': 3, 'new_bounces': 0}
+
+
+def test_updated_hint():
+    assert updated_hint({'contact': {'updated_at': 'x'}}, 'contact') == 'x'
+    assert updated_hint({'firm_updated_at': 'y'}, 'firm') == 'y'
+    assert updated_hint({}, 'contact') is None
+
+
+def test_distribution_index(tmp_path):
+    store = MadeMarketStore(str(tmp_path / 'mm.sqlite'))
+    assert store.find_distribution('2025 ISTE') is None
+    store.put_distributions([{'id': 77, 'name': '2025 ISTE', 'sent_at': '2025-06-01'}, {'name': 'no id'}])
+    store.set_distribution_count(77, 300)
+    store.put_distributions([{'id': 77, 'name': '2025 ISTE', 'sent_at': '2025-06-02'}, {'id': '9', 'name': 'Other'}])
+    assert store.find_distribution('2025 iste') == {'id': 77, 'name': '2025 ISTE', 'sent_at': '2025-06-02',
+                                                    'recipient_count': 300}
+    assert [d['id'] for d in store.distributions()] == [77, '9']
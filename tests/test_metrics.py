@@ -0,0 +1,114 @@
+import json
+import time
+
+import httpx
+import pytest
+
+from core_sig.metrics import Histogram, MetricsRegistry
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    hist = Histogram(buckets=(1.0, 2.0, 4.0))
+    for value in (0.5, 0.5, 1.5, 3.0):
+        hist.observe(value)
+    assert hist.count == 4
+    assert hist.quantile(0.5) == pytest.approx(1.0)
+    assert hist.quantile(1.0) == pytest.approx(4.0)
+    assert Histogram().quantile(0.5) is None
+
+
+def test_record_response_counts_status_bytes_and_credits():
+    metrics = MetricsRegistry()
+    request = httpx.Request("POST", "https://api.coresignal.com/x", content=b'{"a": 1}')
+    metrics.record_response("company_search", httpx.Response(200, content=b"[1,2]", request=request), 0.2)
+    metrics.record_response("company_search", httpx.Response(429, request=request), 0.1)
+    metrics.record_response("company_collect", httpx.Response(200, content=b"{}", request=request), 0.3, credits=5)
+    metrics.record_error("company_search", 1.0)
+
+    counters = metrics.snapshot()["counters"]
+    statuses = {(c["endpoint"], c["status"]): c["value"] for c in counters["coresignal_responses_total"]}
+    assert statuses == {("company_search", "200"): 1, ("company_search", "429"): 1,
+                        ("company_search", "error"): 1, ("company_collect", "200"): 1}
+    credits = {c["endpoint"]: c["value"] for c in counters["coresignal_credits_total"]}
+    assert credits == {"company_search": 1, "company_collect": 5}
+    received = {c["endpoint"]: c["value"] for c in counters["coresignal_bytes_received_total"]}
+    assert received["company_search"] == 5
+    sent = {c["endpoint"]: c["value"] for c in counters["coresignal_bytes_sent_total"]}
+    assert sent["company_search"] == 16
+
+
+def test_waits_retries_and_cache_lookups():
+    metrics = MetricsRegistry()
+    metrics.record_wait("member_search", 0.0)
+    metrics.record_wait("member_search", 1.5)
+    metrics.record_wait("member_search", 2.0, reason="backoff")
+    metrics.record_retry("member_search")
+    metrics.record_cache("member_search", True)
+    metrics.record_cache("member_search", False)
+    metrics.record_cache("member_search", True)
+
+    counters = metrics.snapshot()["counters"]
+    waits = {c["reason"]: c["value"] for c in counters["coresignal_wait_seconds_total"]}
+    assert waits == {"rate_limit": 1.5, "backoff": 2.0}
+    assert counters["coresignal_retries_total"] == [{"endpoint": "member_search", "value": 1}]
+    lookups = {c["result"]: c["value"] for c in counters["coresignal_cache_lookups_total"]}
+    assert lookups == {"hit": 2, "miss": 1}
+
+
+def test_prometheus_text_format():
+    metrics = MetricsRegistry()
+    metrics.observe("coresignal_request_seconds", 0.02, endpoint="company_search")
+    metrics.inc("coresignal_responses_total", endpoint="company_search", status=200)
+    text = metrics.to_prometheus()
+    assert "# TYPE coresignal_request_seconds histogram" in text
+    assert 'coresignal_request_seconds_bucket{endpoint="company_search",le="0.01"} 0' in text
+    assert 'coresignal_request_seconds_bucket{endpoint="company_search",le="0.025"} 1' in text
+    assert 'coresignal_request_seconds_bucket{endpoint="company_search",le="+Inf"} 1' in text
+    assert 'coresignal_request_seconds_count{endpoint="company_search"} 1' in text
+    assert 'coresignal_responses_total{endpoint="company_search",status="200"} 1' in text
+
+
+def test_dump_writes_json_and_prometheus_files(tmp_path):
+    metrics = MetricsRegistry()
+    metrics.observe("coresignal_request_seconds", 0.2, endpoint="member_collect")
+    json_path, prom_path = tmp_path / "m.json", tmp_path / "m.prom"
+    metrics.start_dumping(str(json_path), str(prom_path), interval=60)
+    metrics.stop_dumping()
+
+    data = json.loads(json_path.read_text())
+    (series,) = data["histograms"]["coresignal_request_seconds"]
+    assert series["endpoint"] == "member_collect" and series["count"] == 1
+    assert "coresignal_request_seconds_sum" in prom_path.read_text()
+
+
+def test_dumping_restarts_and_waits_for_every_caller(tmp_path):
+    metrics = MetricsRegistry()
+    json_path = tmp_path / "m.json"
+    metrics.start_dumping(str(json_path), None, interval=60)
+    metrics.stop_dumping()
+    json_path.unlink()
+
+    # A later run in the same process (the next pipeline step) dumps periodically again
+    metrics.start_dumping(str(json_path), None, interval=0.01)
+    metrics.start_dumping(str(json_path), None, interval=0.01)
+    metrics.stop_dumping()
+    metrics.inc("coresignal_retries_total", endpoint="member_collect")
+    deadline = time.time() + 5
+    while "coresignal_retries_total" not in (json_path.read_text() if json_path.exists() else ""):
+        assert time.time() < deadline, "periodic dump did not run"
+        time.sleep(0.01)
+    assert metrics._dumper is not None
+    metrics.stop_dumping()
+    assert metrics._dumper is None
+
+
+def test_company_enrich_stops_dumping_when_it_fails(tmp_path, monkeypatch):
+    from coresignal_enrichment import company_enrich
+
+    metrics = MetricsRegistry()
+    monkeypatch.setattr(company_enrich, "metrics", metrics)
+    monkeypatch.setattr(company_enrich, "METRICS_JSON_PATH", str(tmp_path / "m.json"))
+    monkeypatch.setattr(company_enrich, "METRICS_PROM_PATH", None)
+    assert company_enrich.main(["--input", str(tmp_path / "missing.csv")]) == 1
+    assert metrics._dumper is None
+    assert (tmp_path / "m.json").exists()
@@ -0,0 +1,54 @@
+import pytest
+
+from core_sig.payloads import PayloadStore, parse_ref
+
+
+def test_identical_payloads_are_stored_once(tmp_path):
+    store = PayloadStore(str(tmp_path / "payloads.sqlite"))
+    company = {"id": 42, "name": "Acme", "experience": [{"title": "CEO"}] * 50}
+    ref = store.put("company", 42, company)
+    # Key order does not change the content hash
+    assert store.put("company", 42, dict(reversed(list(company.items())))) == ref
+    assert store.get(ref) == company
+    assert store.get(ref + "#name") == "Acme"
+    stats = store.get_stats()
+    assert stats["payloads"] == 1 and stats["versions"] == 1
+    assert stats["stored_bytes"] < stats["raw_bytes"]
+
+
+def test_each_version_of_an_entity_is_kept(tmp_path):
+    times = iter([1.0, 2.0])
+    store = PayloadStore(str(tmp_path / "payloads.sqlite"), clock=lambda: next(times))
+    old = store.put("member", 7, {"id": 7, "title": "VP"})
+    new = store.put("member", 7, {"id": 7, "title": "CEO"})
+    assert old != new
+    assert [v["ref"] for v in store.versions("member", 7)] == [old, new]
+    assert store.get(old)["title"] == "VP"
+
+
+def test_references_are_validated(tmp_path):
+    store = PayloadStore(str(tmp_path / "payloads.sqlite"))
+    assert parse_ref("company/12@abcd#experience") == ("company", "12", "abcd", "experience")
+    with pytest.raises(ValueError):
+        parse_ref("not a reference")
+    with pytest.raises(KeyError):
+        store.get("company/12@abcd")
+
+
+def test_client_reuses_the_ref_from_the_collect_step(monkeypatch):
+    from coresignal_client import CoreSignalClient
+    from core_sig.cache import ResponseCache
+
+    store = PayloadStore(":memory:")
+    puts = []
+    real_put = store.put
+    monkeypatch.setattr(store, "put", lambda *args: puts.append(args) or real_put(*args))
+    client = CoreSignalClient("k", cache=ResponseCache(":memory:"), payloads=store)
+    company = {"id": 7, "company_name": "Acme"}
+    client._store_payload("company", "7", company)
+    assert client.payload_ref("company", company) == client.payload_ref("company", company)
+    assert len(puts) == 1
+    # A payload served from the response cache is stored once, on first use
+    client.payload_ref("member", {"id": 3})
+    client.payload_ref("member", {"id": 3})
+    assert len(puts) == 2
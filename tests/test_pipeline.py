@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+import pytest
+
+from core_sig.pipeline import BLOCKED, FAILED, OK, SKIPPED, Pipeline, Step
+
+
+def test_independent_branches_run_concurrently():
+    order = []
+    barrier = threading.Barrier(2, timeout=5)
+
+    def branch(name):
+        def run():
+            barrier.wait()  # deadlocks (and times out) unless both branches run at once
+            order.append(name)
+        return run
+
+    steps = [
+        Step("pull", lambda: order.append("pull")),
+        Step("a", branch("a"), deps=["pull"]),
+        Step("b", branch("b"), deps=["pull"]),
+        Step("report", lambda: order.append("report"), deps=["a", "b"]),
+    ]
+    results = Pipeline(steps, max_workers=2).run()
+    assert [r.status for r in results.values()] == [OK] * 4
+    assert order[0] == "pull" and order[-1] == "report"
+
+
+def test_failure_blocks_only_downstream_steps():
+    ran = []
+    steps = [
+        Step("pull", lambda: None),
+        Step("bad", lambda: 1, deps=["pull"]),
+        Step("after_bad", lambda: ran.append("after_bad"), deps=["bad"]),
+        Step("raises", lambda: 1 / 0, deps=["pull"]),
+        Step("exits", lambda: exit(0), deps=["pull"]),
+        Step("good", lambda: ran.append("good"), deps=["pull"]),
+    ]
+    results = Pipeline(steps).run()
+    assert results["bad"].status == FAILED
+    assert results["raises"].status == FAILED
+    assert results["after_bad"].status == BLOCKED
+    assert results["exits"].status == OK
+    assert ran == ["good"]
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="unknown"):
+        Pipeline([Step("a", lambda: None, deps=["missing"])])
+    with pytest.raises(ValueError, match="cycle"):
+        Pipeline([Step("a", lambda: None, deps=["b"]), Step("b", lambda: None, deps=["a"])])
+
+
+def test_step_timings_are_recorded():
+    results = Pipeline([Step("sleep", lambda: time.sleep(0.05))]).run()
+    assert results["sleep"].seconds >= 0.05
+
+
+def test_unchanged_steps_are_skipped_and_force_reruns(tmp_path):
+    src, mid, out = tmp_path / "src.csv", tmp_path / "mid.csv", tmp_path / "out.csv"
+    src.write_text("a\n1\n")
+    runs = []
+
+    def copy(a, b, name):
+        def run():
+            runs.append(name)
+            b.write_text(a.read_text())
+        return run
+
+    def build(**kwargs):
+        return Pipeline([
+            Step("first", copy(src, mid, "first"), inputs=[str(src)], outputs=[str(mid)], params={"n": 1}),
+            Step("second", copy(mid, out, "second"), deps=["first"], inputs=[str(mid)], outputs=[str(out)]),
+        ], **kwargs)
+
+    assert [r.status for r in build().run().values()] == [OK, OK]
+    assert [r.status for r in build().run().values()] == [SKIPPED, SKIPPED]
+    # A forced step whose output comes out identical doesn't re-run its dependents
+    assert [r.status for r in build(force=["first"]).run().values()] == [OK, SKIPPED]
+    src.write_text("a\n2\n")
+    assert [r.status for r in build().run().values()] == [OK, OK]
+    out.unlink()
+    assert [r.status for r in build().run().values()] == [SKIPPED, OK]
+    assert runs == ["first", "second", "first", "first", "second", "second"]
+    with pytest.raises(ValueError, match="unknown"):
+        build(force=["third"])
+
+
+def test_step_that_skips_a_declared_output_fails(tmp_path):
+    src, out = tmp_path / "src.csv", tmp_path / "out.csv"
+    src.write_text("a\n1\n")
+    step = Step("quiet", lambda: 0, inputs=[str(src)], outputs=[str(out)])
+    assert Pipeline([step]).run()["quiet"].status == FAILED
+    assert not os.path.exists(step.manifest_path)
@@ -0,0 +1,90 @@
+import importlib
+import os
+
+import pandas as pd
+import pytest
+
+from core_sig.checkpoint import CheckpointJournal
+
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+    # main.py opens coresignal_enrichment.log in the working directory on import
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("run"))
+    try:
+        return importlib.import_module("main")
+    finally:
+        os.chdir(cwd)
+
+
+def enriched_row(**fields):
+    row = {"contact_email": "jane@acme.com", "employee_experience_1_duration_months": "",
+           "employee_experience_1_duration": "2 years", "employee_last_graduation_date": "June 2015",
+           "employee_followers_count": "1,200"}
+    row.update(fields)
+    return row
+
+
+def test_date_years_are_parsed_once_per_distinct_value(main):
+    main.date_year.cache_clear()
+    rows = [enriched_row(employee_last_graduation_date=date) for date in ["June 2015", "2019-03-05"] * 50]
+    rows.append(enriched_row(employee_last_graduation_date="not a date"))
+    main.postprocess_rows(rows)
+    assert [row["employee_last_graduation_date_year"] for row in rows[:2]] == ["2015", "2019"]
+    assert "employee_last_graduation_date_year" not in rows[-1]
+    assert main.date_year.cache_info().misses == 3
+
+
+def test_change_report_lists_duration_rewrites_only(main):
+    rows = [enriched_row(), enriched_row(employee_experience_1_duration_months="14"),
+            enriched_row(employee_experience_1_duration_months="n/a", employee_experience_1_duration="1 year")]
+    changes = main.postprocess_rows(rows)
+    assert changes == [{"employee_experience_1_duration_months": ("", "24")}, {},
+                       {"employee_experience_1_duration_months": ("n/a", "12")}]
+    # Derived fields are added to the row but not reported
+    assert rows[0]["employee_followers_count_numeric"] == "1200.0"
+    assert rows[0]["employee_experience_1_duration_months_numeric"] == "24.0"
+
+
+def test_rows_resumed_from_the_checkpoint_postprocess_the_same(main, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "_process_lead", lambda api, idx, row, *args: (enriched_row(), main.LEAD_ENRICHED))
+    lead = pd.Series({"contact_email": "jane@acme.com"})
+    with CheckpointJournal(str(tmp_path / "leads.jsonl")) as journal:
+        fresh, status = main.process_lead(None, 0, lead, 1, journal=journal)
+    assert status == main.LEAD_ENRICHED
+    main.postprocess_rows([fresh])
+
+    with CheckpointJournal(str(tmp_path / "leads.jsonl")) as journal:
+        resumed, status = main.process_lead(None, 0, lead, 1, journal=journal)
+    assert status == main.LEAD_RESUMED
+    assert main.postprocess_rows([resumed]) == [{"employee_experience_1_duration_months": ("", "24")}]
+    assert {f: resumed.get(f) for f in main.OUTPUT_SCHEMA} == {f: fresh.get(f) for f in main.OUTPUT_SCHEMA}
+    # A second pass over an already postprocessed row changes nothing
+    before = dict(resumed)
+    assert main.postprocess_rows([resumed]) == [{}]
+    assert resumed == before
+
+
+def test_streaming_postprocesses_each_chunk_as_one_batch(main, tmp_path, monkeypatch):
+    pd.DataFrame({"email": [f"lead{i}@acme.com" for i in range(5)]}).to_csv(tmp_path / "leads.csv", index=False)
+
+    def fake_lead(api, idx, row, *args, **kwargs):
+        if idx == 3:
+            return row.to_dict(), main.LEAD_FAILED
+        return enriched_row(email=row["email"]), main.LEAD_ENRICHED
+
+    batches = []
+    postprocess_rows = main.postprocess_rows
+    monkeypatch.setattr(main, "_process_lead", fake_lead)
+    monkeypatch.setattr(main, "postprocess_rows", lambda rows: batches.append(len(rows)) or postprocess_rows(rows))
+    args = main.argparse.Namespace(no_dedupe=True, output_format="csv", debug_csv=False, n=None, row=None, sample=False,
+                                   workers=2, local_json=False, postprocess_report=False)
+    written = main.run_streaming(args, None, str(tmp_path / "leads.csv"), str(tmp_path / "enriched.csv"), chunksize=2)
+
+    assert written == 5
+    # Chunks of two rows; the failed lead in the second chunk is written but not postprocessed
+    assert batches == [2, 1, 1]
+    out = pd.read_csv(tmp_path / "enriched.csv", dtype=str)
+    assert list(out["email"]) == [f"lead{i}@acme.com" for i in range(5)]
+    assert list(out["employee_experience_1_duration_months"].fillna("")) == ["24", "24", "24", "", "24"]
@@ -0,0 +1,57 @@
+import pytest
+
+from core_sig.rate_limit import TokenBucket, get_limiter, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_steady_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=3, clock=clock)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Bucket is empty: the next callers queue up behind each other at 1/rate
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_refill_is_capped_at_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, burst=2, clock=clock)
+    bucket.reserve()
+    bucket.reserve()
+    clock.now = 100.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_penalize_blocks_and_halves_rate_until_recovery():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=4.0, burst=4, recovery_seconds=30.0, clock=clock)
+    bucket.penalize(10.0)
+    assert bucket.current_rate == pytest.approx(2.0)
+    # Nothing goes out before Retry-After expires, then at the reduced rate
+    assert bucket.reserve() == pytest.approx(10.5)
+    clock.now = 40.0
+    bucket.reserve()
+    assert bucket.current_rate == pytest.approx(4.0)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(None, default=3.0) == 3.0
+    assert parse_retry_after("garbage", default=5.0) == 5.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_get_limiter_is_shared():
+    a = get_limiter("test-shared", rate=3.0, burst=2)
+    b = get_limiter("test-shared", rate=10.0)
+    assert a is b
+    assert b.rate == 3.0
@@ -0,0 +1,56 @@
+from core_sig.flatten import JOIN_AND_INDEX, flatten_nested
+from schema_resolver import SchemaProjection, SchemaResolver, field_key_variants, get_resolver
+
+
+def test_key_variants_cover_aliases_and_collections():
+    assert field_key_variants("company_display_name")[:3] == ["company_display_name", "display_name", "name"]
+    assert "company_company_updates_collection_2_date" in field_key_variants("company_updates_2_date")
+    assert "employee_member_experience_collection_1_title" in field_key_variants("employee_experience_1_title")
+
+
+def test_sources_are_searched_in_order():
+    resolver = SchemaResolver(["company_display_name", "employee_full_name"])
+    enriched = {"name": "Lead Co"}
+    resolver.resolve(enriched, {"name": ""}, {}, {"display_name": "Acme"}, {})
+    assert enriched["company_display_name"] == "Acme"
+    # Nothing from the person dicts, so the lead's own "name" column is used
+    assert enriched["employee_full_name"] == "Lead Co"
+
+
+def test_fuzzy_fallback_prefers_flat_keys_and_is_memoized():
+    resolver = SchemaResolver(["company_employees_count"])
+    company_flat = {"company_employee_count": 120, "company_employees_counts": 99}
+    enriched = resolver.resolve({}, {}, {}, company_flat, {})
+    assert enriched["company_employees_count"] == 120
+    assert "company_employee_count" in resolver._similar
+    assert resolver.resolve({}, {}, {}, {}, {})["company_employees_count"] == ""
+
+
+def test_closest_key_outside_flats_needs_high_similarity():
+    resolver = SchemaResolver(["company_bounce_rate"])
+    assert resolver.resolve({}, {"company_bounce_rates": 0.4}, {}, {}, {})["company_bounce_rate"] == 0.4
+    assert resolver.resolve({}, {"company_bounc": 0.4}, {}, {}, {})["company_bounce_rate"] == ""
+
+
+def test_get_resolver_compiles_once_per_schema():
+    assert get_resolver(["a", "b"]) is get_resolver(["a", "b"])
+    assert get_resolver(["a", "b"]) is not get_resolver(["a"])
+
+
+def test_projection_resolves_like_the_full_flattening():
+    resolver = SchemaResolver(["company_display_name", "company_employees_count", "company_updates_1_date"])
+    projection = SchemaProjection(resolver, extra_keys=["company_founded"])
+    payload = {
+        "display_name": "Acme",
+        "employee": {"count": 120},
+        "founded": 1999,
+        "updates": [{"date": "2024-01-01", "text": "x" * 50}],
+        "similar_companies": [{"name": "Other", "urls": ["a", "b"]}],
+    }
+    full = flatten_nested(payload, "company", lists=JOIN_AND_INDEX, index_sep="_")
+    projected = flatten_nested(payload, "company", lists=JOIN_AND_INDEX, index_sep="_",
+                               keep=projection.keep, enter=projection.enter)
+    # Keys similar enough to a field for the fuzzy fallback are kept too
+    assert projected == {"company_display_name": "Acme", "company_employee_count": 120, "company_founded": 1999,
+                         "company_updates_1_date": "2024-01-01", "company_updates_1_text": "x" * 50}
+    assert resolver.resolve({}, {}, {}, projected, {}) == resolver.resolve({}, {}, {}, full, {})
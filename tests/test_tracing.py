@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import pytest
+
+from core_sig import tracing
+from core_sig.tracing import Tracer
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    first, second = tracer.span("a"), tracer.span("b", lead=1)
+    assert first is second
+    with first:
+        pass
+    assert tracer.summary() == {}
+
+
+def test_spans_are_written_as_chrome_trace_events(tmp_path):
+    path = tmp_path / "trace.json"
+    tracer = Tracer()
+    tracer.start(str(path))
+    with tracer.span("enrich_lead"):
+        with tracer.span("collect_company", company_id="42"):
+            pass
+    with pytest.raises(ValueError):
+        with tracer.span("schema_mapping"):
+            raise ValueError("boom")
+    tracer.finish()
+    assert not tracer.enabled
+
+    events = json.loads(path.read_text())["traceEvents"]
+    by_name = {e["name"]: e for e in events}
+    assert set(by_name) == {"enrich_lead", "collect_company", "schema_mapping"}
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+    outer, inner = by_name["enrich_lead"], by_name["collect_company"]
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"] + 1
+    assert inner["args"] == {"company_id": "42"}
+    assert by_name["schema_mapping"]["args"] == {"error": "ValueError"}
+
+
+def test_summary_percentiles_per_stage():
+    tracer = Tracer()
+    tracer.enabled = True
+    for ms in range(1, 101):
+        tracer._record("flatten", 0.0, ms / 1000, {})
+    stats = tracer.summary()["flatten"]
+    assert stats["count"] == 100
+    assert stats["p50"] == pytest.approx(0.050)
+    assert stats["p95"] == pytest.approx(0.095)
+    assert stats["total"] == pytest.approx(5.050)
+    assert "flatten" in tracer.format_summary()
+
+
+def test_async_tasks_get_their_own_tracks(tmp_path):
+    tracer = Tracer()
+    tracer.start(str(tmp_path / "trace.json"))
+
+    async def lead():
+        with tracer.span("enrich_one"):
+            await asyncio.sleep(0)
+
+    async def run():
+        await asyncio.gather(lead(), lead())
+
+    asyncio.run(run())
+    tracer.finish()
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert len({e["tid"] for e in events}) == 2
+
+
+def test_long_runs_flush_events_and_sample_durations(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "FLUSH_EVENTS", 10)
+    monkeypatch.setattr(tracing, "MAX_SAMPLES", 50)
+    path = tmp_path / "trace.json"
+    tracer = Tracer()
+    tracer.start(str(path))
+    for _ in range(1000):
+        with tracer.span("enrich_lead"):
+            pass
+        assert len(tracer._events) < 10
+    stats = tracer.summary()["enrich_lead"]
+    assert stats["count"] == 1000 and len(tracer._stages["enrich_lead"].samples) == 50
+    tracer.finish()
+    assert len(json.loads(path.read_text())["traceEvents"]) == 1000
+    assert not (tmp_path / "trace.json.tmp").exists()
+
+
+def test_company_enrich_keeps_a_trace_that_is_already_running(tmp_path, monkeypatch):
+    from core_sig.metrics import MetricsRegistry
+    from coresignal_enrichment import company_enrich
+
+    tracer = Tracer()
+    tracer.start(str(tmp_path / "trace.json"))
+    with tracer.span("enrich_lead"):
+        pass
+    monkeypatch.setattr(company_enrich, "tracer", tracer)
+    monkeypatch.setattr(company_enrich, "metrics", MetricsRegistry())
+    monkeypatch.setattr(company_enrich, "METRICS_JSON_PATH", None)
+    monkeypatch.setattr(company_enrich, "METRICS_PROM_PATH", None)
+    monkeypatch.setattr(company_enrich, "TRACE_PATH", str(tmp_path / "other.json"))
+    assert company_enrich.main(["--input", str(tmp_path / "missing.csv")]) == 1
+    # The earlier step's spans survive; the trace is still written to its own path
+    assert tracer.enabled and tracer.summary()["enrich_lead"]["count"] == 1
+    tracer.finish()
+    assert (tmp_path / "trace.json").exists() and not (tmp_path / "other.json").exists()
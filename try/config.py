@@ -4,7 +4,12 @@ from pathlib import Path
 
 # API Configuration
 API_KEY = os.getenv("CORESIGNAL_API_KEY", "w5jfmFnwtLAPRWH5UcB6D23XWEIlPneI")
-API_BASE_URL = "https://api.coresignal.com"
+API_BASE_URL = os.getenv("CORESIGNAL_API_ROOT", "https://api.coresignal.com").rstrip("/")
+# Shared token bucket rate; 0 paces at max_concurrent requests per second
+CREDITS_PER_SECOND = float(os.getenv("CORESIGNAL_CREDITS_PER_SECOND", 0))
+
+# Per-lead span trace (core_sig/tracing.py) as Chrome trace-event JSON; "" disables tracing
+TRACE_PATH = os.getenv("CORESIGNAL_TRACE", "")
 
 # Cache Configuration
 CACHE_DIR = Path("cache")
@@ -1,8 +1,8 @@
 # enhanced_client.py
-import asyncio
 import json
 import logging
-import time
+import os
+import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -12,31 +12,28 @@ import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 import hashlib
 
-from config import API_BASE_URL, API_KEY
+from config import API_BASE_URL, API_KEY, CREDITS_PER_SECOND
+
+# Shared token bucket lives in the repo-level core_sig package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core_sig.rate_limit import TokenBucket, get_limiter, parse_retry_after
 
 logger = logging.getLogger("coresignal_client")
 
 
 class RateLimiter:
-    """Async rate limiter to control API request frequency."""
+    """Async rate limiter backed by the shared CoreSignal token bucket."""
     
-    def __init__(self, max_requests: int = 5, time_window: float = 1.0):
+    def __init__(self, max_requests: int = 5, time_window: float = 1.0, bucket: Optional[TokenBucket] = None):
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests: List[float] = []
-        self._lock = asyncio.Lock()
+        self.bucket = bucket or get_limiter("coresignal", CREDITS_PER_SECOND or max_requests / time_window, max_requests)
     
     async def acquire(self):
-        async with self._lock:
-            now = time.time()
-            # Remove old requests outside the time window
-            self.requests = [t for t in self.requests if now - t < self.time_window]
-            if len(self.requests) >= self.max_requests:
-                sleep_time = self.time_window - (now - self.requests[0])
-                if sleep_time > 0:
-                    await asyncio.sleep(sleep_time)
-                    return await self.acquire()
-            self.requests.append(now)
+        await self.bucket.acquire_async()
+
+    def penalize(self, retry_after: float):
+        self.bucket.penalize(retry_after)
 
 
 class EnhancedCoreSignalClient:
@@ -67,9 +64,29 @@ class EnhancedCoreSignalClient:
         self.cache_dir.mkdir(exist_ok=True, parents=True)
         self.client_config = {
             "timeout": httpx.Timeout(30.0),
-            "limits": httpx.Limits(max_connections=max_concurrent),
+            "limits": httpx.Limits(max_connections=max_concurrent,
+                                   max_keepalive_connections=max_concurrent,
+                                   keepalive_expiry=30.0),
             "headers": {"Authorization": f"Bearer {self.api_key}"}
         }
+        # One pooled client for the life of this object; see aclose()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(**self.client_config)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
     
     def _get_cache_key(self, endpoint: str, params: Dict[str, Any]) -> str:
         key_data = f"{endpoint}:{json.dumps(params, sort_keys=True)}"
@@ -113,32 +130,34 @@ class EnhancedCoreSignalClient:
     async def _make_request(self, method: str, endpoint: str, **kwargs) -> Optional[Dict[str, Any]]:
         await self.rate_limiter.acquire()
         url = f"{API_BASE_URL}{endpoint}"
-        async with httpx.AsyncClient(**self.client_config) as client:
-            try:
-                logger.info(f"{method.upper()} {url}")
-                response = await getattr(client, method.lower())(url, **kwargs)
-                if response.status_code == 404:
-                    logger.warning(f"Endpoint not found: {url}")
-                    return None
-                if response.status_code == 429:
-                    logger.warning("Rate limit exceeded, waiting...")
-                    await asyncio.sleep(60)
-                    raise httpx.HTTPStatusError("Rate limited", request=response.request, response=response)
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                code = e.response.status_code
-                if code in (401, 403):
-                    logger.error(f"Authentication error: {e}")
-                    return None
-                if code == 404:
-                    logger.warning(f"Resource not found: {url}")
-                    return None
-                logger.error(f"HTTP error {code}: {e}")
-                raise
-            except Exception as e:
-                logger.error(f"Request failed: {e}")
-                raise
+        client = self._get_client()
+        try:
+            logger.info(f"{method.upper()} {url}")
+            response = await getattr(client, method.lower())(url, **kwargs)
+            if response.status_code == 404:
+                logger.warning(f"Endpoint not found: {url}")
+                return None
+            if response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"), 60)
+                logger.warning(f"Rate limit exceeded, backing off {retry_after:.0f}s")
+                # The retried call waits in rate_limiter.acquire() until the pause ends
+                self.rate_limiter.penalize(retry_after)
+                raise httpx.HTTPStatusError("Rate limited", request=response.request, response=response)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            code = e.response.status_code
+            if code in (401, 403):
+                logger.error(f"Authentication error: {e}")
+                return None
+            if code == 404:
+                logger.warning(f"Resource not found: {url}")
+                return None
+            logger.error(f"HTTP error {code}: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            raise
     
     async def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         params = params or {}
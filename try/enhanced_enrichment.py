@@ -1,4 +1,5 @@
 # enhanced_enrichment.py
+import asyncio
 import pandas as pd
 import numpy as np
 import re
@@ -6,7 +7,11 @@ from urllib.parse import urlparse
 from typing import Any, Dict, List, Optional
 import logging
 
+from enhanced_client import EnhancedCoreSignalClient
+from core_sig.tracing import get_tracer
+
 logger = logging.getLogger("enrichment")
+tracer = get_tracer()
 
 class DataCleaner:
     """Utility class for cleaning and validating input data."""
@@ -167,8 +172,9 @@ class EnrichmentEngine:
         async def worker(row):
             async with semaphore:
                 self.stats["processed"] += 1
-                p = await self.enrich_person(row)
-                c = await self.enrich_company(row)
+                with tracer.span("enrich_lead"):
+                    p = await self.enrich_person(row)
+                    c = await self.enrich_company(row)
                 enriched = row.to_dict()
                 enriched.update(p["person_data"])
                 enriched.update(c["company_data"])
@@ -8,7 +8,9 @@ import pandas as pd
 
 from enhanced_client import EnhancedCoreSignalClient
 from enhanced_enrichment import EnrichmentEngine
-from safe_file_handler import SafeFileHandler
+from safe_file_handlers import SafeFileHandler
+from config import TRACE_PATH
+from core_sig.tracing import get_tracer
 
 # Configure logging
 logging.basicConfig(
@@ -37,6 +39,7 @@ async def main():
         logger.error(f"Input file not found: {input_path}")
         return 1
 
+    get_tracer().start(TRACE_PATH)
     client = EnhancedCoreSignalClient(api_key, max_concurrent=args.max_concurrent)
     engine = EnrichmentEngine(client)
     handler = SafeFileHandler()
@@ -63,6 +66,8 @@ async def main():
     except Exception as e:
         logger.error(f"Enrichment failed: {e}", exc_info=True)
         return 1
+    finally:
+        await client.aclose()
 
 
 if __name__ == "__main__":